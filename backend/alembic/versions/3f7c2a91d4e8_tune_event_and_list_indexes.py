@@ -0,0 +1,56 @@
+"""tune event and list indexes
+
+Revision ID: 3f7c2a91d4e8
+Revises: 905ebe8e961e
+Create Date: 2026-10-19 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7c2a91d4e8'
+down_revision: Union[str, None] = '905ebe8e961e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # rule predicates: module/action equality + timestamp range, grouped by src_ip/user
+    op.create_index(
+        'ix_events_normalized_module_action_ts', 'events_normalized',
+        ['event_module', 'event_action', 'timestamp'], unique=False,
+        postgresql_include=['src_ip', 'user', 'http_path', 'country'],
+    )
+    # events_normalized is append-only in time order: BRIN replaces the timestamp B-tree
+    op.create_index('ix_events_normalized_timestamp_brin', 'events_normalized', ['timestamp'], unique=False, postgresql_using='brin')
+    op.create_index('ix_events_normalized_created_at_brin', 'events_normalized', ['created_at'], unique=False, postgresql_using='brin')
+
+    # covered by the composite index above, or never queried
+    op.drop_index('ix_events_normalized_event_module', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_event_action', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_timestamp', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_dst_ip', table_name='events_normalized')
+
+    # list endpoints
+    op.create_index('ix_detections_status_id', 'detections', ['status', 'id'], unique=False)
+    op.drop_index('ix_detections_status', table_name='detections')
+    op.create_index('ix_cases_updated_at_id', 'cases', ['updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cases_updated_at_id', table_name='cases')
+    op.create_index('ix_detections_status', 'detections', ['status'], unique=False)
+    op.drop_index('ix_detections_status_id', table_name='detections')
+
+    op.create_index('ix_events_normalized_dst_ip', 'events_normalized', ['dst_ip'], unique=False)
+    op.create_index('ix_events_normalized_timestamp', 'events_normalized', ['timestamp'], unique=False)
+    op.create_index('ix_events_normalized_event_action', 'events_normalized', ['event_action'], unique=False)
+    op.create_index('ix_events_normalized_event_module', 'events_normalized', ['event_module'], unique=False)
+
+    op.drop_index('ix_events_normalized_created_at_brin', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_timestamp_brin', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_module_action_ts', table_name='events_normalized')
@@ -0,0 +1,62 @@
+"""add case_detections
+
+Revision ID: 5b1f0c93d7e4
+Revises: e2b8d4f61a37
+Create Date: 2026-10-19 15:48:30.664102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f0c93d7e4'
+down_revision: Union[str, None] = 'e2b8d4f61a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('case_detections',
+    sa.Column('case_id', sa.Integer(), nullable=False),
+    sa.Column('detection_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['case_id'], ['cases.id'], name=op.f('fk_case_detections_case_id_cases'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['detection_id'], ['detections.id'], name=op.f('fk_case_detections_detection_id_detections'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('case_id', 'detection_id', name=op.f('pk_case_detections'))
+    )
+    op.create_index(op.f('ix_case_detections_detection_id'), 'case_detections', ['detection_id'], unique=False)
+    # backfill from the comma-separated ids; ids of missing detections and
+    # anything that is not a small integer are skipped. The cast sits inside
+    # the CASE so it only ever sees strings that fit an int4, whatever order
+    # the planner evaluates the join and filter in.
+    op.execute("""
+        INSERT INTO case_detections (case_id, detection_id)
+        SELECT DISTINCT c.id, d.id
+        FROM cases c
+        CROSS JOIN LATERAL (
+            SELECT CASE WHEN trim(v) ~ '^[0-9]{1,9}$' THEN trim(v)::int END AS detection_id
+            FROM unnest(string_to_array(c.detection_ids_json, ',')) AS u(v)
+        ) x
+        JOIN detections d ON d.id = x.detection_id
+    """)
+    op.drop_column('cases', 'detection_ids_json')
+    op.create_index('ix_cases_status_updated_at_id', 'cases', ['status', 'updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cases_status_updated_at_id', table_name='cases')
+    op.add_column('cases', sa.Column('detection_ids_json', sa.Text(), nullable=True))
+    op.execute("""
+        UPDATE cases c
+        SET detection_ids_json = x.ids
+        FROM (
+            SELECT case_id, string_agg(detection_id::text, ',' ORDER BY detection_id) AS ids
+            FROM case_detections
+            GROUP BY case_id
+        ) x
+        WHERE x.case_id = c.id
+    """)
+    op.drop_index(op.f('ix_case_detections_detection_id'), table_name='case_detections')
+    op.drop_table('case_detections')
@@ -0,0 +1,36 @@
+"""add event search indexes
+
+Revision ID: 7d3a9e6c0b15
+Revises: 5b1f0c93d7e4
+Create Date: 2026-10-19 16:31:12.840557
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3a9e6c0b15'
+down_revision: Union[str, None] = '5b1f0c93d7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_events_normalized_http_path_trgm', 'events_normalized', ['http_path'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'http_path': 'gin_trgm_ops'})
+    op.create_index('ix_events_normalized_user_agent_trgm', 'events_normalized', ['user_agent'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'user_agent': 'gin_trgm_ops'})
+    op.create_index('ix_events_normalized_fields_fts', 'events_normalized',
+                    [sa.text("to_tsvector('simple'::regconfig, (fields_json)::text)")], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_normalized_fields_fts', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_user_agent_trgm', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_http_path_trgm', table_name='events_normalized')
+    # pg_trgm is left installed; other objects may depend on it
@@ -0,0 +1,36 @@
+"""add entity timeline indexes
+
+Revision ID: 9c2e5a7f1d38
+Revises: 7d3a9e6c0b15
+Create Date: 2026-10-19 18:02:37.194462
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2e5a7f1d38'
+down_revision: Union[str, None] = '7d3a9e6c0b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (entity, timestamp, id) serves equality filters and newest-first keyset pages
+    op.create_index('ix_events_normalized_src_ip_timestamp_id', 'events_normalized', ['src_ip', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_events_normalized_user_timestamp_id', 'events_normalized', ['user', 'timestamp', 'id'], unique=False)
+
+    # prefixes of the composites above
+    op.drop_index('ix_events_normalized_src_ip', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_user', table_name='events_normalized')
+
+
+def downgrade() -> None:
+    op.create_index('ix_events_normalized_user', 'events_normalized', ['user'], unique=False)
+    op.create_index('ix_events_normalized_src_ip', 'events_normalized', ['src_ip'], unique=False)
+
+    op.drop_index('ix_events_normalized_user_timestamp_id', table_name='events_normalized')
+    op.drop_index('ix_events_normalized_src_ip_timestamp_id', table_name='events_normalized')
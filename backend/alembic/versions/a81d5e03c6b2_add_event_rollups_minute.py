@@ -0,0 +1,39 @@
+"""add event_rollups_minute
+
+Revision ID: a81d5e03c6b2
+Revises: 3f7c2a91d4e8
+Create Date: 2026-10-19 11:03:17.904122
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81d5e03c6b2'
+down_revision: Union[str, None] = '3f7c2a91d4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('event_rollups_minute',
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('event_module', sa.String(length=64), nullable=False),
+    sa.Column('event_action', sa.String(length=64), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'event_module', 'event_action', name=op.f('pk_event_rollups_minute'))
+    )
+    # seed from existing events; ingest keeps it current from here on
+    op.execute("""
+        INSERT INTO event_rollups_minute (bucket, event_module, event_action, count)
+        SELECT date_trunc('minute', "timestamp"), event_module, event_action, count(*)
+        FROM events_normalized
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('event_rollups_minute')
@@ -0,0 +1,39 @@
+"""add block feed changes
+
+Revision ID: b6d1f4a8e2c9
+Revises: 9c2e5a7f1d38
+Create Date: 2026-10-19 20:41:09.518233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d1f4a8e2c9'
+down_revision: Union[str, None] = '9c2e5a7f1d38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('block_feed_changes',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('rule_id', sa.Integer(), nullable=False),
+    sa.Column('target', sa.String(length=45), nullable=False),
+    sa.Column('op', sa.String(length=8), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_block_feed_changes'))
+    )
+
+    # the feed starts from the rules that are active today
+    op.execute(
+        "INSERT INTO block_feed_changes (created_at, rule_id, target, op) "
+        "SELECT now(), id, ip, 'add' FROM block_rules WHERE active ORDER BY id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('block_feed_changes')
@@ -0,0 +1,76 @@
+"""multi-resolution event rollups
+
+Revision ID: c4e7b19a52f0
+Revises: a81d5e03c6b2
+Create Date: 2026-10-19 13:42:08.511634
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7b19a52f0'
+down_revision: Union[str, None] = 'a81d5e03c6b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SKETCH_BITS = 1024
+LEVELS = (('event_rollups_minute', 60), ('event_rollups_hour', 3600), ('event_rollups_day', 86400))
+
+# must match services/rollups.sketch_position
+SKETCH_SQL = f"""
+    bit_or(CASE WHEN src_ip IS NULL THEN repeat('0', {SKETCH_BITS})::bit({SKETCH_BITS})
+           ELSE set_bit(repeat('0', {SKETCH_BITS})::bit({SKETCH_BITS}),
+                        (('x' || substr(md5(src_ip), 1, 8))::bit(32)::bigint % {SKETCH_BITS})::int, 1)
+           END)
+"""
+
+
+def _create(name: str) -> None:
+    op.create_table(name,
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('event_module', sa.String(length=64), nullable=False),
+    sa.Column('event_action', sa.String(length=64), nullable=False),
+    sa.Column('country', sa.String(length=2), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.Column('src_sketch', postgresql.BIT(length=SKETCH_BITS), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'event_module', 'event_action', 'country', name=op.f(f'pk_{name}'))
+    )
+
+
+def upgrade() -> None:
+    # the minute table gains country + sketch in its key; rebuilding is
+    # simpler than rewriting it in place since all three are seeded from raw
+    op.drop_table('event_rollups_minute')
+    for name, seconds in LEVELS:
+        _create(name)
+        op.execute(f"""
+            INSERT INTO {name} (bucket, event_module, event_action, country, count, src_sketch)
+            SELECT date_bin(interval '{seconds} seconds', "timestamp", timestamptz '1970-01-01 00:00:00+00'),
+                   event_module, event_action, coalesce(country, ''), count(*), {SKETCH_SQL}
+            FROM events_normalized
+            GROUP BY 1, 2, 3, 4
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table('event_rollups_day')
+    op.drop_table('event_rollups_hour')
+    op.drop_table('event_rollups_minute')
+    op.create_table('event_rollups_minute',
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('event_module', sa.String(length=64), nullable=False),
+    sa.Column('event_action', sa.String(length=64), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'event_module', 'event_action', name=op.f('pk_event_rollups_minute'))
+    )
+    op.execute("""
+        INSERT INTO event_rollups_minute (bucket, event_module, event_action, count)
+        SELECT date_trunc('minute', "timestamp"), event_module, event_action, count(*)
+        FROM events_normalized
+        GROUP BY 1, 2, 3
+    """)
@@ -0,0 +1,43 @@
+"""add detection_events
+
+Revision ID: e2b8d4f61a37
+Revises: c4e7b19a52f0
+Create Date: 2026-10-19 15:06:51.227410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8d4f61a37'
+down_revision: Union[str, None] = 'c4e7b19a52f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('detection_events',
+    sa.Column('detection_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['detection_id'], ['detections.id'], name=op.f('fk_detection_events_detection_id_detections'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['event_id'], ['events_normalized.id'], name=op.f('fk_detection_events_event_id_events_normalized'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('detection_id', 'event_id', name=op.f('pk_detection_events'))
+    )
+    op.create_index(op.f('ix_detection_events_event_id'), 'detection_events', ['event_id'], unique=False)
+    # backfill from the JSON arrays; ids of events that no longer exist are skipped
+    op.execute("""
+        INSERT INTO detection_events (detection_id, event_id)
+        SELECT DISTINCT d.id, e.id
+        FROM detections d
+        CROSS JOIN LATERAL json_array_elements_text(d.event_ids) AS x(event_id)
+        JOIN events_normalized e ON e.id = x.event_id::int
+        WHERE json_typeof(d.event_ids) = 'array'
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_detection_events_event_id'), table_name='detection_events')
+    op.drop_table('detection_events')
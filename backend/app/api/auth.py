@@ -5,12 +5,16 @@ from pydantic import BaseModel, EmailStr
 from ..schemas.auth import LoginIn, TokenPair
 from ..core.deps import get_db
 from ..core.jwt import create_access_token, create_refresh_token, decode_token
-from ..services.users import get_user_by_email, create_user, check_user_credentials
+from ..services.users import get_user_by_email, create_user, check_user_credentials, set_user_role, delete_user
 from ..models.user import User
 from ..core.security import hash_password  # ✅ use passlib wrapper
+from ..core.user_cache import invalidate_user
+from ..core.auth_deps import require_roles
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+ROLES = ("viewer", "analyst", "admin")
+
 
 class RegisterRequest(BaseModel):
     email: EmailStr
@@ -32,6 +36,7 @@ def register(req: RegisterRequest, db: Session = Depends(get_db)):
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_user(user.email)  # a deleted account re-registered under the same email
 
     return {"id": user.id, "email": user.email, "role": user.role}
 
@@ -68,4 +73,29 @@ def refresh(token: str):
     return TokenPair(
         access_token=create_access_token(sub),
         refresh_token=create_refresh_token(sub),
-    )
\ No newline at end of file
+    )
+
+
+class RoleRequest(BaseModel):
+    role: str  # "viewer", "analyst", or "admin"
+
+
+@router.put("/users/{email}/role")
+def change_role(email: str, req: RoleRequest, db: Session = Depends(get_db),
+                user=Depends(require_roles("admin"))):
+    """Change a user's role; their cached identity is dropped on every worker."""
+    if req.role not in ROLES:
+        raise HTTPException(status_code=400, detail=f"role must be one of {', '.join(ROLES)}")
+    target = set_user_role(db, email, req.role)
+    if not target:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"id": target.id, "email": target.email, "role": target.role}
+
+
+@router.delete("/users/{email}")
+def remove_user(email: str, db: Session = Depends(get_db),
+                user=Depends(require_roles("admin"))):
+    """Delete a user; tokens already issued to them stop working at once."""
+    if not delete_user(db, email):
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"ok": True}
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import Optional
-from ..core.deps import get_db
+from ..core.deps import get_db, get_read_db
 from ..core.auth_deps import get_current_user
 from ..schemas.cases import CaseCreate, CaseOut
 from ..services.cases import create_case, list_cases, get_case, update_status, update_assignee, add_comment
+from ..services.pagination import NEXT_CURSOR_HEADER, next_cursor
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/cases", tags=["cases"])
@@ -19,21 +20,38 @@ def create_case_api(payload: CaseCreate, db: Session = Depends(get_db), user=Dep
 
 @router.get("")
 def list_cases_api(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
     status: Optional[str] = None,
     severity: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
 ):
-    rows = list_cases(db, status, severity, limit, offset)
+    try:
+        rows = list_cases(db, status, severity, limit, offset, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    nxt = next_cursor(rows, limit, "updated_at", "id")
+    if nxt:
+        response.headers[NEXT_CURSOR_HEADER] = nxt
     return [
-        {"id": c.id, "title": c.title, "severity": c.severity, "status": c.status, "assignee": c.assignee, "updated_at": c.updated_at}
+        {
+            "id": c.id,
+            "title": c.title,
+            "severity": c.severity,
+            "status": c.status,
+            "assignee": c.assignee,
+            "updated_at": c.updated_at,
+            "detection_count": c.detection_count,
+            "comment_count": c.comment_count,
+        }
         for c in rows
     ]
 
 @router.get("/{case_id}")
-def get_case_api(case_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def get_case_api(case_id: int, db: Session = Depends(get_read_db), user=Depends(get_current_user)):
     c = get_case(db, case_id)
     if not c:
         raise HTTPException(status_code=404, detail="case not found")
@@ -44,7 +62,11 @@ def get_case_api(case_id: int, db: Session = Depends(get_db), user=Depends(get_c
         "severity": c.severity,
         "status": c.status,
         "assignee": c.assignee,
-        "detection_ids": [int(x) for x in c.detection_ids_json.split(",")] if c.detection_ids_json else [],
+        "detection_ids": [d.id for d in c.detections],
+        "detections": [
+            {"id": d.id, "created_at": d.created_at, "rule_id": d.rule_id, "severity": d.severity, "title": d.title, "status": d.status}
+            for d in c.detections
+        ],
         "created_at": c.created_at,
         "updated_at": c.updated_at,
         "comments": [
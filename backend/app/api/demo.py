@@ -3,17 +3,17 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timezone, timedelta
 import random
 import logging
-from pathlib import Path
 from typing import Any, Dict
 
 from ..core.deps import get_db
 from ..core.auth_deps import get_current_user
 from ..models.event import EventNormalized
-from ..detectors.engine import run_all_rules
+from ..services.rollups import record_pending_events
+from ..core.cache import invalidate
+from ..workers.detection_runs import submit_detection_run
 
 router = APIRouter(prefix="/demo", tags=["demo"])
 
-RULES_DIR = Path(__file__).resolve().parents[1] / "detectors" / "rules"
 log = logging.getLogger(__name__)
 
 def _utcnow():
@@ -56,6 +56,7 @@ def generate_demo(db: Session = Depends(get_db), user=Depends(get_current_user))
                 country=random.choice([None, "US", "DE", "IN"]),
             ))
 
+        record_pending_events(db)
         db.commit()
 
         # 3) Web-scan burst (one IP, many distinct paths in a short window)
@@ -127,10 +128,12 @@ def generate_demo(db: Session = Depends(get_db), user=Depends(get_current_user))
                 country="ZZ",   # uncommon country code
             ))
 
+        record_pending_events(db)
         db.commit()
+        invalidate("events")
 
-        # Run rules (YAML + Python + ML)
-        results = run_all_rules(db, RULES_DIR)
+        # Run rules (YAML + Python + ML) on the background worker
+        job, _ = submit_detection_run(requested_by=user.email)
 
         return {
             "ok": True,
@@ -143,7 +146,7 @@ def generate_demo(db: Session = Depends(get_db), user=Depends(get_current_user))
                 "http_5xx": 25,
                 "ml_anomalies": 5,
             },
-            "rules": results,
+            "run": {"job_id": job["id"], "status": job.get("status")},
             "source_ip": src_ip,
             "scan_ip": scan_ip,
             "multiuser_ip": multi_ip,
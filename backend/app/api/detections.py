@@ -1,95 +1,149 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
-from pathlib import Path
-from ..core.deps import get_db
+from ..core.deps import get_async_db, get_async_read_db
 from ..models.detection import Detection
-from ..models.event import EventNormalized
-from ..detectors.engine import run_all_rules
-from ..core.auth_deps import get_current_user, require_roles
+from ..workers.detection_runs import submit_detection_run, get_detection_run
+from ..core.auth_deps import get_current_user, get_current_user_async, require_roles
+from ..core.cache import cached_json_async, detection_namespace
+from ..services.detections import list_detections as svc_list_detections, evidence_for_detection, evidence_dict, detections_referencing
+from ..services.pagination import NEXT_CURSOR_HEADER, next_cursor
+from ..services.export import FORMATS, export_detections
 
 router = APIRouter(prefix="/detections", tags=["detections"])
 
-RULES_DIR = Path(__file__).resolve().parents[1] / "detectors" / "rules"
+LIST_TTL = 15       # seconds; new detections invalidate sooner
+DETAIL_TTL = 3600
 
-@router.post("/run")
-def run_rules(db: Session = Depends(get_db), user = Depends(require_roles("analyst", "admin"))):
-    results = run_all_rules(db, RULES_DIR)
-    return {"results": results}
+@router.post("/run", status_code=202)
+def run_rules(user = Depends(require_roles("analyst", "admin"))):
+    """
+    Queue a run of all rules on the background worker and return its job id
+    right away. Submitting while a run is in flight returns that run.
+    """
+    job, coalesced = submit_detection_run(requested_by=user.email)
+    return {"job_id": job["id"], "status": job.get("status"), "coalesced": coalesced}
+
+@router.get("/runs/{job_id}")
+def get_run(job_id: str, user = Depends(get_current_user)):
+    job = get_detection_run(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="run not found")
+    return job
 
 @router.get("")
-def list_detections(
-    db: Session = Depends(get_db),
+async def list_detections(
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
     status: Optional[str] = None,
     kind: Optional[str] = None,
     severity: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
 ):
-    q = db.query(Detection).order_by(Detection.id.desc())
-    if status:
-        q = q.filter(Detection.status == status)
-    if kind:
-        q = q.filter(Detection.kind == kind)
-    if severity:
-        q = q.filter(Detection.severity == severity)
-    rows = q.limit(limit).offset(offset).all()
-    return [
-        {
-            "id": d.id,
-            "created_at": d.created_at,
-            "rule_id": d.rule_id,
-            "kind": d.kind,
-            "severity": d.severity,
-            "title": d.title,
-            "summary": d.summary,
-            "status": d.status,
-            "tags": d.tags,
-            "event_ids": d.event_ids,
-        }
-        for d in rows
-    ]
+    async def compute(headers):
+        try:
+            rows = await db.run_sync(svc_list_detections, status, kind, severity, limit, offset, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        nxt = next_cursor(rows, limit, "id")
+        if nxt:
+            headers[NEXT_CURSOR_HEADER] = nxt
+        return [
+            {
+                "id": d.id,
+                "created_at": d.created_at,
+                "rule_id": d.rule_id,
+                "kind": d.kind,
+                "severity": d.severity,
+                "title": d.title,
+                "summary": d.summary,
+                "status": d.status,
+                "tags": d.tags,
+                "event_ids": d.event_ids,
+            }
+            for d in rows
+        ]
 
-@router.get("/{det_id}")
-def get_detection(det_id: int, db: Session = Depends(get_db)):
-    det = db.get(Detection, det_id)
-    if not det:
-        return {"error": "not_found"}
+    return await cached_json_async(request, ["detections"], LIST_TTL, compute)
 
-    events = []
-    if det.event_ids:
-        stmt = (
-            select(EventNormalized)
-            .where(EventNormalized.id.in_(det.event_ids))
-            .order_by(EventNormalized.id.desc())
-            .limit(200)
-        )
-        events = db.execute(stmt).scalars().all()
+@router.get("/export")
+def export_detections_api(
+    user = Depends(get_current_user),
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    severity: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """Stream every matching detection as NDJSON or CSV (declared before /{det_id})."""
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    return StreamingResponse(
+        export_detections(format, status=status, kind=kind, severity=severity, limit=limit),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="detections.{format}"'},
+    )
 
-    return {
-        "id": det.id,
-        "created_at": det.created_at,
-        "rule_id": det.rule_id,
-        "kind": det.kind,
-        "severity": det.severity,
-        "title": det.title,
-        "summary": det.summary,
-        "status": det.status,
-        "tags": det.tags,
-        "event_ids": det.event_ids,
-        "features": det.features_json,
-        "evidence_events": [
+@router.get("/lookup")
+async def lookup_detections(
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+    user = Depends(get_current_user_async),
+    event_id: Optional[int] = None,
+    src_ip: Optional[str] = None,
+    limit: int = 50,
+):
+    """Detections whose evidence references an event id and/or any event from src_ip."""
+    if event_id is None and not src_ip:
+        raise HTTPException(status_code=400, detail="event_id or src_ip is required")
+
+    async def compute(headers):
+        rows = await db.run_sync(detections_referencing, event_id=event_id, src_ip=src_ip, limit=limit)
+        return [
             {
-                "id": e.id,
-                "timestamp": e.timestamp,
-                "event_module": e.event_module,
-                "event_action": e.event_action,
-                "src_ip": e.src_ip,
-                "user": e.user,
-                "http_path": e.http_path,
-                "country": e.country,
+                "id": d.id,
+                "created_at": d.created_at,
+                "rule_id": d.rule_id,
+                "kind": d.kind,
+                "severity": d.severity,
+                "title": d.title,
+                "status": d.status,
             }
-            for e in events
-        ],
-    }
\ No newline at end of file
+            for d in rows
+        ]
+
+    return await cached_json_async(request, ["detections"], LIST_TTL, compute)
+
+@router.get("/{det_id}")
+async def get_detection(det_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # evidence never changes once written, so the detail is cached for long;
+    # only a change to this detection (its own namespace) invalidates it
+    async def compute(headers):
+        det = await db.get(Detection, det_id)
+        if not det:
+            return {"error": "not_found"}
+
+        events = await db.run_sync(evidence_for_detection, det_id) if det.event_ids else []
+
+        return {
+            "id": det.id,
+            "created_at": det.created_at,
+            "rule_id": det.rule_id,
+            "kind": det.kind,
+            "severity": det.severity,
+            "title": det.title,
+            "summary": det.summary,
+            "status": det.status,
+            "tags": det.tags,
+            "event_ids": det.event_ids,
+            "features": det.features_json,
+            "evidence_events": [evidence_dict(e) for e in events],
+        }
+
+    return await cached_json_async(
+        request, [detection_namespace(det_id)], DETAIL_TTL, compute,
+        store_if=lambda payload: "error" not in payload,
+    )
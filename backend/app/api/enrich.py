@@ -1,38 +1,33 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from datetime import datetime, timedelta, timezone
 from ..core.deps import get_db
-from ..models.event import EventNormalized
-from ..services.enrich import country_for_ip
-from sqlalchemy import select
-from ..models.event import EventNormalized
+from ..core.auth_deps import require_roles, get_current_user
 from ..models.detection import Detection
+from ..workers.geoip_backfill import submit_geoip_backfill, get_geoip_backfill, load_checkpoint
+from ..services.detections import evidence_for_detection, evidence_dict
 
 router = APIRouter(prefix="/enrich", tags=["enrichment"])
 
-@router.post("/geoip/backfill")
-def geoip_backfill(hours: int = 24, db: Session = Depends(get_db)):
-    # Fill missing country for events in the last N hours
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(hours=hours)
+@router.post("/geoip/backfill", status_code=202)
+def geoip_backfill(hours: int = 24, resume: bool = True, user = Depends(require_roles("analyst", "admin"))):
+    """
+    Queue a background fill of missing countries for events in the last N
+    hours. An interrupted run is resumed from its checkpoint (same range)
+    unless resume=false. Poll /enrich/geoip/backfill/{job_id} for progress.
+    """
+    job, coalesced = submit_geoip_backfill(hours=hours, resume=resume)
+    return {"job_id": job["id"], "status": job.get("status"), "coalesced": coalesced, "params": job.get("params")}
 
-    stmt = select(EventNormalized).where(
-        EventNormalized.timestamp >= start,
-        EventNormalized.timestamp < end,
-        (EventNormalized.country.is_(None)) | (EventNormalized.country == "")
-    ).limit(5000)
+@router.get("/geoip/backfill/checkpoint")
+def geoip_backfill_checkpoint(user = Depends(get_current_user)):
+    return load_checkpoint() or {}
 
-    rows = db.execute(stmt).scalars().all()
-    updated = 0
-    for r in rows:
-        code = country_for_ip(r.src_ip)
-        if code:
-            r.country = code
-            updated += 1
-    if updated:
-        db.commit()
-    return {"scanned": len(rows), "updated": updated}
+@router.get("/geoip/backfill/{job_id}")
+def geoip_backfill_status(job_id: str, user = Depends(get_current_user)):
+    job = get_geoip_backfill(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="backfill job not found")
+    return job
 
 
 @router.get("/{det_id}")
@@ -41,10 +36,7 @@ def get_detection(det_id: int, db: Session = Depends(get_db)):
     if not det:
         return {"error": "not_found"}
 
-    events = []
-    if det.event_ids:
-        stmt = select(EventNormalized).where(EventNormalized.id.in_(det.event_ids)).order_by(EventNormalized.id.desc()).limit(200)
-        events = db.execute(stmt).scalars().all()
+    events = evidence_for_detection(db, det_id) if det.event_ids else []
 
     return {
         "id": det.id,
@@ -57,17 +49,5 @@ def get_detection(det_id: int, db: Session = Depends(get_db)):
         "status": det.status,
         "tags": det.tags,
         "event_ids": det.event_ids,
-        "evidence_events": [
-            {
-                "id": e.id,
-                "timestamp": e.timestamp,
-                "event_module": e.event_module,
-                "event_action": e.event_action,
-                "src_ip": e.src_ip,
-                "user": e.user,
-                "http_path": e.http_path,
-                "country": e.country,
-            }
-            for e in events
-        ],
+        "evidence_events": [evidence_dict(e) for e in events],
     }
@@ -8,6 +8,8 @@
 
 # router = APIRouter(prefix="/events", tags=["events"])
 
+LIST_TTL = 15  # seconds; ingest invalidates sooner
+
 # @router.get("", response_model=List[EventOut])
 # def list_events(
 #     db: Session = Depends(get_db),
@@ -48,19 +50,27 @@
 
 
 # backend/app/api/events.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import DataError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from ..core.deps import get_db
-from ..core.auth_deps import get_current_user
+from datetime import datetime, timedelta, timezone
+from ..core.deps import get_async_read_db
+from ..core.auth_deps import get_current_user, get_current_user_async
+from ..core.cache import cached_json_async
 from ..services.events import list_events  # whatever you named it
+from ..services.pagination import NEXT_CURSOR_HEADER, next_cursor
+from ..services.rollups import histogram
+from ..services.export import FORMATS, export_events
 
 router = APIRouter(prefix="/events", tags=["events"])
 
 @router.get("")
-def list_events_api(
-    db: Session = Depends(get_db),
-    user = Depends(get_current_user),
+async def list_events_api(
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+    user = Depends(get_current_user_async),
     event_module: Optional[str] = None,
     event_action: Optional[str] = None,
     src_ip: Optional[str] = None,
@@ -69,28 +79,141 @@ def list_events_api(
     end: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    q_mode: str = "substring",
+    q_field: str = "any",
 ):
-    rows = list_events(
-        db,
-        event_module=event_module,
-        event_action=event_action,
-        src_ip=src_ip,
-        user=user_filter,
-        start=start,
-        end=end,
-        limit=limit,
-        offset=offset,
+    """
+    List events, newest first. q searches paths, user agents and payload
+    fields (q_mode substring|prefix|regex, q_field any|http_path|user_agent|fields);
+    search hits are ranked by relevance and carry a score.
+    """
+    async def compute(headers):
+        try:
+            rows = await db.run_sync(
+                list_events,
+                event_module=event_module,
+                event_action=event_action,
+                src_ip=src_ip,
+                user=user_filter,
+                start=start,
+                end=end,
+                limit=limit,
+                offset=offset,
+                cursor=cursor,
+                q=q,
+                q_mode=q_mode,
+                q_field=q_field,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except DataError as e:
+            # a pattern check_regex let through that Postgres still rejects
+            raise HTTPException(status_code=400, detail=f"invalid query: {str(e.orig).splitlines()[0]}")
+        nxt = next_cursor(rows, limit, "search_score", "id") if q else next_cursor(rows, limit, "id")
+        if nxt:
+            headers[NEXT_CURSOR_HEADER] = nxt
+        out = [
+            {
+                "id": ev.id,
+                "timestamp": ev.timestamp.isoformat(),   # <-- ensure ISO string
+                "event_module": ev.event_module,
+                "event_action": ev.event_action,
+                "src_ip": ev.src_ip,
+                "user": ev.user,
+                "http_path": ev.http_path,
+                "country": ev.country,                   # <-- include country
+            }
+            for ev in rows
+        ]
+        if q:
+            for item, ev in zip(out, rows):
+                item["user_agent"] = ev.user_agent
+                item["score"] = ev.search_score
+        return out
+
+    return await cached_json_async(request, ["events"], LIST_TTL, compute)
+
+@router.get("/export")
+def export_events_api(
+    user = Depends(get_current_user),
+    format: str = "ndjson",
+    event_module: Optional[str] = None,
+    event_action: Optional[str] = None,
+    src_ip: Optional[str] = None,
+    user_filter: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: Optional[int] = None,
+    q: Optional[str] = None,
+    q_mode: str = "substring",
+    q_field: str = "any",
+):
+    """
+    Stream every matching event (same filters as the list) as NDJSON or CSV.
+    Rows are read through a server-side cursor, so any size export is safe.
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    try:
+        body = export_events(
+            format,
+            event_module=event_module,
+            event_action=event_action,
+            src_ip=src_ip,
+            user=user_filter,
+            start=start,
+            end=end,
+            limit=limit,
+            q=q,
+            q_mode=q_mode,
+            q_field=q_field,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        body,
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="events.{format}"'},
     )
-    return [
-        {
-            "id": ev.id,
-            "timestamp": ev.timestamp.isoformat(),   # <-- ensure ISO string
-            "event_module": ev.event_module,
-            "event_action": ev.event_action,
-            "src_ip": ev.src_ip,
-            "user": ev.user,
-            "http_path": ev.http_path,
-            "country": ev.country,                   # <-- include country
-        }
-        for ev in rows
-    ]
\ No newline at end of file
+
+
+def _as_utc(value: Optional[str], default: datetime) -> datetime:
+    if not value:
+        return default
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+@router.get("/histogram")
+async def events_histogram_api(
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+    user = Depends(get_current_user_async),
+    interval: str = "1h",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    event_module: Optional[str] = None,
+    event_action: Optional[str] = None,
+    country: Optional[str] = None,
+    group_by: Optional[str] = None,
+):
+    # served from the minute/hour/day rollups; only sub-minute edges touch raw events
+    async def compute(headers):
+        try:
+            end_dt = _as_utc(end, datetime.now(timezone.utc))
+            start_dt = _as_utc(start, end_dt - timedelta(hours=24))
+            return await db.run_sync(
+                histogram,
+                interval,
+                start_dt,
+                end_dt,
+                event_module=event_module,
+                event_action=event_action,
+                country=country,
+                group_by=group_by,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return await cached_json_async(request, ["events"], LIST_TTL, compute)
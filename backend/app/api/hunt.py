@@ -0,0 +1,52 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..core.deps import get_read_db
+from ..core.auth_deps import get_current_user_async
+from ..schemas.hunt import HuntQuery
+from ..services.hunt import HuntRejected, run_hunt
+
+router = APIRouter(prefix="/hunt", tags=["hunt"])
+
+QUERY_CANCELED = "57014"  # SQLSTATE for statement_timeout and pg_cancel
+POLL_SECONDS = 0.25
+
+
+def _sqlstate(e: DBAPIError) -> str | None:
+    return getattr(e.orig, "pgcode", None) or getattr(e.orig, "sqlstate", None)
+
+
+@router.post("/query")
+async def hunt_query(spec: HuntQuery, request: Request, db: Session = Depends(get_read_db), user=Depends(get_current_user_async)):
+    """
+    Run a declarative aggregation (filters, group_by, aggregates, top-N) as a
+    single SQL statement. Rejected up front if the planner expects it to read
+    more than the row budget; cancelled in Postgres if the client goes away.
+    """
+    conn = await run_in_threadpool(db.connection)
+    raw = conn.connection.dbapi_connection
+    task = asyncio.ensure_future(run_in_threadpool(run_hunt, conn, spec))
+    disconnected = False
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=POLL_SECONDS)
+            if done:
+                break
+            if not disconnected and await request.is_disconnected():
+                disconnected = True
+                raw.cancel()  # the worker thread's execute() fails with QueryCanceled
+        return task.result()
+    except HuntRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DBAPIError as e:
+        if _sqlstate(e) != QUERY_CANCELED:
+            raise
+        if disconnected:
+            raise HTTPException(status_code=499, detail="client closed request")
+        raise HTTPException(status_code=408, detail="query exceeded its time limit")
+    finally:
+        await run_in_threadpool(db.rollback)
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from ..core.deps import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.deps import get_async_db
 from ..schemas.events import EventBatchIn
-from ..services.events import insert_events
+from ..services.events import insert_events_async
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
 @router.post("/events")
-def ingest_events(payload: EventBatchIn, db: Session = Depends(get_db)):
-    ok, fail = insert_events(db, payload.events)
-    return {"ingested": ok, "failed": fail}
\ No newline at end of file
+async def ingest_events(payload: EventBatchIn, db: AsyncSession = Depends(get_async_db)):
+    ok, fail = await insert_events_async(db, payload.events)
+    return {"ingested": ok, "failed": fail}
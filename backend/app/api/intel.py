@@ -0,0 +1,29 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+
+from ..core.auth_deps import get_current_user, require_roles
+from ..services import intel
+
+router = APIRouter(prefix="/intel", tags=["intel"])
+
+@router.get("/feeds")
+def list_feeds(user = Depends(get_current_user)):
+    """Loaded feeds with indicator counts and approximate memory use."""
+    return intel.feeds_status()
+
+@router.post("/reload")
+def reload_feeds(user = Depends(require_roles("admin"))):
+    intel.reload(force=True)
+    return intel.feeds_status()
+
+@router.get("/match")
+def match(ip: Optional[str] = None, domain: Optional[str] = None, path: Optional[str] = None,
+          user = Depends(get_current_user)):
+    """Check values against the loaded indicators."""
+    index = intel.current()
+    return {
+        "ip": [{"feed": f, "indicator": i} for f, i in index.match_ip(ip)],
+        "domain": [{"feed": f, "indicator": i} for f, i in index.match_domain(domain)],
+        "path": [{"feed": f, "indicator": i} for f, i in index.match_path(path)],
+    }
@@ -1,5 +1,8 @@
-from fastapi import FastAPI
-from ..core.db import db_ping
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from ..core.db import db_ping, pool_stats
 from ..core.redis_client import redis_ping
 from .auth import router as auth_router
 from .me import router as me_router
@@ -12,9 +15,30 @@ from .respond import router as respond_router
 from fastapi.middleware.cors import CORSMiddleware
 from .metrics import router as metrics_router
 from .demo import router as demo_router
+from .hunt import router as hunt_router
+from .timeline import router as timeline_router
+from .intel import router as intel_router
+from .playbooks import router as playbooks_router
 from ..core.config import settings 
+from ..core import telemetry, sqlprofile
+from ..core.auth_deps import require_roles
+from ..services import blocklist
+from ..workers import block_sweeper, playbook_runner
 
-app = FastAPI(title="SentinelX API", version="0.0.1")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await run_in_threadpool(blocklist.current)  # warm the blocklist index
+    except Exception:
+        pass  # loaded lazily on first lookup instead
+    block_sweeper.start()
+    if settings.playbooks_enabled:
+        playbook_runner.start()
+    yield
+    playbook_runner.stop()
+    block_sweeper.stop()
+
+app = FastAPI(title="SentinelX API", version="0.0.1", lifespan=lifespan)
 
 # CORS for local Next.js
 app.add_middleware(
@@ -23,7 +47,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Cache", "X-SQL-Count", "X-SQL-Time-ms", "X-Blocklist-Version"],
 )
+app.add_middleware(telemetry.MetricsMiddleware)
+
+sqlprofile.install()
+app.add_middleware(sqlprofile.SQLProfileMiddleware)
 
 
 @app.get("/health")
@@ -43,6 +72,21 @@ def health_deep():
         },
     }
 
+@app.get("/health/pools")
+def health_pools(user=Depends(require_roles("admin"))):
+    # checked-out / overflow counts and checkout wait times per engine
+    return pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # Prometheus scrape endpoint (the JSON dashboard lives under /metrics/summary)
+    return PlainTextResponse(telemetry.render(), media_type=telemetry.CONTENT_TYPE)
+
+@app.get("/debug/slow-queries")
+def slow_queries(limit: int = 50, user=Depends(require_roles("admin"))):
+    # fingerprinted statements over SQL_SLOW_QUERY_MS (needs SQL_PROFILING=true)
+    return {"enabled": sqlprofile.enabled(), **sqlprofile.slow_log.snapshot(limit)}
+
 # mount auth routes
 app.include_router(auth_router)
 
@@ -55,4 +99,8 @@ app.include_router(enrich_router)
 app.include_router(cases_router)
 app.include_router(respond_router)
 app.include_router(metrics_router)
-app.include_router(demo_router)
\ No newline at end of file
+app.include_router(demo_router)
+app.include_router(hunt_router)
+app.include_router(timeline_router)
+app.include_router(intel_router)
+app.include_router(playbooks_router)
\ No newline at end of file
@@ -1,46 +1,60 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func
 from datetime import datetime, timedelta, timezone
 
-from ..core.deps import get_db
-from ..models.event import EventNormalized
+from ..core.deps import get_async_read_db
+from ..core.cache import cached_json_async
+from ..models.rollup import EventRollupMinute
 from ..models.detection import Detection
 from ..models.block import BlockRule
+from ..services.rollups import minute_bucket
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
+SUMMARY_TTL = 10  # seconds; ingest, detections and blocks invalidate sooner
+
 def _utcnow():
     return datetime.now(timezone.utc)
 
 @router.get("/summary")
-def metrics_summary(db: Session = Depends(get_db)):
-    now = _utcnow()
-    start_24h = now - timedelta(hours=24)
+async def metrics_summary(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def compute(headers):
+        return await db.run_sync(_summary)
+    return await cached_json_async(request, ["events", "detections", "blocks"], SUMMARY_TTL, compute)
 
-    # counts
-    events_24h = db.query(func.count(EventNormalized.id))\
-                   .filter(EventNormalized.timestamp >= start_24h).scalar() or 0
+def _summary(db: Session):
+    now = _utcnow()
+    start_24h = minute_bucket(now - timedelta(hours=24))
+    first_hour = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
 
-    open_detections = db.query(func.count(Detection.id))\
-                        .filter(Detection.status == "open").scalar() or 0
+    # hourly event counts from the per-minute rollup, in one GROUP BY;
+    # reads at most 24h * 60 rows per (module, action) however many events exist
+    R = EventRollupMinute
+    hour = func.date_trunc("hour", R.bucket, "UTC").label("hour")
+    hourly = db.query(hour, func.sum(R.count))\
+               .filter(R.bucket >= start_24h)\
+               .group_by(hour).all()
+    per_hour = {h.astimezone(timezone.utc): int(cnt or 0) for h, cnt in hourly}
+    events_24h = sum(per_hour.values())
 
-    # detections by severity
-    rows = db.query(Detection.severity, func.count(Detection.id))\
-             .group_by(Detection.severity).all()
-    by_sev = {sev or "unknown": cnt for sev, cnt in rows}
+    # detections by severity and open count in one pass
+    rows = db.query(
+        Detection.severity,
+        func.count(Detection.id),
+        func.count(Detection.id).filter(Detection.status == "open"),
+    ).group_by(Detection.severity).all()
+    by_sev = {sev or "unknown": cnt for sev, cnt, _ in rows}
+    open_detections = sum(n_open for _, _, n_open in rows)
 
     # active blocks
     active_blocks = db.query(func.count(BlockRule.id)).filter(BlockRule.active.is_(True)).scalar() or 0
 
-    # hourly timeseries for events in last 24h
     buckets = []
     for i in range(24):
-        t0 = start_24h + timedelta(hours=i)
-        t1 = t0 + timedelta(hours=1)
-        cnt = db.query(func.count(EventNormalized.id))\
-                .filter(EventNormalized.timestamp >= t0, EventNormalized.timestamp < t1).scalar() or 0
-        buckets.append({"ts": t0.isoformat(), "count": cnt})
+        t0 = first_hour + timedelta(hours=i)
+        buckets.append({"ts": t0.isoformat(), "count": per_hour.get(t0, 0)})
 
     return {
         "events_last_24h": events_24h,
@@ -49,4 +63,4 @@ def metrics_summary(db: Session = Depends(get_db)):
         "blocklist_active": active_blocks,
         "events_hourly_24h": buckets,
         "now": now.isoformat(),
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+
+from ..core.auth_deps import require_roles
+from ..services import playbooks
+
+router = APIRouter(prefix="/playbooks", tags=["playbooks"])
+
+@router.get("")
+def list_playbooks(user = Depends(require_roles("analyst", "admin"))):
+    """Loaded playbooks, files that failed validation, and the global switches."""
+    return playbooks.status()
+
+@router.get("/runs")
+def playbook_runs(limit: int = 50, user = Depends(require_roles("analyst", "admin"))):
+    """Most recent playbook evaluations, newest first, with per-action results."""
+    return playbooks.recent_runs(limit)
+
+@router.post("/reload")
+def reload_playbooks(user = Depends(require_roles("admin"))):
+    playbooks.load(force=True)
+    return playbooks.status()
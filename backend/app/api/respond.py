@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List
+from collections import Counter
 from pydantic import BaseModel
 
-from ..core.deps import get_db
+from ..core.deps import get_db, get_read_db
 from ..core.auth_deps import require_roles
-from ..services.respond import add_block, list_blocks as svc_list_blocks, deactivate_block
+from ..services.respond import add_block, list_blocks as svc_list_blocks, deactivate_block, bulk_block, bulk_unblock
+from ..services.detections import evidence_src_ips
+from ..services import blockfeed
+from ..services.pagination import NEXT_CURSOR_HEADER, next_cursor
 from ..models.block import BlockRule
+from ..models.detection import Detection
 
 router = APIRouter(prefix="/respond", tags=["respond"])
 
+FEED_VERSION_HEADER = "X-Blocklist-Version"
+
 # ---------- Schemas (JSON bodies) ----------
 
 class BlockRequest(BaseModel):
@@ -18,6 +25,18 @@ class BlockRequest(BaseModel):
     ttl_minutes: Optional[int] = None
 
 
+class BulkBlockRequest(BaseModel):
+    ips: List[str] = []
+    detection_id: Optional[int] = None   # block the source IPs of this detection's evidence
+    reason: Optional[str] = None         # defaults to the detection's title
+    ttl_minutes: Optional[int] = None
+
+
+class BulkUnblockRequest(BaseModel):
+    ips: List[str] = []
+    detection_id: Optional[int] = None
+
+
 class BlockOut(BaseModel):
     id: int
     ip: str
@@ -49,32 +68,107 @@ def block_ip(
     user=Depends(require_roles("analyst", "admin")),
 ):
     """
-    Create a temporary block rule.
+    Create a temporary block rule for an IP or CIDR.
     Body (JSON):
       { "ip": "1.2.3.4", "reason": "manual block", "ttl_minutes": 60 }
     """
-    rule = add_block(
-        db,
-        ip=req.ip,
-        reason=req.reason,
-        created_by=user.email,
-        ttl_minutes=req.ttl_minutes,
-    )
+    try:
+        rule = add_block(
+            db,
+            ip=req.ip,
+            reason=req.reason,
+            created_by=user.email,
+            ttl_minutes=req.ttl_minutes,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return BlockOut.from_model(rule)
 
 
+def _bulk_targets(db: Session, ips: List[str], detection_id: Optional[int]):
+    """The request's IPs plus the detection's evidence IPs; (targets, detection or None)."""
+    det = None
+    targets = list(ips)
+    if detection_id is not None:
+        det = db.get(Detection, detection_id)
+        if det is None:
+            raise HTTPException(status_code=404, detail="detection not found")
+        targets += evidence_src_ips(db, detection_id)
+    if not targets:
+        raise HTTPException(status_code=400, detail="give ips or a detection_id with evidence")
+    return targets, det
+
+
+def _bulk_response(results: List[dict], detection_id: Optional[int]):
+    return {
+        "detection_id": detection_id,
+        "counts": dict(Counter(r["status"] for r in results)),
+        "results": results,
+    }
+
+
+@router.post("/blocks/bulk")
+def block_bulk(
+    req: BulkBlockRequest,
+    db: Session = Depends(get_db),
+    user=Depends(require_roles("analyst", "admin")),
+):
+    """
+    Block many IPs/CIDRs at once, and/or every source IP in a detection's evidence.
+    Body (JSON):
+      { "ips": ["1.2.3.4", "10.0.0.0/24"], "detection_id": 42, "reason": "scanner", "ttl_minutes": 60 }
+    Returns one result per target, in order: blocked | exists | duplicate | invalid.
+    """
+    targets, det = _bulk_targets(db, req.ips, req.detection_id)
+    reason = req.reason or (f"detection {det.id}: {det.title}"[:512] if det else None)
+    if not reason:
+        raise HTTPException(status_code=400, detail="reason is required")
+    try:
+        results = bulk_block(db, targets, reason=reason, created_by=user.email, ttl_minutes=req.ttl_minutes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _bulk_response(results, req.detection_id)
+
+
+@router.post("/blocks/bulk/unblock")
+def unblock_bulk(
+    req: BulkUnblockRequest,
+    db: Session = Depends(get_db),
+    user=Depends(require_roles("analyst", "admin")),
+):
+    """
+    Deactivate the active rules on many IPs/CIDRs, and/or on a detection's evidence IPs.
+    Returns one result per target, in order: unblocked | not_blocked | duplicate | invalid.
+    """
+    targets, _ = _bulk_targets(db, req.ips, req.detection_id)
+    try:
+        results = bulk_unblock(db, targets)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _bulk_response(results, req.detection_id)
+
+
 @router.get("/blocks", response_model=List[BlockOut])
 def list_blocks_api(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     user=Depends(require_roles("analyst", "admin")),
     active_only: bool = False,
     limit: int = 200,
     offset: int = 0,
+    cursor: Optional[str] = None,
 ):
     """
     List block rules. Use ?active_only=true to show only active rules.
+    Follow the X-Next-Cursor response header (?cursor=...) for the next page.
     """
-    rows = svc_list_blocks(db, active_only=active_only, limit=limit, offset=offset)
+    try:
+        rows = svc_list_blocks(db, active_only=active_only, limit=limit, offset=offset, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    nxt = next_cursor(rows, limit, "id")
+    if nxt:
+        response.headers[NEXT_CURSOR_HEADER] = nxt
     return [BlockOut.from_model(r) for r in rows]
 
 
@@ -90,4 +184,44 @@ def unblock(
     ok = deactivate_block(db, block_id)
     if not ok:
         raise HTTPException(status_code=404, detail="block not found")
-    return {"ok": True}
\ No newline at end of file
+    return {"ok": True}
+
+
+@router.get("/feed")
+def block_feed(
+    response: Response,
+    since: int = Query(0, ge=0),
+    user=Depends(require_roles("analyst", "admin")),
+):
+    """
+    Blocked IPs/CIDRs added and removed since feed version `since`; poll with
+    the returned `version`. Start from since=0. When `reset` is true, `added`
+    is the full set and should replace the caller's copy.
+    Served from memory: polling does not query the database.
+    """
+    feed = blockfeed.changes(since)
+    response.headers[FEED_VERSION_HEADER] = str(feed["version"])
+    return feed
+
+
+@router.get("/feed/snapshot")
+def block_feed_snapshot(
+    request: Request,
+    format: str = Query("plain", description="plain | ipset | nftables"),
+    user=Depends(require_roles("analyst", "admin")),
+):
+    """
+    Every active blocked IP/CIDR as text: one per line (plain), an
+    `ipset restore` script, or an `nft -f` file. Revalidate with If-None-Match;
+    the ETag changes only when the feed version does.
+    """
+    try:
+        version, body = blockfeed.snapshot(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    etag = f'"blocklist-{version}-{format}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", FEED_VERSION_HEADER: str(version)}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="text/plain", headers=headers)
@@ -0,0 +1,41 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.deps import get_async_read_db
+from ..core.auth_deps import get_current_user_async
+from ..core.cache import cached_json_async
+from ..services.pagination import NEXT_CURSOR_HEADER
+from ..services.timeline import timeline
+
+router = APIRouter(prefix="/timeline", tags=["timeline"])
+
+LIST_TTL = 15  # seconds; ingest, detections and blocks invalidate sooner
+
+@router.get("")
+async def entity_timeline(
+    request: Request,
+    entity: str,
+    db: AsyncSession = Depends(get_async_read_db),
+    user = Depends(get_current_user_async),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+):
+    """
+    Events, detections and blocks for entity=src_ip:<ip> or user:<name>,
+    newest first, in one cursor-paged stream. The window defaults to the
+    last 7 days (at most 90).
+    """
+    async def compute(headers):
+        try:
+            items, nxt = await db.run_sync(timeline, entity, start=start, end=end, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if nxt:
+            headers[NEXT_CURSOR_HEADER] = nxt
+        return items
+
+    return await cached_json_async(request, ["events", "detections", "blocks"], LIST_TTL, compute)
@@ -1,14 +1,15 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from .jwt import decode_token
-from .deps import get_db
+from .deps import get_async_db, get_db
+from .user_cache import CachedUser, user_cache, ensure_subscriber
 from ..services.users import get_user_by_email
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
-def get_current_user(db: Session = Depends(get_db),
-                     creds: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)):
+def _claims(creds: HTTPAuthorizationCredentials | None):
     if creds is None or not creds.scheme.lower() == "bearer":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization")
 
@@ -23,11 +24,33 @@ def get_current_user(db: Session = Depends(get_db),
     sub = payload.get("sub")
     if not sub:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token subject")
+    return sub, payload.get("iat")
 
-    user = get_user_by_email(db, sub)
-    if not user:
+def _cache_user(sub, iat, row) -> CachedUser:
+    if not row:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user = CachedUser(id=row.id, email=row.email, role=row.role)
+    user_cache.put(sub, iat, user)
+    return user
+
+def get_current_user(db: Session = Depends(get_db),
+                     creds: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)):
+    sub, iat = _claims(creds)
+    # cached per token; a miss costs one users lookup
+    ensure_subscriber()
+    user = user_cache.get(sub, iat)
+    if user is None:
+        user = _cache_user(sub, iat, get_user_by_email(db, sub))
+    return user
 
+async def get_current_user_async(db: AsyncSession = Depends(get_async_db),
+                                 creds: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)):
+    # for async routes: a cache hit never leaves the event loop
+    sub, iat = _claims(creds)
+    ensure_subscriber()
+    user = user_cache.get(sub, iat)
+    if user is None:
+        user = _cache_user(sub, iat, await db.run_sync(get_user_by_email, sub))
     return user
 
 def require_roles(*allowed_roles: str):
@@ -36,4 +59,4 @@ def require_roles(*allowed_roles: str):
         if role not in {r.lower() for r in allowed_roles}:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="insufficient role")
         return user
-    return dep
\ No newline at end of file
+    return dep
@@ -0,0 +1,157 @@
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+import hashlib
+import json
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .redis_client import redis_client, async_redis_client
+
+# Response cache for read-heavy GET endpoints.
+#
+# Entries are keyed by path + sorted query params + the current generation of
+# every namespace the response depends on ("events", "detections", ...).
+# Writers call invalidate(ns), which bumps `cache:gen:<ns>` in Redis; every
+# API process sees the new generation on its next lookup, so stale entries
+# are simply never read again and age out through their TTL.
+#
+# Responses carry an ETag; a matching If-None-Match gets a bare 304. Without
+# Redis everything still works, just uncached. The *_async variants do the
+# same through the asyncio Redis client for async routes.
+
+KEY_PREFIX = "cache:resp:"
+GEN_PREFIX = "cache:gen:"
+CACHE_HEADER = "X-Cache"
+
+
+def _gen_key(ns: str) -> str:
+    return f"{GEN_PREFIX}{ns}"
+
+
+def detection_namespace(det_id: int) -> str:
+    return f"detection:{det_id}"
+
+
+def invalidate(*namespaces: str):
+    """Drop every cached response that depends on any of the namespaces."""
+    if not namespaces:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for ns in namespaces:
+            pipe.incr(_gen_key(ns))
+        pipe.execute()
+    except Exception:
+        pass  # redis is optional
+
+
+async def invalidate_async(*namespaces: str):
+    if not namespaces:
+        return
+    try:
+        pipe = async_redis_client.pipeline(transaction=False)
+        for ns in namespaces:
+            pipe.incr(_gen_key(ns))
+        await pipe.execute()
+    except Exception:
+        pass
+
+
+def _cache_key(request: Request, namespaces: List[str], gens: List[str]) -> str:
+    query = sorted(request.query_params.multi_items())
+    raw = json.dumps([request.url.path, query, namespaces, gens], separators=(",", ":"))
+    return KEY_PREFIX + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _etag(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode()).hexdigest()[:32] + '"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    return inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]
+
+
+def _entry(payload: Any, headers: Dict[str, str]) -> Dict[str, Any]:
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":"))
+    return {"body": body, "etag": _etag(body), "headers": headers}
+
+
+def _respond(request: Request, entry: Dict[str, Any], status: str) -> Response:
+    headers = dict(entry.get("headers") or {})
+    headers["ETag"] = entry["etag"]
+    headers["Cache-Control"] = "private, no-cache"  # browsers revalidate with the ETag
+    headers[CACHE_HEADER] = status
+    if _not_modified(request, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+
+def cached_json(
+    request: Request,
+    namespaces: Iterable[str],
+    ttl: int,
+    compute: Callable[[Dict[str, str]], Any],
+    store_if: Callable[[Any], bool] | None = None,
+) -> Response:
+    """
+    Serve compute(headers)'s JSON result through the cache.
+
+    Headers compute() puts in the dict it is given (e.g. X-Next-Cursor) are
+    cached with the body; store_if(payload) can veto caching a result.
+    """
+    namespaces = sorted(namespaces)
+    key = None
+    try:
+        gens = [v or "0" for v in redis_client.mget([_gen_key(ns) for ns in namespaces])]
+        key = _cache_key(request, namespaces, gens)
+        raw = redis_client.get(key)
+        if raw:
+            return _respond(request, json.loads(raw), "HIT")
+    except Exception:
+        key = None
+
+    headers: Dict[str, str] = {}
+    payload = compute(headers)
+    entry = _entry(payload, headers)
+
+    if key and (store_if is None or store_if(payload)):
+        try:
+            redis_client.setex(key, ttl, json.dumps(entry))
+        except Exception:
+            pass
+    return _respond(request, entry, "MISS")
+
+
+async def cached_json_async(
+    request: Request,
+    namespaces: Iterable[str],
+    ttl: int,
+    compute: Callable[[Dict[str, str]], Awaitable[Any]],
+    store_if: Callable[[Any], bool] | None = None,
+) -> Response:
+    """cached_json for async routes; compute is a coroutine function."""
+    namespaces = sorted(namespaces)
+    key = None
+    try:
+        gens = [v or "0" for v in await async_redis_client.mget([_gen_key(ns) for ns in namespaces])]
+        key = _cache_key(request, namespaces, gens)
+        raw = await async_redis_client.get(key)
+        if raw:
+            return _respond(request, json.loads(raw), "HIT")
+    except Exception:
+        key = None
+
+    headers: Dict[str, str] = {}
+    payload = await compute(headers)
+    entry = _entry(payload, headers)
+
+    if key and (store_if is None or store_if(payload)):
+        try:
+            await async_redis_client.setex(key, ttl, json.dumps(entry))
+        except Exception:
+            pass
+    return _respond(request, entry, "MISS")
@@ -3,10 +3,65 @@ from typing import List
 
 class Settings(BaseSettings):
     database_url: str
+    # async driver URL for the async API routes; derived from database_url
+    # (postgresql -> postgresql+psycopg) when unset
+    database_async_url: str | None = None
+    # optional read replica for list, metrics, export and hunt traffic;
+    # reads go to the primary when unset
+    database_read_url: str | None = None
+    database_read_async_url: str | None = None
+
+    # connection pool per engine (the read engines get their own pools)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+
+    # opt-in SQL profiler: per-request/per-rule statement counts, a warning
+    # above sql_max_statements, and a log of statements slower than the threshold
+    sql_profiling: bool = False
+    sql_slow_query_ms: float = 100.0
+    sql_max_statements: int = 50
+    sql_slow_log_size: int = 200
     redis_url: str
     jwt_secret: str = "change-me"
     geoip_db_path: str | None = None
 
+    # where streaming ML detectors checkpoint their state; Redis when unset
+    ml_state_dir: str | None = None
+
+    # resolved-user cache for authenticated requests; the TTL bounds how long
+    # a role change can be missed if its invalidation message is lost
+    user_cache_ttl_seconds: int = 30
+    user_cache_max_entries: int = 10000
+
+    # threat-intel feed files (services/intel.py); checked for changes every N seconds
+    intel_feed_dir: str | None = None
+    intel_reload_seconds: float = 5.0
+
+    # blocklist index: how often a process checks the Redis mirror for changes,
+    # and how often expired block rules are swept to inactive
+    blocklist_refresh_seconds: float = 1.0
+    block_sweep_seconds: int = 30
+
+    # enforcement-point feed (services/blockfeed.py): changelog poll interval per
+    # process, and the ipset / nftables set name used in rendered snapshots
+    block_feed_refresh_seconds: float = 1.0
+    block_feed_set_name: str = "threathunt_block"
+
+    # automated response playbooks (app/playbooks/*.yml unless playbooks_dir is
+    # set). Off unless enabled; playbooks_dry_run forces every playbook into
+    # dry-run, and the global cap bounds runs per minute across all of them
+    playbooks_enabled: bool = False
+    playbooks_dir: str | None = None
+    playbooks_dry_run: bool = False
+    playbooks_poll_seconds: float = 2.0
+    playbooks_max_runs_per_minute: int = 30
+
+    # ad-hoc hunt queries: per-statement time limit and planner row budget
+    hunt_timeout_ms: int = 15000
+    hunt_max_rows: int = 20_000_000
+
     # NEW: allow setting one or more frontend origins (comma-separated)
     frontend_origins: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000", "https://ai-powered-threat-hunting-incident.vercel.app"]
 
@@ -1,14 +1,134 @@
-from sqlalchemy import create_engine, text
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from .config import settings
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+
+class _TimedPool:
+    """Records how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errors = 0  # failed connects and other checkout errors
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        except Exception:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+        finally:
+            waited = time.perf_counter() - t0
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_kwargs(poolclass) -> Dict[str, Any]:
+    return dict(
+        poolclass=poolclass,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+    )
+
+
+def _as_async(sync_url: str) -> str:
+    url = make_url(sync_url)
+    if url.drivername in ("postgresql", "postgresql+psycopg2", "postgres"):
+        url = url.set(drivername="postgresql+psycopg")  # psycopg 3 speaks asyncio natively
+    return url.render_as_string(hide_password=False)
+
+
+engine = create_engine(settings.database_url, **_pool_kwargs(TimedQueuePool))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+def _async_url() -> str:
+    return settings.database_async_url or _as_async(settings.database_url)
+
+# async routes share services with sync code through AsyncSession.run_sync
+async_engine = create_async_engine(_async_url(), **_pool_kwargs(TimedAsyncQueuePool))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replica. Without DATABASE_READ_URL the read names are aliases of the
+# primary engines, so callers never need to check whether one is configured.
+if settings.database_read_url:
+    read_engine = create_engine(settings.database_read_url, **_pool_kwargs(TimedQueuePool))
+    async_read_engine = create_async_engine(
+        settings.database_read_async_url or _as_async(settings.database_read_url),
+        **_pool_kwargs(TimedAsyncQueuePool),
+    )
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+ReadSessionLocal = sessionmaker(bind=read_engine, autocommit=False, autoflush=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
+
+
+def _pool_stats(e: Engine) -> Dict[str, Any]:
+    pool = e.pool
+    out: Dict[str, Any] = {"url": e.url.render_as_string(hide_password=True)}
+    if isinstance(pool, QueuePool):
+        out.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    if isinstance(pool, _TimedPool):
+        with pool._stats_lock:
+            out.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                errors=pool.errors,
+                wait_ms_total=round(pool.wait_total * 1000, 1),
+                wait_ms_avg=round(pool.wait_total * 1000 / pool.checkouts, 3) if pool.checkouts else 0.0,
+                wait_ms_max=round(pool.wait_max * 1000, 1),
+            )
+    return out
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Checkout, overflow and wait statistics for every engine's pool."""
+    engines = {"primary": engine, "primary_async": async_engine.sync_engine}
+    if read_engine is not engine:
+        engines.update(replica=read_engine, replica_async=async_read_engine.sync_engine)
+    return {name: _pool_stats(e) for name, e in engines.items()}
+
+
 def db_ping() -> bool:
     try:
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         return True
     except Exception:
-        return False
\ No newline at end of file
+        return False
@@ -1,9 +1,26 @@
-from typing import Generator
-from .db import SessionLocal
+from typing import AsyncGenerator, Generator
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import SessionLocal, AsyncSessionLocal, ReadSessionLocal, AsyncReadSessionLocal
 
 def get_db() -> Generator:
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db() -> Generator:
+    # replica when configured, otherwise the primary; never write through it
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncReadSessionLocal() as db:
+        yield db
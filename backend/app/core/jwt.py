@@ -12,7 +12,12 @@ def _expiry(minutes: int = 0, days: int = 0) -> datetime:
     return datetime.now(timezone.utc) + timedelta(minutes=minutes, days=days)
 
 def create_access_token(sub: str, extra: Optional[dict]=None) -> str:
-    to_encode: dict[str, Any] = {"sub": sub, "exp": _expiry(minutes=ACCESS_MINUTES), "typ": "access"}
+    to_encode: dict[str, Any] = {
+        "sub": sub,
+        "iat": datetime.now(timezone.utc),
+        "exp": _expiry(minutes=ACCESS_MINUTES),
+        "typ": "access",
+    }
     if extra:
         to_encode.update(extra)
     return jwt.encode(to_encode, settings.jwt_secret, algorithm=ALGO)
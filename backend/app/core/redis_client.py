@@ -1,10 +1,37 @@
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from .config import settings
 
 redis_client = Redis.from_url(settings.redis_url, decode_responses=True)
 
+# for async routes; same server, non-blocking
+async_redis_client = AsyncRedis.from_url(settings.redis_url, decode_responses=True)
+
+# binary-safe client for blobs (e.g. ML detector checkpoints)
+redis_bytes_client = Redis.from_url(settings.redis_url)
+
 def redis_ping() -> bool:
     try:
         return redis_client.ping()
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+# Owner-checked operations on a key holding an owner token (locks, leases):
+# each one acts only while the key still holds the caller's token, so an
+# owner whose lease already expired can't touch its successor's.
+_CAS_DELETE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+_CAS_EXPIRE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0"
+_CAS_SET = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then "
+    "redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3]) return 1 end return 0"
+)
+
+def release_lock(key: str, token: str) -> bool:
+    return bool(redis_client.eval(_CAS_DELETE, 1, key, token))
+
+def renew_lock(key: str, token: str, ttl: int) -> bool:
+    return bool(redis_client.eval(_CAS_EXPIRE, 1, key, token, int(ttl)))
+
+def replace_lock(key: str, expected: str, token: str, ttl: int) -> bool:
+    """Hand the key from `expected` to `token` atomically; False if it changed meanwhile."""
+    return bool(redis_client.eval(_CAS_SET, 1, key, expected, token, int(ttl)))
@@ -0,0 +1,204 @@
+from __future__ import annotations
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from . import telemetry
+
+log = logging.getLogger(__name__)
+
+# Opt-in SQL profiler (SQL_PROFILING=true). Engine cursor events count
+# statements and DB time into the Profile bound to the current context: one
+# per HTTP request (SQLProfileMiddleware) and one per detection rule run
+# (start/finish in the engine). Requests report X-SQL-Count / X-SQL-Time-ms;
+# going over settings.sql_max_statements logs the repeated fingerprints,
+# which is what an N+1 loop looks like. Statements slower than
+# settings.sql_slow_query_ms land in an in-memory slow-query log.
+
+_current: ContextVar[Optional["Profile"]] = ContextVar("sql_profile", default=None)
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                         # string literals
+    (re.compile(r"%\(\w+\)s|\$\d+|(?<![:\w]):\w+"), "?"),          # bind params (pyformat, numeric, named)
+    (re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b"), "?"),               # numeric literals
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?+)"),          # IN lists / value tuples of any length
+    (re.compile(r"(\(\?\+\)|\(\?\))(?:\s*,\s*(?:\(\?\+\)|\(\?\)))+"), r"\1, ..."),  # multi-row VALUES
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_sql(sql: str) -> str:
+    for pattern, repl in _FINGERPRINT_RULES:
+        sql = pattern.sub(repl, sql)
+    return sql.strip()
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.md5(normalize_sql(sql).encode()).hexdigest()[:12]
+
+
+class Profile:
+    __slots__ = ("label", "statements", "db_time", "by_statement", "token")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.statements = 0
+        self.db_time = 0.0
+        self.by_statement: Counter = Counter()
+        self.token = None
+
+    def repeated(self, n: int = 3) -> List[Dict[str, Any]]:
+        """The most repeated statements, fingerprinted."""
+        return [
+            {"fingerprint": fingerprint(sql), "count": count, "sql": normalize_sql(sql)[:300]}
+            for sql, count in self.by_statement.most_common(n)
+            if count > 1
+        ]
+
+
+class SlowQueryLog:
+    """Last N slow statements plus per-fingerprint totals."""
+
+    def __init__(self, size: int, max_fingerprints: int = 1000):
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self._totals: Dict[str, Dict[str, Any]] = {}
+        self._max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, seconds: float, label: Optional[str]):
+        normalized = normalize_sql(sql)
+        fp = hashlib.md5(normalized.encode()).hexdigest()[:12]
+        ms = round(seconds * 1000, 1)
+        with self._lock:
+            self._recent.append({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "fingerprint": fp,
+                "ms": ms,
+                "context": label,
+                "sql": normalized[:1000],
+            })
+            t = self._totals.get(fp)
+            if t is None:
+                if len(self._totals) >= self._max_fingerprints:
+                    return
+                t = self._totals[fp] = {"fingerprint": fp, "sql": normalized[:1000], "count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            t["count"] += 1
+            t["total_ms"] = round(t["total_ms"] + ms, 1)
+            t["max_ms"] = max(t["max_ms"], ms)
+
+    def snapshot(self, limit: int = 50) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self._recent)[-limit:][::-1]
+            top = sorted(self._totals.values(), key=lambda t: t["total_ms"], reverse=True)[:limit]
+        return {"threshold_ms": settings.sql_slow_query_ms, "recent": recent, "top": [dict(t) for t in top]}
+
+
+slow_log = SlowQueryLog(settings.sql_slow_log_size)
+
+sql_budget_exceeded = telemetry.Counter(
+    "sql_statement_budget_exceeded_total",
+    "Requests and rule runs that issued more than SQL_MAX_STATEMENTS statements.",
+    ("context",),
+)
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sqlprofile_t0", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("sqlprofile_t0")
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    prof = _current.get()
+    if prof is not None:
+        prof.statements += 1
+        prof.db_time += elapsed
+        prof.by_statement[statement] += 1
+    if elapsed * 1000 >= settings.sql_slow_query_ms:
+        slow_log.record(statement, elapsed, prof.label if prof else None)
+
+
+_installed = False
+
+
+def install():
+    """Attach the cursor hooks to every engine (no-op unless SQL_PROFILING is on)."""
+    global _installed
+    if _installed or not settings.sql_profiling:
+        return
+    event.listen(Engine, "before_cursor_execute", _before)
+    event.listen(Engine, "after_cursor_execute", _after)
+    _installed = True
+
+
+def enabled() -> bool:
+    return _installed
+
+
+def start(label: str) -> Optional[Profile]:
+    """Bind a fresh Profile to the current context; None when profiling is off."""
+    if not _installed:
+        return None
+    prof = Profile(label)
+    prof.token = _current.set(prof)
+    return prof
+
+
+def finish(prof: Optional[Profile], budget_context: str = "request") -> None:
+    """Unbind prof and log it; warns with the repeated statements when over budget."""
+    if prof is None:
+        return
+    try:
+        _current.reset(prof.token)
+    except ValueError:
+        _current.set(None)  # finished from a different context (e.g. a streamed body)
+    if prof.statements > settings.sql_max_statements:
+        sql_budget_exceeded.inc(budget_context)
+        log.warning(
+            "%s issued %d SQL statements (budget %d, %.1f ms in DB); most repeated: %s",
+            prof.label, prof.statements, settings.sql_max_statements, prof.db_time * 1000, prof.repeated(),
+        )
+    else:
+        log.debug("%s: %d SQL statements, %.1f ms in DB", prof.label, prof.statements, prof.db_time * 1000)
+
+
+class SQLProfileMiddleware:
+    """Profiles each HTTP request and adds X-SQL-Count / X-SQL-Time-ms headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _installed:
+            return await self.app(scope, receive, send)
+
+        prof = start(f'{scope.get("method", "")} {scope.get("path", "")}')
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # for streamed bodies this covers the statements issued so far
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-count", str(prof.statements).encode()))
+                headers.append((b"x-sql-time-ms", f"{prof.db_time * 1000:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                prof.label = f'{scope.get("method", "")} {route}'
+            finish(prof)
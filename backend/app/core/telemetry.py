@@ -0,0 +1,220 @@
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import threading
+import time
+
+# In-process metrics rendered in the Prometheus text exposition format at
+# GET /metrics. Deliberately tiny: a counter bump or histogram observation
+# is a dict lookup and a few float ops under a lock, so instrumenting the hot
+# paths costs microseconds per request. Values are per process; with several
+# uvicorn workers, scrape each one (or sum in the query).
+
+LabelValues = Tuple[str, ...]
+
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _check(self, labels: LabelValues):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self.samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            try:
+                self._values[labels] += amount
+            except KeyError:
+                self._check(labels)
+                self._values[labels] = amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_num(v)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last)], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                self._check(labels)
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][i] += 1
+            entry[1][0] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(labels, list(counts), total[0]) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in items:
+            running = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                bound = 'le="%s"' % _num(le)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, bound)} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {running}"
+
+
+def collector(fn: Callable[[], Iterable[str]]) -> Callable[[], Iterable[str]]:
+    """Register fn to produce exposition lines at scrape time (for gauges read from elsewhere)."""
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _registry:
+        lines.extend(m.render())
+    for fn in _collectors:
+        try:
+            lines.extend(fn())
+        except Exception:
+            pass  # a broken collector must not take the scrape down
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- metrics ---------------------------------------------------------------
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+
+ingest_events = Counter("ingest_events_total", "Events received by ingest, by outcome.", ("outcome",))
+ingest_batches = Counter("ingest_batches_total", "Ingest batches committed.")
+
+geoip_lookups = Counter("geoip_lookups_total", "Country lookups by cache result.", ("result",))
+
+rule_duration = Histogram(
+    "detection_rule_duration_seconds", "Run time of each detection rule.", ("rule", "kind"),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+rule_detections = Counter("detection_rule_detections_total", "Detections created by each rule.", ("rule", "kind"))
+rule_failures = Counter("detection_rule_failures_total", "Rule runs that raised.", ("rule", "kind"))
+
+
+def record_ingest(ok: int, failed: int):
+    ingest_batches.inc()
+    if ok:
+        ingest_events.inc("ok", amount=ok)
+    if failed:
+        ingest_events.inc("failed", amount=failed)
+
+
+@collector
+def _pool_metrics() -> Iterable[str]:
+    from .db import pool_stats  # the engines import config; keep this module import-light
+
+    gauges = (
+        ("db_pool_size", "gauge", "size", "Configured pool size."),
+        ("db_pool_checked_out", "gauge", "checked_out", "Connections currently checked out."),
+        ("db_pool_overflow", "gauge", "overflow", "Connections open beyond the pool size."),
+        ("db_pool_checkouts_total", "counter", "checkouts", "Connection checkouts."),
+        ("db_pool_timeouts_total", "counter", "timeouts", "Checkouts that timed out waiting."),
+        ("db_pool_errors_total", "counter", "errors", "Checkouts that failed for another reason, e.g. connect errors."),
+    )
+    stats = pool_stats()
+    for name, kind, key, help in gauges:
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} {kind}"
+        for engine, s in stats.items():
+            if key in s:
+                yield f'{name}{{engine="{engine}"}} {s[key]}'
+    yield "# HELP db_pool_checkout_wait_seconds_total Time spent waiting for a connection."
+    yield "# TYPE db_pool_checkout_wait_seconds_total counter"
+    for engine, s in stats.items():
+        if "wait_ms_total" in s:
+            yield f'db_pool_checkout_wait_seconds_total{{engine="{engine}"}} {s["wait_ms_total"] / 1000}'
+
+
+# --- ASGI middleware ------------------------------------------------------
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and labels it with the matched route template
+    (not the raw path, so ids don't explode the label space). Plain ASGI
+    rather than BaseHTTPMiddleware, which adds a task and a memory stream
+    per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_latency.observe(time.perf_counter() - t0, method, path)
+            http_requests.inc(method, path, str(status))
@@ -0,0 +1,121 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Set, Tuple
+import logging
+import threading
+import time
+
+from .config import settings
+from .redis_client import redis_client
+
+log = logging.getLogger(__name__)
+
+# Resolved users for get_current_user, keyed by (token subject, token iat).
+# Entries expire after settings.user_cache_ttl_seconds, which bounds how long
+# a role change or deletion can go unnoticed if an invalidation is missed.
+# Invalidations are published on a Redis channel so every worker drops its
+# copy at once; without Redis the TTL alone applies.
+
+CHANNEL = "auth:user:invalidate"
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Detached snapshot of the fields routes read from the current user."""
+    id: int
+    email: str
+    role: str
+
+
+class UserCache:
+    """Bounded, thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[str, Any], Tuple[float, CachedUser]]" = OrderedDict()
+        self._by_sub: Dict[str, Set[Tuple[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, sub: str, iat: Any) -> CachedUser | None:
+        key = (sub, iat)
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, user = hit
+            if expires < time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return user
+
+    def put(self, sub: str, iat: Any, user: CachedUser):
+        key = (sub, iat)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, user)
+            self._data.move_to_end(key)
+            self._by_sub.setdefault(sub, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._pop(next(iter(self._data)))
+
+    def drop(self, sub: str):
+        with self._lock:
+            for key in list(self._by_sub.get(sub, ())):
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_sub.clear()
+
+    def _pop(self, key: Tuple[str, Any]):
+        # caller holds the lock
+        self._data.pop(key, None)
+        keys = self._by_sub.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_sub[key[0]]
+
+
+user_cache = UserCache(settings.user_cache_max_entries, settings.user_cache_ttl_seconds)
+
+_subscriber: threading.Thread | None = None
+_subscriber_lock = threading.Lock()
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            # anything published while we were disconnected was missed
+            user_cache.clear()
+            for msg in pubsub.listen():
+                if msg.get("type") == "message":
+                    user_cache.drop(msg["data"])
+        except Exception:
+            log.debug("user cache subscriber disconnected; retrying", exc_info=True)
+        time.sleep(5)
+
+
+def ensure_subscriber():
+    """Start the invalidation listener on first use (once per process)."""
+    global _subscriber
+    if _subscriber is not None:
+        return
+    with _subscriber_lock:
+        if _subscriber is None:
+            _subscriber = threading.Thread(target=_listen, name="user-cache-invalidate", daemon=True)
+            _subscriber.start()
+
+
+def invalidate_user(email: str):
+    """Forget a user in this process and tell the other workers to do the same."""
+    user_cache.drop(email)
+    try:
+        redis_client.publish(CHANNEL, email)
+    except Exception:
+        pass  # other workers catch up within the TTL
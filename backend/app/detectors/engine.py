@@ -7,6 +7,7 @@ import importlib.util
 import logging
 import sys
 import re
+import time
 
 import yaml
 from sqlalchemy import select, and_, func
@@ -14,6 +15,9 @@ from sqlalchemy.orm import Session
 
 from ..models.event import EventNormalized
 from ..models.detection import Detection
+from ..core.cache import invalidate
+from ..core import telemetry, sqlprofile
+from ..services.detections import link_evidence
 
 
 log = logging.getLogger(__name__)
@@ -134,21 +138,26 @@ def load_py_rules(rules_dir: Path) -> List[Dict[str, Any]]:
         name = getattr(mod, "NAME", None)
         run_fn = getattr(mod, "run", None)
         if isinstance(name, str) and callable(run_fn):
-            py_rules.append({"id": name, "callable": run_fn})
+            # optional checkpoint(): persist streaming state, called only after
+            # the rule's detections are committed
+            py_rules.append({"id": name, "callable": run_fn, "checkpoint": getattr(mod, "checkpoint", None)})
     return py_rules
 
 
 # ---------------- YAML rule runner ----------------
 
-def run_yaml_rule(db: Session, rule: Dict[str, Any]) -> int:
+def compile_yaml_rule(rule: Dict[str, Any], end: datetime | None = None) -> Dict[str, Any]:
+    """
+    Build the aggregate statement for a YAML rule without running it.
+    Returns the statement plus what run_yaml_rule needs to interpret rows.
+    """
     rid = rule.get("id") or "unnamed"
-    severity = (rule.get("severity") or "medium").lower()
     where = rule.get("where") or {}
     group_by = rule.get("group_by") or []
     window = parse_window(rule.get("window", "5m"))
     th_key, th_value, distinct_field = _parse_threshold(rule.get("threshold", {"count": ">= 10"}))
 
-    end = now_utc()
+    end = end or now_utc()
     start = end - window
 
     conds = [EventNormalized.timestamp >= start, EventNormalized.timestamp < end]
@@ -181,26 +190,51 @@ def run_yaml_rule(db: Session, rule: Dict[str, Any]) -> int:
     else:
         stmt = select(count_expr.label("cnt")).where(and_(*conds))
 
-    rows = db.execute(stmt).all()
-    created = 0
+    return {
+        "id": rid,
+        "severity": (rule.get("severity") or "medium").lower(),
+        "window": window,
+        "threshold": (th_key, th_value),
+        "distinct_field": distinct_field,
+        "conds": conds,
+        "group_cols": group_cols,
+        "stmt": stmt,
+    }
+
+
+def evidence_query(compiled: Dict[str, Any], groups: List[Any]):
+    """Latest 50 event ids behind one group of a compiled YAML rule."""
+    sel_ids = select(EventNormalized.id).where(and_(*compiled["conds"]))
+    for gi, gcol in enumerate(compiled["group_cols"]):
+        sel_ids = sel_ids.where(gcol == groups[gi])
+    return sel_ids.order_by(EventNormalized.id.desc()).limit(50)
+
+
+def run_yaml_rule(db: Session, rule: Dict[str, Any]) -> int:
+    compiled = compile_yaml_rule(rule)
+    rid = compiled["id"]
+    severity = compiled["severity"]
+    window = compiled["window"]
+    th_key, th_value = compiled["threshold"]
+    distinct_field = compiled["distinct_field"]
+    group_cols = compiled["group_cols"]
+
+    rows = db.execute(compiled["stmt"]).all()
+    created: List[Detection] = []
 
     for row in rows:
         if group_cols:
             *groups, cnt = row
         else:
             (cnt,) = row
+            groups = []
 
         if cnt is None:
             continue
 
         if th_key == "count" and _op_count_ge(cnt, th_value):
             # Collect evidence event IDs (latest first, cap to 50)
-            sel_ids = select(EventNormalized.id).where(and_(*conds))
-            if group_cols:
-                for gi, gcol in enumerate(group_cols):
-                    sel_ids = sel_ids.where(gcol == groups[gi])
-            sel_ids = sel_ids.order_by(EventNormalized.id.desc()).limit(50)
-            ev_ids = [r[0] for r in db.execute(sel_ids).all()]
+            ev_ids = [r[0] for r in db.execute(evidence_query(compiled, groups)).all()]
 
             window_str = str(window)
             group_repr = f"{groups if group_cols else 'all'}"
@@ -225,17 +259,18 @@ def run_yaml_rule(db: Session, rule: Dict[str, Any]) -> int:
                 tags=[rid, "rule"],
             )
             db.add(det)
-            created += 1
+            created.append(det)
 
     if created:
+        link_evidence(db, created)
         db.commit()
-    return created
+    return len(created)
 
 
 # ---------------- Python rule runner ----------------
 
 def persist_python_findings(db: Session, rid: str, findings: List[Dict[str, Any]]) -> int:
-    created = 0
+    created: List[Detection] = []
     for f in findings or []:
         ev_ids = list(map(int, f.get("evidence_event_ids", [])))
         severity = (f.get("severity") or "medium").lower()
@@ -254,53 +289,93 @@ def persist_python_findings(db: Session, rid: str, findings: List[Dict[str, Any]
             tags=[rid, "rule"],
         )
         db.add(det)
-        created += 1
+        created.append(det)
     if created:
+        link_evidence(db, created)
         db.commit()
-    return created
+    return len(created)
 
 
 # ---------------- entrypoint ----------------
 
-def run_all_rules(db: Session, rules_dir: Path) -> Dict[str, int]:
+def run_all_rules(
+    db: Session,
+    rules_dir: Path,
+    on_progress: Callable[[str, int, int, int], None] | None = None,
+) -> Dict[str, int]:
+    """
+    Run every YAML, Python and ML rule. If given, on_progress(rule_id, count,
+    done, total) is called after each rule finishes.
+    """
     results: Dict[str, int] = {}
 
+    yaml_rules = load_yaml_rules(rules_dir)
+    py_rules = load_py_rules(rules_dir)
+    ml_rules = load_py_rules(rules_dir.parent / "ml")  # detectors/ml/*.py
+    total = len(yaml_rules) + len(py_rules) + len(ml_rules)
+    done = 0
+
+    def _report(rid: str, kind: str, started: float, prof):
+        nonlocal done
+        done += 1
+        sqlprofile.finish(prof, "rule")
+        telemetry.rule_duration.observe(time.perf_counter() - started, rid, kind)
+        if results.get(rid, 0) < 0:
+            telemetry.rule_failures.inc(rid, kind)
+        if results.get(rid, 0) > 0:
+            telemetry.rule_detections.inc(rid, kind, amount=results[rid])
+            invalidate("detections")
+        if on_progress:
+            on_progress(rid, results.get(rid, 0), done, total)
+
     # YAML rules
-    for rule in load_yaml_rules(rules_dir):
+    for rule in yaml_rules:
         rid = rule.get("id", "unnamed")
+        started = time.perf_counter()
+        prof = sqlprofile.start(f"rule {rid}")
         try:
             c = run_yaml_rule(db, rule)
             results[rid] = c
         except Exception:
             log.exception("failed running YAML rule '%s'", rid)
             results[rid] = -1
+        _report(rid, "yaml", started, prof)
 
     # Python rules
-    for pr in load_py_rules(rules_dir):
+    for pr in py_rules:
         rid = pr["id"]
+        started = time.perf_counter()
+        prof = sqlprofile.start(f"rule {rid}")
         run_fn: Callable[[Session, datetime | None, datetime | None], List[Dict[str, Any]]] = pr["callable"]
         try:
             end = now_utc()
             start = end - timedelta(minutes=10)  # default timebox (rule may ignore)
             findings = run_fn(db, since=start, until=end)
             c = persist_python_findings(db, rid, findings)
+            if pr["checkpoint"]:
+                pr["checkpoint"]()
             results[rid] = results.get(rid, 0) + c
         except Exception:
             log.exception("failed running Python rule '%s'", rid)
             results[rid] = -1
+        _report(rid, "python", started, prof)
 
-    # ML rules (detectors/ml/*.py)
-    ml_dir = rules_dir.parent / "ml"
-    for pr in load_py_rules(ml_dir):
+    # ML rules
+    for pr in ml_rules:
         rid = pr["id"]
+        started = time.perf_counter()
+        prof = sqlprofile.start(f"rule {rid}")
         run_fn = pr["callable"]
         try:
             end = now_utc()
             start = end - timedelta(hours=24)
             findings = run_fn(db, since=start, until=end)
             c = persist_python_findings(db, rid, findings)
+            if pr["checkpoint"]:
+                pr["checkpoint"]()
             results[rid] = results.get(rid, 0) + c
         except Exception:
             results[rid] = -1
+        _report(rid, "ml", started, prof)
 
-    return results
\ No newline at end of file
+    return results
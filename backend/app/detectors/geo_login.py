@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 
 from ..models.event import EventNormalized
 from ..models.detection import Detection
+from ..services.detections import link_evidence
 
 RID = "Geo-Rare-Login"
 SEVERITY = "medium"
@@ -66,7 +67,7 @@ def run(db: Session) -> int:
     for user, country in baseline_rows:
         baseline.setdefault(user, set()).add(country)
 
-    created = 0
+    created: List[Detection] = []
 
     for ev_id, user, country, ts in recent:
         # if user has no baseline -> treat first seen countries in last 24h as rare (optional: require >=1 baseline)
@@ -91,8 +92,9 @@ def run(db: Session) -> int:
                 features_json={"user": user, "country": country, "timestamp": ts.isoformat()},
             )
             db.add(det)
-            created += 1
+            created.append(det)
 
     if created:
+        link_evidence(db, created)
         db.commit()
-    return created
\ No newline at end of file
+    return len(created)
\ No newline at end of file
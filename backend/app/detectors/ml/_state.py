@@ -0,0 +1,64 @@
+from __future__ import annotations
+import io
+import os
+import logging
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from backend.app.core.config import settings
+from backend.app.core.redis_client import redis_bytes_client
+
+# Checkpoints for the streaming ML detectors. A state is a flat dict of NumPy
+# arrays stored as one .npz blob: on disk when ML_STATE_DIR is set, otherwise
+# in Redis so every worker resumes from the same baseline.
+
+log = logging.getLogger(__name__)
+
+REDIS_PREFIX = "ml:state:"
+
+
+def _dumps(arrays: Dict[str, np.ndarray]) -> bytes:
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def _loads(blob: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(blob), allow_pickle=False) as z:
+        return {k: z[k] for k in z.files}
+
+
+def load_state(name: str) -> Dict[str, np.ndarray] | None:
+    try:
+        if settings.ml_state_dir:
+            path = Path(settings.ml_state_dir) / f"{name}.npz"
+            if not path.exists():
+                return None
+            blob = path.read_bytes()
+        else:
+            blob = redis_bytes_client.get(f"{REDIS_PREFIX}{name}")
+            if not blob:
+                return None
+        return _loads(blob)
+    except Exception:
+        log.exception("failed to load ML state '%s'", name)
+        return None
+
+
+def save_state(name: str, arrays: Dict[str, np.ndarray]) -> bool:
+    try:
+        blob = _dumps(arrays)
+        if settings.ml_state_dir:
+            d = Path(settings.ml_state_dir)
+            d.mkdir(parents=True, exist_ok=True)
+            tmp = d / f"{name}.npz.tmp"
+            tmp.write_bytes(blob)
+            os.replace(tmp, d / f"{name}.npz")  # atomic swap
+        else:
+            redis_bytes_client.set(f"{REDIS_PREFIX}{name}", blob)
+        return True
+    except Exception:
+        log.exception("failed to save ML state '%s'", name)
+        return False
@@ -0,0 +1,323 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+import math
+import numpy as np
+from sqlalchemy import select, and_
+from sqlalchemy.orm import Session
+
+from backend.app.models.event import EventNormalized
+from backend.app.detectors.ml._state import load_state, save_state
+
+NAME = "Behavior-Baseline"
+STATE_KEY = "behavior_baseline"
+
+# Parameters
+WINDOW_HOURS = 24          # warm-up window when no checkpoint exists yet
+MAX_EVENTS = 50000         # events consumed per run (rest picked up next run)
+FAST_TAU_S = 300.0         # short-term EWMA time constant (5 min)
+SLOW_TAU_S = 86400.0       # long-term EWMA time constant (24 h)
+SURGE_MIN = 6.0            # decayed failures needed before a surge can fire
+SURGE_RATIO = 8.0          # fast rate must exceed baseline by this factor
+SURGE_PRIOR = 1.0          # expected fast count for entities without history
+PROFILE_HALF_LIFE_DAYS = 28.0
+PROFILE_MIN_EVENTS = 50.0  # decayed activity needed before hours are judged
+OFF_HOURS_PROB = 0.01      # share of activity (hour ±1) below which it's unusual
+ALERT_COOLDOWN_S = 3600.0  # at most one alert per entity and kind per hour
+TOP_N = 20
+PRUNE_EPS = 0.01           # decayed activity below which an entity is forgotten
+MAX_IPS = 200_000          # entities kept per table; the least active go first
+MAX_USERS = 20_000
+
+HOURS_PER_WEEK = 168
+_PROFILE_TAU_S = PROFILE_HALF_LIFE_DAYS * 86400.0 / math.log(2)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _is_failure(action: str | None) -> bool:
+    return bool(action) and "failed" in action
+
+
+def _hour_of_week(ts: datetime) -> int:
+    ts = ts.astimezone(timezone.utc)
+    return ts.weekday() * 24 + ts.hour
+
+
+# columns per table: name -> (dtype, per-row shape)
+_FAILURE_COLUMNS = {
+    "fast": (np.float32, ()),
+    "slow": (np.float32, ()),
+    "last_ts": (np.float64, ()),
+    "surge_alert_ts": (np.float64, ()),
+}
+_PROFILE_COLUMNS = {
+    "profile": (np.float32, (HOURS_PER_WEEK,)),
+    "profile_total": (np.float32, ()),
+    "profile_ts": (np.float64, ()),
+    "hours_alert_ts": (np.float64, ()),
+}
+
+
+class _Table:
+    """
+    Per-entity state in parallel NumPy arrays; a dict maps the entity (an IP
+    or a user name) to its row so every update is O(1).
+    """
+
+    def __init__(self, columns: Dict[str, Tuple[Any, Tuple[int, ...]]], cap_rows: int,
+                 state: Dict[str, np.ndarray] | None = None, prefix: str = "", capacity: int = 1024):
+        self.columns = columns
+        self.cap_rows = cap_rows
+        self.keys: List[str] = [str(k) for k in state[prefix + "keys"]] if state else []
+        n = len(self.keys)
+        cap = max(capacity, 2 * n)
+        for name, (dtype, shape) in columns.items():
+            a = np.zeros((cap,) + shape, dtype=dtype)
+            if n:
+                a[:n] = state[prefix + name]
+            setattr(self, name, a)
+        self.index: Dict[str, int] = {k: i for i, k in enumerate(self.keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def row(self, key: str) -> int:
+        i = self.index.get(key)
+        if i is None:
+            i = len(self.keys)
+            if i >= len(self.fast):
+                for name in self.columns:
+                    a = getattr(self, name)
+                    grown = np.zeros((2 * len(a),) + a.shape[1:], dtype=a.dtype)
+                    grown[: len(a)] = a
+                    setattr(self, name, grown)
+            self.keys.append(key)
+            self.index[key] = i
+        return i
+
+    def prune(self, now: float):
+        """
+        Drop entities whose decayed activity fell below PRUNE_EPS (and that are
+        not in an alert cooldown), then keep at most cap_rows of the busiest.
+        """
+        n = len(self.keys)
+        if not n:
+            return
+        age = np.maximum(now - self.last_ts[:n], 0.0)
+        weight = self.slow[:n] * np.exp(-age / SLOW_TAU_S) + self.fast[:n] * np.exp(-age / FAST_TAU_S)
+        cooling = now - self.surge_alert_ts[:n] < ALERT_COOLDOWN_S
+        if "profile_total" in self.columns:
+            p_age = np.maximum(now - self.profile_ts[:n], 0.0)
+            weight = weight + self.profile_total[:n] * np.exp(-p_age / _PROFILE_TAU_S)
+            cooling |= now - self.hours_alert_ts[:n] < ALERT_COOLDOWN_S
+        keep = np.nonzero((weight >= PRUNE_EPS) | cooling)[0]
+        if len(keep) > self.cap_rows:
+            keep = np.sort(keep[np.argpartition(-weight[keep], self.cap_rows - 1)[: self.cap_rows]])
+        if len(keep) == n:
+            return
+        for name in self.columns:
+            a = getattr(self, name)
+            out = np.zeros((max(1024, 2 * len(keep)),) + a.shape[1:], dtype=a.dtype)
+            out[: len(keep)] = a[keep]
+            setattr(self, name, out)
+        self.keys = [self.keys[i] for i in keep]
+        self.index = {k: i for i, k in enumerate(self.keys)}
+
+    def to_state(self, prefix: str) -> Dict[str, np.ndarray]:
+        n = len(self.keys)
+        out = {prefix + "keys": np.array(self.keys, dtype=str)}
+        for name in self.columns:
+            out[prefix + name] = getattr(self, name)[:n]
+        return out
+
+
+def _split_legacy(state: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Convert the old single-table layout ("ip:x"/"user:x" keys in one array set)."""
+    keys = [str(k) for k in state["keys"]]
+    out: Dict[str, np.ndarray] = {"last_id": state["last_id"]}
+    for prefix, columns in (("ip_", _FAILURE_COLUMNS), ("user_", {**_FAILURE_COLUMNS, **_PROFILE_COLUMNS})):
+        kind = prefix[:-1] + ":"
+        rows = [i for i, k in enumerate(keys) if k.startswith(kind)]
+        out[prefix + "keys"] = np.array([keys[i][len(kind):] for i in rows], dtype=str)
+        for name in columns:
+            out[prefix + name] = state[name][rows]
+    return out
+
+
+class _Baselines:
+    """Failure EWMAs for source IPs; failure EWMAs and hour-of-week profiles for users."""
+
+    def __init__(self, state: Dict[str, np.ndarray] | None = None):
+        if state and "keys" in state:
+            state = _split_legacy(state)
+        self.ips = _Table(_FAILURE_COLUMNS, MAX_IPS, state, "ip_")
+        self.users = _Table({**_FAILURE_COLUMNS, **_PROFILE_COLUMNS}, MAX_USERS, state, "user_")
+        self.last_id = int(state["last_id"][0]) if state else 0
+
+    @staticmethod
+    def observe_failure(tab: _Table, i: int, t: float) -> Tuple[float, float]:
+        """Decay both EWMA counters to t, count one failure; returns (fast, expected_fast)."""
+        dt = max(0.0, t - tab.last_ts[i]) if tab.last_ts[i] else 0.0
+        fast = tab.fast[i] * math.exp(-dt / FAST_TAU_S)
+        slow = tab.slow[i] * math.exp(-dt / SLOW_TAU_S)
+        # baseline before this event, scaled to the fast horizon
+        expected = max(slow * FAST_TAU_S / SLOW_TAU_S, SURGE_PRIOR)
+        fast += 1.0
+        slow += 1.0
+        tab.fast[i] = fast
+        tab.slow[i] = slow
+        tab.last_ts[i] = max(t, tab.last_ts[i])
+        return float(fast), float(expected)
+
+    def observe_activity(self, i: int, t: float, how: int) -> Tuple[float, float]:
+        """Score hour-of-week `how` against the user's profile, then learn it; returns (share, total)."""
+        u = self.users
+        dt = max(0.0, t - u.profile_ts[i]) if u.profile_ts[i] else 0.0
+        if dt:
+            decay = math.exp(-dt / _PROFILE_TAU_S)
+            u.profile[i] *= decay
+            u.profile_total[i] *= decay
+        total = float(u.profile_total[i])
+        prof = u.profile[i]
+        near = prof[how] + prof[(how - 1) % HOURS_PER_WEEK] + prof[(how + 1) % HOURS_PER_WEEK]
+        share = float(near) / total if total > 0 else 1.0
+        prof[how] += 1.0
+        u.profile_total[i] += 1.0
+        u.profile_ts[i] = max(t, u.profile_ts[i])
+        return share, total
+
+    def prune(self, now: float):
+        self.ips.prune(now)
+        self.users.prune(now)
+
+    def to_state(self) -> Dict[str, np.ndarray]:
+        return {
+            **self.ips.to_state("ip_"),
+            **self.users.to_state("user_"),
+            "last_id": np.array([self.last_id], dtype=np.int64),
+        }
+
+
+_pending: Dict[str, np.ndarray] | None = None
+
+
+def checkpoint():
+    """Save the state from the last run; the engine calls this once its detections are committed."""
+    global _pending
+    if _pending is not None:
+        save_state(STATE_KEY, _pending)
+        _pending = None
+
+
+def run(db: Session, since: datetime | None = None, until: datetime | None = None) -> List[Dict[str, Any]]:
+    """
+    Streaming per-entity baselines: EWMA failure rates per src_ip/user and
+    hour-of-week activity profiles per user. Each run consumes only events
+    newer than the checkpoint, so there is nothing to retrain. The advanced
+    state is saved by checkpoint() once the findings are committed.
+    """
+    global _pending
+    _pending = None
+    if not until:
+        until = _utcnow()
+    if not since:
+        since = until - timedelta(hours=WINDOW_HOURS)
+
+    state = load_state(STATE_KEY)
+    b = _Baselines(state)
+
+    ev = EventNormalized
+    conds = [ev.id > b.last_id, ev.timestamp <= until]
+    if state is None:
+        conds.append(ev.timestamp >= since)  # warm up on the recent window only
+    stmt = (
+        select(ev.id, ev.timestamp, ev.event_action, ev.src_ip, ev.user)
+        .where(and_(*conds))
+        .order_by(ev.id.asc())
+        .limit(MAX_EVENTS)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        return []
+
+    # (entity key, kind) -> [score, evidence ids, detail]
+    hits: Dict[Tuple[str, str], List[Any]] = {}
+
+    def _hit(key: str, kind: str, score: float, eid: int, detail: Dict[str, Any]):
+        h = hits.get((key, kind))
+        if h is None:
+            hits[(key, kind)] = [score, [eid], detail]
+            return
+        h[1].append(eid)
+        if score > h[0]:
+            h[0], h[2] = score, detail
+
+    for eid, ts, action, ip, user in rows:
+        t = ts.timestamp()
+        b.last_id = max(b.last_id, eid)
+
+        if _is_failure(action):
+            for tab, kind, entity in ((b.ips, "ip", ip), (b.users, "user", user)):
+                if not entity:
+                    continue
+                key = f"{kind}:{entity}"
+                i = tab.row(entity)
+                fast, expected = b.observe_failure(tab, i, t)
+                if fast >= SURGE_MIN and fast >= SURGE_RATIO * expected:
+                    if (key, "surge") in hits or t - tab.surge_alert_ts[i] >= ALERT_COOLDOWN_S:
+                        tab.surge_alert_ts[i] = t
+                        _hit(key, "surge", fast / expected, eid, {
+                            "fast_count": round(fast, 2),
+                            "expected": round(expected, 3),
+                            "action": action,
+                        })
+
+        if user:
+            key = f"user:{user}"
+            i = b.users.row(user)
+            how = _hour_of_week(ts)
+            share, total = b.observe_activity(i, t, how)
+            if total >= PROFILE_MIN_EVENTS and share < OFF_HOURS_PROB:
+                if (key, "hours") in hits or t - b.users.hours_alert_ts[i] >= ALERT_COOLDOWN_S:
+                    b.users.hours_alert_ts[i] = t
+                    _hit(key, "hours", 1.0 - share, eid, {
+                        "hour_of_week": how,
+                        "share": round(share, 4),
+                        "profile_events": round(total, 1),
+                    })
+
+    b.prune(max(r[1] for r in rows).timestamp())
+    _pending = b.to_state()
+
+    ranked = sorted(hits.items(), key=lambda kv: kv[1][0], reverse=True)[:TOP_N]
+
+    findings: List[Dict[str, Any]] = []
+    for (key, kind), (score, ids, detail) in ranked:
+        etype, _, entity = key.partition(":")
+        if kind == "surge":
+            title = f"Failure surge for {etype} {entity}"
+            summary = (
+                f"{etype} '{entity}' produced {detail['fast_count']} recent failures vs "
+                f"an expected {detail['expected']} from its {int(SLOW_TAU_S // 3600)}h baseline."
+            )
+            severity = "high"
+        else:
+            title = f"Activity outside normal hours for {entity}"
+            summary = (
+                f"User '{entity}' was active at hour-of-week {detail['hour_of_week']}, "
+                f"which holds {detail['share']:.2%} of their usual activity."
+            )
+            severity = "medium"
+        findings.append({
+            "rule_name": NAME,
+            "title": title,
+            "severity": severity,
+            "summary": summary,
+            "evidence_event_ids": ids[-50:],
+            "features": {"entity": key, "kind": kind, "score": round(float(score), 3), **detail},
+        })
+
+    return findings
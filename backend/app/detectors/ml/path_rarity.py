@@ -0,0 +1,220 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+import math
+import numpy as np
+from sqlalchemy import select, and_, or_
+from sqlalchemy.orm import Session
+
+from backend.app.models.event import EventNormalized
+from backend.app.detectors.ml._state import load_state, save_state
+
+NAME = "Rare-HTTP-Path"
+STATE_KEY = "path_rarity"
+
+# Parameters
+WINDOW_HOURS = 24          # warm-up window when no checkpoint exists yet
+MAX_EVENTS = 200000        # events consumed per run (rest picked up next run)
+NGRAM = 3                  # character n-gram size
+TABLE_BITS = 18            # 2^18 hashed buckets per table (1 MiB of uint32)
+MAX_LEN = 512              # bytes of each string that are looked at
+MIN_TRAIN = 5000           # n-grams a table must have seen before it scores
+Z_THRESHOLD = 3.0          # flag strings this many std devs above typical rarity
+STATS_HORIZON = 50000.0    # strings over which the score mean/var adapts
+TOP_N = 10
+
+TABLE_SIZE = 1 << TABLE_BITS
+_MASK = np.uint32(TABLE_SIZE - 1)
+_FNV_OFFSET = np.uint32(2166136261)
+_FNV_PRIME = np.uint32(16777619)
+_SATURATE = 1 << 31
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def ngram_hashes(strings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash every character n-gram of every string in one vectorized pass.
+    Returns (bucket per n-gram, index of the owning string). Strings are
+    wrapped in start/end markers so prefixes like '/.g' are distinct grams.
+    """
+    enc = [b"\x02" + s.encode("utf-8", "replace")[:MAX_LEN] + b"\x03" for s in strings]
+    lens = np.fromiter(map(len, enc), dtype=np.int64, count=len(enc))
+    buf = np.frombuffer(b"".join(enc), dtype=np.uint8)
+    m = len(buf) - NGRAM + 1
+    if m <= 0:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.int64)
+
+    # FNV-1a over each window of NGRAM bytes; uint32 arithmetic wraps
+    h = np.full(m, _FNV_OFFSET, dtype=np.uint32)
+    for k in range(NGRAM):
+        h ^= buf[k:k + m]
+        h *= _FNV_PRIME
+
+    # drop windows that straddle two strings
+    owner = np.repeat(np.arange(len(enc), dtype=np.int64), lens)[:m]
+    ends = np.cumsum(lens)[owner]
+    valid = np.arange(m) + NGRAM <= ends
+    return h[valid] & _MASK, owner[valid]
+
+
+class _NgramTable:
+    """Fixed-size hashed n-gram counts plus running stats of the scores they produce."""
+
+    def __init__(self, counts: np.ndarray | None = None, stats: np.ndarray | None = None):
+        self.counts = counts if counts is not None else np.zeros(TABLE_SIZE, dtype=np.uint32)
+        # [total n-grams, score mean, score variance, strings scored]
+        self.stats = stats if stats is not None else np.zeros(4, dtype=np.float64)
+
+    @property
+    def ready(self) -> bool:
+        return self.stats[0] >= MIN_TRAIN and self.stats[3] > 0
+
+    def score(self, strings: Sequence[str]) -> np.ndarray:
+        """Mean surprisal (bits per n-gram) of each string under the current counts."""
+        n = len(strings)
+        if not n:
+            return np.zeros(0)
+        buckets, owner = ngram_hashes(strings)
+        total = self.stats[0] + TABLE_SIZE  # add-one smoothing
+        bits = np.log2(total) - np.log2(self.counts[buckets].astype(np.float64) + 1.0)
+        sums = np.bincount(owner, weights=bits, minlength=n)
+        grams = np.bincount(owner, minlength=n)
+        return sums / np.maximum(grams, 1)
+
+    def zscores(self, scores: np.ndarray) -> np.ndarray:
+        std = math.sqrt(self.stats[2]) or 1.0
+        return (scores - self.stats[1]) / std
+
+    def learn(self, strings: Sequence[str]):
+        buckets, _ = ngram_hashes(strings)
+        if not len(buckets):
+            return
+        counts = self.counts.astype(np.int64) + np.bincount(buckets, minlength=TABLE_SIZE)
+        if counts.max() >= _SATURATE:
+            counts >>= 1  # age everything instead of overflowing
+        self.counts = counts.astype(np.uint32)
+        self.stats[0] = float(self.counts.sum(dtype=np.int64))
+
+    def observe(self, scores: np.ndarray):
+        """Fold a batch of scores into the exponentially weighted mean/variance."""
+        if not len(scores):
+            return
+        alpha = 1.0 if self.stats[3] == 0 else 1.0 - math.exp(-len(scores) / STATS_HORIZON)
+        bmean, bvar = float(scores.mean()), float(scores.var())
+        d = bmean - self.stats[1]
+        self.stats[1] += alpha * d
+        self.stats[2] = (1.0 - alpha) * (self.stats[2] + alpha * d * d) + alpha * bvar
+        self.stats[3] += len(scores)
+
+
+_pending: Dict[str, np.ndarray] | None = None
+
+
+def checkpoint():
+    """Save the state from the last run; the engine calls this once its detections are committed."""
+    global _pending
+    if _pending is not None:
+        save_state(STATE_KEY, _pending)
+        _pending = None
+
+
+def run(db: Session, since: datetime | None = None, until: datetime | None = None) -> List[Dict[str, Any]]:
+    """
+    Score how unusual each http_path / user_agent is using hashed character
+    n-gram frequencies learned incrementally from all traffic seen so far.
+    Probes like '/.git/config' or '/vendor/phpunit/.../eval-stdin.php' are
+    built from grams that ordinary site traffic rarely contains. The learned
+    tables are saved by checkpoint() once the findings are committed.
+    """
+    global _pending
+    _pending = None
+    if not until:
+        until = _utcnow()
+    if not since:
+        since = until - timedelta(hours=WINDOW_HOURS)
+
+    state = load_state(STATE_KEY)
+    if state:
+        paths = _NgramTable(state["path_counts"], state["path_stats"])
+        agents = _NgramTable(state["ua_counts"], state["ua_stats"])
+        last_id = int(state["last_id"][0])
+    else:
+        paths, agents, last_id = _NgramTable(), _NgramTable(), 0
+
+    ev = EventNormalized
+    conds = [
+        ev.id > last_id,
+        ev.timestamp <= until,
+        or_(ev.http_path.is_not(None), ev.user_agent.is_not(None)),
+    ]
+    if state is None:
+        conds.append(ev.timestamp >= since)
+    stmt = (
+        select(ev.id, ev.src_ip, ev.http_path, ev.user_agent)
+        .where(and_(*conds))
+        .order_by(ev.id.asc())
+        .limit(MAX_EVENTS)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        return []
+
+    # src_ip -> {"ids": {...}, "score": max z, "paths": {...}, "agents": {...}}
+    flagged: Dict[str, Dict[str, Any]] = {}
+
+    for table, col, label in ((paths, 2, "paths"), (agents, 3, "agents")):
+        idx = [i for i, r in enumerate(rows) if r[col]]
+        if not idx:
+            continue
+        values = [rows[i][col] for i in idx]
+        scores = table.score(values)
+        ready = table.ready
+        if ready:
+            z = table.zscores(scores)
+            for j in np.nonzero(z >= Z_THRESHOLD)[0]:
+                eid, ip = rows[idx[j]][0], rows[idx[j]][1] or "unknown"
+                f = flagged.setdefault(ip, {"ids": {}, "score": 0.0, "paths": {}, "agents": {}})
+                f["ids"][eid] = None  # ordered set: path and UA can flag the same event
+                f["score"] = max(f["score"], float(z[j]))
+                f[label][values[j]] = round(float(scores[j]), 2)
+        table.learn(values)
+        if not ready:
+            scores = table.score(values)  # warming up: seed the stats in-sample
+        table.observe(scores)
+
+    _pending = {
+        "path_counts": paths.counts,
+        "path_stats": paths.stats,
+        "ua_counts": agents.counts,
+        "ua_stats": agents.stats,
+        "last_id": np.array([max(r[0] for r in rows)], dtype=np.int64),
+    }
+
+    ranked = sorted(flagged.items(), key=lambda kv: kv[1]["score"], reverse=True)[:TOP_N]
+
+    findings: List[Dict[str, Any]] = []
+    for ip, f in ranked:
+        top_paths = sorted(f["paths"].items(), key=lambda kv: kv[1], reverse=True)[:10]
+        top_agents = sorted(f["agents"].items(), key=lambda kv: kv[1], reverse=True)[:5]
+        sample = (top_paths or top_agents)[0][0]
+        findings.append({
+            "rule_name": NAME,
+            "title": f"Rare HTTP requests from {ip}",
+            "severity": "high" if f["score"] >= 2 * Z_THRESHOLD else "medium",
+            "summary": (
+                f"{len(f['ids'])} request(s) from {ip} used unusual paths/user agents "
+                f"(max z={f['score']:.1f}), e.g. '{sample[:120]}'."
+            ),
+            "evidence_event_ids": list(f["ids"])[-50:],
+            "features": {
+                "src_ip": ip,
+                "max_z": round(f["score"], 2),
+                "rare_paths_bits": dict(top_paths),
+                "rare_user_agents_bits": dict(top_agents),
+            },
+        })
+
+    return findings
@@ -1,9 +1,10 @@
 from .base import Base
 from .user import User
 from .event import EventNormalized
-from .detection import Detection
-from .case import Case, Comment  
-from .block import BlockRule  
+from .detection import Detection, DetectionEvent
+from .case import Case, Comment, CaseDetection
+from .block import BlockRule, BlockFeedChange
+from .rollup import EventRollupMinute, EventRollupHour, EventRollupDay
 
 # Alembic will import Base.metadata from here
 def get_metadata():
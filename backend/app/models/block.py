@@ -1,4 +1,4 @@
-from sqlalchemy import String, DateTime, Boolean
+from sqlalchemy import String, DateTime, Boolean, BigInteger, Integer
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, timezone
 from .base import Base
@@ -12,4 +12,14 @@ class BlockRule(Base):
     reason: Mapped[str] = mapped_column(String(512))
     active: Mapped[bool] = mapped_column(Boolean, default=True, index=True)
     expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
-    created_by: Mapped[str | None] = mapped_column(String(128), nullable=True)  # email of operator
\ No newline at end of file
+    created_by: Mapped[str | None] = mapped_column(String(128), nullable=True)  # email of operator
+
+class BlockFeedChange(Base):
+    """Append-only log of rule activations/deactivations; the id is the feed version (see services/blockfeed.py)."""
+    __tablename__ = "block_feed_changes"
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    rule_id: Mapped[int] = mapped_column(Integer)
+    target: Mapped[str] = mapped_column(String(45))               # IP or CIDR, as stored on the rule
+    op: Mapped[str] = mapped_column(String(8))                    # "add" | "remove"
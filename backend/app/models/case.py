@@ -1,10 +1,14 @@
-from sqlalchemy import String, DateTime, Integer, ForeignKey, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, DateTime, Integer, ForeignKey, Text, Index, select, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship, column_property
 from datetime import datetime, timezone
 from .base import Base
 
 class Case(Base):
     __tablename__ = "cases"
+    __table_args__ = (
+        Index("ix_cases_updated_at_id", "updated_at", "id"),  # list order / keyset cursor
+        Index("ix_cases_status_updated_at_id", "status", "updated_at", "id"),  # list filtered by status
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
@@ -14,9 +18,15 @@ class Case(Base):
     severity: Mapped[str] = mapped_column(String(16), default="medium")  # low|medium|high|critical
     status: Mapped[str] = mapped_column(String(16), default="open")      # open|triaged|closed
     assignee: Mapped[str | None] = mapped_column(String(128))
-    detection_ids_json: Mapped[list[int] | None] = mapped_column(Text)   # store as comma-separated for MVP
 
     comments: Mapped[list["Comment"]] = relationship("Comment", back_populates="case", cascade="all, delete-orphan")
+    detections: Mapped[list["Detection"]] = relationship("Detection", secondary="case_detections", order_by="Detection.id.desc()")
+
+class CaseDetection(Base):
+    __tablename__ = "case_detections"
+
+    case_id: Mapped[int] = mapped_column(Integer, ForeignKey("cases.id", ondelete="CASCADE"), primary_key=True)
+    detection_id: Mapped[int] = mapped_column(Integer, ForeignKey("detections.id", ondelete="CASCADE"), primary_key=True, index=True)
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -27,4 +37,14 @@ class Comment(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     body: Mapped[str] = mapped_column(Text)
 
-    case: Mapped["Case"] = relationship("Case", back_populates="comments")  
\ No newline at end of file
+    case: Mapped["Case"] = relationship("Case", back_populates="comments")  
+
+# per-case counts for list views; deferred, so only queries that undefer them pay
+Case.detection_count = column_property(
+    select(func.count()).where(CaseDetection.case_id == Case.id).correlate_except(CaseDetection).scalar_subquery(),
+    deferred=True,
+)
+Case.comment_count = column_property(
+    select(func.count()).where(Comment.case_id == Case.id).correlate_except(Comment).scalar_subquery(),
+    deferred=True,
+)
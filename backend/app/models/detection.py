@@ -1,10 +1,13 @@
-from sqlalchemy import String, DateTime, JSON
+from sqlalchemy import String, DateTime, JSON, Index, Integer, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, timezone
 from .base import Base
 
 class Detection(Base):
     __tablename__ = "detections"
+    __table_args__ = (
+        Index("ix_detections_status_id", "status", "id"),  # list filtered by status, newest first
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
@@ -15,6 +18,13 @@ class Detection(Base):
     summary: Mapped[str | None] = mapped_column(String(2048))
     event_ids: Mapped[list[int] | None] = mapped_column(JSON)  # store as array in JSON for now
     features_json: Mapped[dict | None] = mapped_column(JSON)   # explainability / anomaly features
-    status: Mapped[str] = mapped_column(String(16), index=True, default="open") # "open"|"closed"
+    status: Mapped[str] = mapped_column(String(16), default="open") # "open"|"closed"
     assignee: Mapped[str | None] = mapped_column(String(128))
-    tags: Mapped[list[str] | None] = mapped_column(JSON)
\ No newline at end of file
+    tags: Mapped[list[str] | None] = mapped_column(JSON)
+
+class DetectionEvent(Base):
+    """Evidence link: one row per (detection, event), indexed both ways."""
+    __tablename__ = "detection_events"
+
+    detection_id: Mapped[int] = mapped_column(Integer, ForeignKey("detections.id", ondelete="CASCADE"), primary_key=True)
+    event_id: Mapped[int] = mapped_column(Integer, ForeignKey("events_normalized.id", ondelete="CASCADE"), primary_key=True, index=True)
@@ -1,18 +1,41 @@
-from sqlalchemy import String, DateTime, JSON
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, JSON, Index, text
+from sqlalchemy.orm import Mapped, mapped_column, query_expression
 from datetime import datetime, timezone
 from .base import Base
 
 class EventNormalized(Base):
     __tablename__ = "events_normalized"
+    __table_args__ = (
+        # every rule filters module/action over a time window and groups by
+        # src_ip/user; the INCLUDE columns let those run as index-only scans
+        Index(
+            "ix_events_normalized_module_action_ts",
+            "event_module", "event_action", "timestamp",
+            postgresql_include=["src_ip", "user", "http_path", "country"],
+        ),
+        # rows arrive in time order, so BRIN covers range scans for a few pages
+        Index("ix_events_normalized_timestamp_brin", "timestamp", postgresql_using="brin"),
+        Index("ix_events_normalized_created_at_brin", "created_at", postgresql_using="brin"),
+        # entity pivots (list filters, timeline): newest-first keyset per src_ip / user
+        Index("ix_events_normalized_src_ip_timestamp_id", "src_ip", "timestamp", "id"),
+        Index("ix_events_normalized_user_timestamp_id", "user", "timestamp", "id"),
+        # hunt search (services/search.py): trigram GIN serves ILIKE/regex on
+        # paths and user agents, a tsvector GIN serves full text over fields
+        Index("ix_events_normalized_http_path_trgm", "http_path",
+              postgresql_using="gin", postgresql_ops={"http_path": "gin_trgm_ops"}),
+        Index("ix_events_normalized_user_agent_trgm", "user_agent",
+              postgresql_using="gin", postgresql_ops={"user_agent": "gin_trgm_ops"}),
+        Index("ix_events_normalized_fields_fts",
+              text("to_tsvector('simple'::regconfig, (fields_json)::text)"), postgresql_using="gin"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
-    event_module: Mapped[str] = mapped_column(String(64), index=True)
-    event_action: Mapped[str] = mapped_column(String(64), index=True)
-    src_ip: Mapped[str | None] = mapped_column(String(45), index=True)   # IPv4/IPv6
-    dst_ip: Mapped[str | None] = mapped_column(String(45), index=True)
-    user: Mapped[str | None] = mapped_column(String(128), index=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    event_module: Mapped[str] = mapped_column(String(64))
+    event_action: Mapped[str] = mapped_column(String(64))
+    src_ip: Mapped[str | None] = mapped_column(String(45))   # IPv4/IPv6
+    dst_ip: Mapped[str | None] = mapped_column(String(45))
+    user: Mapped[str | None] = mapped_column(String(128))
     http_method: Mapped[str | None] = mapped_column(String(16))
     http_path: Mapped[str | None] = mapped_column(String(512), index=True)
     user_agent: Mapped[str | None] = mapped_column(String(512))
@@ -20,4 +43,7 @@ class EventNormalized(Base):
     fields_json: Mapped[dict | None] = mapped_column(JSON)
     raw_ref: Mapped[str | None] = mapped_column(String(256))  # pointer to raw log source
 
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    # relevance of a hunt search hit; only populated by search queries
+    search_score: Mapped[float | None] = query_expression()
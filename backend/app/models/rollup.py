@@ -0,0 +1,27 @@
+from sqlalchemy import String, DateTime, BigInteger
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from .base import Base
+
+# distinct src_ip sketch: a linear-counting bitmap, merged with bitwise OR
+SKETCH_BITS = 1024
+
+class _RollupColumns:
+    """Event counts per (bucket, module, action, country), maintained at ingest (see services/rollups.py)."""
+
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)  # bucket start, UTC
+    event_module: Mapped[str] = mapped_column(String(64), primary_key=True)
+    event_action: Mapped[str] = mapped_column(String(64), primary_key=True)
+    country: Mapped[str] = mapped_column(String(2), primary_key=True, default="")  # '' when unknown
+    count: Mapped[int] = mapped_column(BigInteger, default=0)
+    src_sketch: Mapped[str] = mapped_column(BIT(SKETCH_BITS))
+
+class EventRollupMinute(_RollupColumns, Base):
+    __tablename__ = "event_rollups_minute"
+
+class EventRollupHour(_RollupColumns, Base):
+    __tablename__ = "event_rollups_hour"
+
+class EventRollupDay(_RollupColumns, Base):
+    __tablename__ = "event_rollups_day"
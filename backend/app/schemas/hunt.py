@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Any, List, Literal, Optional
+from datetime import datetime
+
+class HuntFilter(BaseModel):
+    field: str = Field(..., description="event column, e.g. 'event_action', 'src_ip'")
+    op: Literal["eq", "ne", "in", "not_in", "contains", "prefix", "is_null", "not_null"] = "eq"
+    value: Any = None
+
+class HuntAggregate(BaseModel):
+    fn: Literal["count", "count_distinct", "min_time", "max_time"]
+    field: Optional[str] = None   # required for count_distinct
+    alias: Optional[str] = None   # defaults to fn or fn_field
+
+class HuntQuery(BaseModel):
+    start: datetime
+    end: Optional[datetime] = None          # defaults to now
+    filters: List[HuntFilter] = []
+    group_by: List[str] = Field(default_factory=list, max_length=4)
+    aggregates: List[HuntAggregate] = Field(default_factory=lambda: [HuntAggregate(fn="count")], min_length=1, max_length=8)
+    order_by: Optional[str] = None          # aggregate alias; defaults to the first aggregate
+    order: Literal["desc", "asc"] = "desc"
+    top: int = Field(20, ge=1, le=1000)
+    timeout_ms: Optional[int] = Field(None, ge=100)  # capped by settings.hunt_timeout_ms
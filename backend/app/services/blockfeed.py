@@ -0,0 +1,307 @@
+from __future__ import annotations
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import ipaddress
+import logging
+import threading
+import time
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.db import ReadSessionLocal
+from ..models.block import BlockFeedChange, BlockRule
+
+log = logging.getLogger(__name__)
+
+# Versioned feed of blocked IPs/CIDRs for firewalls and WAFs. Every rule
+# activation or deactivation appends a row to block_feed_changes in the same
+# transaction; the row id is the feed version.
+#
+# Each process keeps the feed in memory: the active targets (with the number
+# of active rules behind each, so removing one of two rules on an address
+# does not unblock it) and the recent changes. It polls the changelog for
+# ids past its version at most every block_feed_refresh_seconds, one short
+# primary-key range read on the replica, so pollers never touch the
+# database themselves.
+#
+# Ids are allocated before commit, so on their own they need not commit in
+# order. On Postgres log_changes takes a transaction-level advisory lock
+# first, which serialises writers up to commit, so the only holes left are
+# rolled-back inserts. A hole still holds the version back until it fills or
+# GAP_GRACE_SECONDS pass; the skipped ids are then re-read for
+# SKIPPED_WATCH_SECONDS, and one that turns up after all is applied and
+# reported to every client with the next delta rather than lost.
+
+FORMATS = ("plain", "ipset", "nftables")
+HISTORY_MAX = 100_000
+GAP_GRACE_SECONDS = 10.0
+SKIPPED_WATCH_SECONDS = 3600.0
+SKIPPED_MAX = 10_000
+FORCED_REFRESH_SECONDS = 0.1
+NFT_CHUNK = 1000
+FEED_LOCK_KEY = 0x626C6F636B  # pg_advisory_xact_lock key for changelog writers
+
+C = BlockFeedChange
+
+
+def log_changes(db: Session, changes: Iterable[Tuple[int, str, str]]):
+    """Add (rule_id, target, "add"|"remove") rows to db's transaction; the caller commits."""
+    rows = [{"rule_id": rid, "target": target, "op": op} for rid, target, op in changes]
+    if rows:
+        if db.get_bind().dialect.name == "postgresql":
+            # held to commit: ids are then allocated and committed in the same order
+            db.execute(select(func.pg_advisory_xact_lock(FEED_LOCK_KEY)))
+        db.execute(insert(C), rows)
+
+
+class _Feed:
+    def __init__(self, version: int, counts: Dict[str, int]):
+        self.version = version
+        self.floor = version  # oldest `since` that can be answered with a delta
+        self.counts = counts  # target -> active rules
+        self.versions: List[int] = []
+        self.targets: List[str] = []
+        self.gap_since: Optional[float] = None
+        self.skipped: Dict[int, float] = {}  # id -> when it was given up on
+        self.late: List[str] = []  # targets of late rows, re-reported with the next change
+        self.sorted: Optional[Tuple[str, ...]] = None
+        self.rendered: Dict[Tuple[int, str], str] = {}
+
+    def apply(self, rows, now: float):
+        for r in rows:
+            if r.id > self.version + 1:
+                if self.gap_since is None:
+                    self.gap_since = now
+                if now - self.gap_since < GAP_GRACE_SECONDS:
+                    break
+                log.warning("block feed: skipping versions %d-%d", self.version + 1, r.id - 1)
+                for i in range(max(self.version + 1, r.id - SKIPPED_MAX), r.id):
+                    self.skipped[i] = now
+            self.gap_since = None
+            self._count(r)
+            self.version = r.id
+            if self.late:
+                self.versions.extend([r.id] * len(self.late))
+                self.targets.extend(self.late)
+                self.late = []
+            self.versions.append(r.id)
+            self.targets.append(r.target)
+        self._trim()
+
+    def apply_late(self, rows):
+        """
+        Apply skipped ids that committed after all. Clients behind the current
+        version see them in their next delta; clients already on it, with the
+        next change.
+        """
+        for r in rows:
+            if self.skipped.pop(r.id, None) is None:
+                continue
+            log.warning("block feed: version %d committed after it was skipped", r.id)
+            self._count(r)
+            self.versions.append(self.version)
+            self.targets.append(r.target)
+            self.late.append(r.target)
+            self.rendered = {}
+        self._trim()
+
+    def expire_skipped(self, now: float):
+        for i in [i for i, t in self.skipped.items() if now - t >= SKIPPED_WATCH_SECONDS]:
+            del self.skipped[i]
+
+    def _count(self, r):
+        n = self.counts.get(r.target, 0) + (1 if r.op == "add" else -1)
+        if n > 0:
+            self.counts[r.target] = n
+        else:
+            self.counts.pop(r.target, None)
+        self.sorted = None
+
+    def _trim(self):
+        if len(self.versions) > HISTORY_MAX:
+            cut = len(self.versions) // 2
+            while cut < len(self.versions) and self.versions[cut] == self.versions[cut - 1]:
+                cut += 1  # never split one version's entries
+            self.floor = self.versions[cut - 1]
+            del self.versions[:cut], self.targets[:cut]
+
+
+_feed: _Feed | None = None
+_checked_at = 0.0
+_forced_at = 0.0
+_lock = threading.Lock()          # guards _feed's contents
+_refresh_lock = threading.Lock()  # one changelog read at a time
+
+
+def _load(db: Session) -> _Feed:
+    # one statement, so the version and the active set come from one snapshot
+    ver = select(func.coalesce(func.max(C.id), 0).label("version")).subquery()
+    rows = db.execute(
+        select(ver.c.version, BlockRule.ip).select_from(ver).outerjoin(BlockRule, BlockRule.active.is_(True))
+    ).all()
+    counts: Dict[str, int] = {}
+    for r in rows:
+        if r.ip is not None:
+            counts[r.ip] = counts.get(r.ip, 0) + 1
+    return _Feed(int(rows[0].version), counts)
+
+
+def refresh(force: bool = False) -> _Feed:
+    """
+    Apply changelog rows past the in-memory version. force skips the poll
+    interval, but forced reads are still limited to one per
+    FORCED_REFRESH_SECONDS across all callers.
+    """
+    global _feed, _checked_at, _forced_at
+    if _feed is not None and _refresh_lock.locked():
+        return _feed  # someone else is reading; serve the current state
+    with _refresh_lock:
+        now = time.monotonic()
+        if _feed is not None:
+            if force and now - _forced_at < FORCED_REFRESH_SECONDS:
+                return _feed
+            if not force and now - _checked_at < settings.block_feed_refresh_seconds:
+                return _feed
+        if force:
+            _forced_at = now
+        db = ReadSessionLocal()
+        try:
+            if _feed is None:
+                loaded = _load(db)
+                with _lock:
+                    _feed = loaded
+            rows = db.execute(
+                select(C.id, C.target, C.op).where(C.id > _feed.version).order_by(C.id).limit(HISTORY_MAX)
+            ).all()
+            late = []
+            if _feed.skipped:
+                _feed.expire_skipped(now)
+                ids = list(_feed.skipped)
+                if ids:
+                    late = db.execute(select(C.id, C.target, C.op).where(C.id.in_(ids)).order_by(C.id)).all()
+        finally:
+            db.close()
+        if rows or late:
+            with _lock:
+                if late:
+                    _feed.apply_late(late)
+                if rows:
+                    _feed.apply(rows, time.monotonic())
+        _checked_at = time.monotonic()
+        return _feed
+
+
+def current() -> _Feed:
+    if _feed is None or time.monotonic() - _checked_at >= settings.block_feed_refresh_seconds:
+        return refresh()
+    return _feed
+
+
+def changes(since: int) -> Dict[str, Any]:
+    """
+    Targets to add and remove to go from version `since` to the current one.
+    reset=True means `since` is unknown here (0 or compacted away): `added`
+    is then the full set and the client should replace its own rather than
+    patch it. A `since` past this process's version (another process is
+    ahead) gets an empty delta at `since` with retry_after seconds; a client
+    whose database was rebuilt resyncs with since=0.
+    """
+    feed = current()
+    if since > feed.version:
+        feed = refresh(force=True)
+    with _lock:
+        version = feed.version
+        if since == version:
+            return {"version": version, "since": since, "reset": False, "added": [], "removed": []}
+        if since > version:
+            return {
+                "version": since,
+                "since": since,
+                "reset": False,
+                "added": [],
+                "removed": [],
+                "retry_after": settings.block_feed_refresh_seconds,
+            }
+        if since < feed.floor:
+            return {"version": version, "since": since, "reset": True, "added": _sorted(feed), "removed": []}
+        touched = set(feed.targets[bisect_right(feed.versions, since):])
+        added = [t for t in touched if t in feed.counts]
+        removed = [t for t in touched if t not in feed.counts]
+    return {
+        "version": version,
+        "since": since,
+        "reset": False,
+        "added": sorted(added, key=_target_key),
+        "removed": sorted(removed, key=_target_key),
+    }
+
+
+def _target_key(target: str):
+    net = ipaddress.ip_network(target, strict=False)
+    return net.version, int(net.network_address), net.prefixlen
+
+
+def _sorted(feed: _Feed) -> List[str]:
+    if feed.sorted is None:
+        feed.sorted = tuple(sorted(feed.counts, key=_target_key))
+    return list(feed.sorted)
+
+
+def snapshot(fmt: str = "plain") -> Tuple[int, str]:
+    """(version, the full active set rendered as fmt); rendered once per version."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    feed = current()
+    with _lock:
+        version = feed.version
+        body = feed.rendered.get((version, fmt))
+        if body is not None:
+            return version, body
+        targets = _sorted(feed)
+    v4 = [t for t in targets if ":" not in t]
+    v6 = [t for t in targets if ":" in t]
+    body = {"plain": _plain, "ipset": _ipset, "nftables": _nftables}[fmt](v4, v6)
+    with _lock:
+        if feed.version == version:
+            feed.rendered = {k: v for k, v in feed.rendered.items() if k[0] == version}
+            feed.rendered[(version, fmt)] = body
+    return version, body
+
+
+def _plain(v4: List[str], v6: List[str]) -> str:
+    return "".join(t + "\n" for t in v4 + v6)
+
+
+def _ipset(v4: List[str], v6: List[str]) -> str:
+    # for `ipset restore`: fill a fresh set, then swap it in atomically
+    name = settings.block_feed_set_name
+    lines = []
+    for suffix, family, targets in (("4", "inet", v4), ("6", "inet6", v6)):
+        live, new = f"{name}{suffix}", f"{name}{suffix}-new"
+        maxelem = max(65536, 2 * len(targets))
+        lines.append(f"create {live} hash:net family {family} -exist")
+        lines.append(f"create {new} hash:net family {family} maxelem {maxelem} -exist")
+        lines.append(f"flush {new}")
+        lines.extend(f"add {new} {t} -exist" for t in targets)
+        lines.append(f"swap {new} {live}")
+        lines.append(f"destroy {new}")
+    return "\n".join(lines) + "\n"
+
+
+def _nftables(v4: List[str], v6: List[str]) -> str:
+    # for `nft -f`, which applies the whole file as one transaction
+    table = f"inet {settings.block_feed_set_name}"
+    lines = [
+        f"table {table} {{",
+        "\tset v4 { type ipv4_addr; flags interval; auto-merge; }",
+        "\tset v6 { type ipv6_addr; flags interval; auto-merge; }",
+        "}",
+        f"flush set {table} v4",
+        f"flush set {table} v6",
+    ]
+    for setname, targets in (("v4", v4), ("v6", v6)):
+        for i in range(0, len(targets), NFT_CHUNK):
+            lines.append(f"add element {table} {setname} {{ {', '.join(targets[i:i + NFT_CHUNK])} }}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,243 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import ipaddress
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..core.cache import invalidate
+from ..core.config import settings
+from ..core.db import SessionLocal
+from ..core.redis_client import redis_client
+from ..models.block import BlockRule
+from .blockfeed import log_changes
+from .ipindex import IPRangeIndex
+
+log = logging.getLogger(__name__)
+
+# In-memory index of active block rules, so is_blocked() and ingest tagging
+# never query Postgres. Exact addresses sit in a dict (O(1)); CIDRs in an
+# IPRangeIndex. Expiry is checked at lookup time, so a rule stops matching
+# the moment it expires even before the sweeper flips it to inactive.
+#
+# The rule set is mirrored to Redis as a hash (rule id -> [ip, expires])
+# plus a version counter bumped on every change. Each process polls the
+# version at most every blocklist_refresh_seconds and reloads from the hash
+# when it moved; Postgres is only read to seed an empty mirror. Without
+# Redis each process keeps its own copy, seeded from Postgres.
+
+RULES_KEY = "blocklist:rules"
+VERSION_KEY = "blocklist:version"
+SWEEP_LOCK_KEY = "blocklist:sweep:lock"
+
+Rule = Tuple[str, Optional[float]]  # (ip or cidr, expires_at epoch seconds)
+
+
+def normalize_target(value: str) -> str:
+    """Canonical form of an IP or CIDR; a single-address network becomes a plain IP."""
+    try:
+        net = ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        raise ValueError(f"'{value}' is not an IP address or CIDR")
+    if net.num_addresses == 1:
+        return str(net.network_address)
+    return str(net)
+
+
+def _canon_ip(ip: str) -> Optional[str]:
+    try:
+        return str(ipaddress.ip_address(ip))
+    except ValueError:
+        return None
+
+
+def _epoch(dt: Optional[datetime]) -> Optional[float]:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class BlocklistIndex:
+    def __init__(self, rules: Dict[int, Rule], version: int = 0):
+        self.rules = rules
+        self.version = version
+        self._exact: Dict[str, List[Tuple[int, Optional[float]]]] = {}
+        ranges = []
+        for rid, (target, expires) in rules.items():
+            if "/" in target:
+                ranges.append((target, (rid, expires)))
+            else:
+                self._exact.setdefault(target, []).append((rid, expires))
+        self._ranges: IPRangeIndex[Tuple[int, Optional[float]]] = IPRangeIndex(ranges)
+
+    def matching_rules(self, ip: Optional[str], now: Optional[float] = None) -> List[int]:
+        """Ids of the live rules covering ip."""
+        if not ip:
+            return []
+        now = time.time() if now is None else now
+        hits = self._exact.get(ip)
+        if hits is None and ":" in ip:  # IPv6 has many spellings
+            canon = _canon_ip(ip)
+            hits = self._exact.get(canon) if canon else None
+        out = [rid for rid, exp in hits or () if exp is None or exp > now]
+        out += [rid for rid, exp in self._ranges.lookup(ip) if exp is None or exp > now]
+        return out
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+
+_index: BlocklistIndex | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _rules_from_db(db: Session) -> Dict[int, Rule]:
+    rows = db.execute(
+        select(BlockRule.id, BlockRule.ip, BlockRule.expires_at).where(BlockRule.active.is_(True))
+    ).all()
+    return {r.id: (r.ip, _epoch(r.expires_at)) for r in rows}
+
+
+def _read_mirror() -> Tuple[int, Dict[int, Rule]] | None:
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.get(VERSION_KEY)
+    pipe.hgetall(RULES_KEY)
+    version, raw = pipe.execute()
+    if version is None:
+        return None
+    return int(version), {int(k): tuple(json.loads(v)) for k, v in raw.items()}
+
+
+def _remote_version() -> Optional[int]:
+    v = redis_client.get(VERSION_KEY)
+    return int(v) if v is not None else None
+
+
+def seed(db: Session | None = None) -> BlocklistIndex:
+    """Load the active rules from Postgres and republish the Redis mirror."""
+    global _index
+    own = db is None
+    db = db or SessionLocal()
+    try:
+        rules = _rules_from_db(db)
+    finally:
+        if own:
+            db.close()
+    version = 0
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(RULES_KEY)
+        if rules:
+            pipe.hset(RULES_KEY, mapping={str(k): json.dumps(v) for k, v in rules.items()})
+        pipe.incr(VERSION_KEY)
+        version = pipe.execute()[-1]
+    except Exception:
+        pass  # no Redis: this process's copy is all there is
+    with _lock:
+        _index = BlocklistIndex(rules, version)
+    return _index
+
+
+def current() -> BlocklistIndex:
+    """The live index, refreshed from the Redis mirror when its version moved."""
+    global _index, _checked_at
+    idx = _index
+    now = time.monotonic()
+    if idx is not None and now - _checked_at < settings.blocklist_refresh_seconds:
+        return idx
+    if idx is not None and _lock.locked():
+        return idx
+    reseed = False
+    with _lock:
+        _checked_at = now
+        try:
+            remote = _remote_version()
+            if remote is None:
+                reseed = True  # empty mirror: first start, or Redis lost its data
+            elif _index is None or remote != _index.version:
+                mirrored = _read_mirror()
+                if mirrored:
+                    _index = BlocklistIndex(mirrored[1], mirrored[0])
+        except Exception:
+            pass  # Redis down: keep serving what we have
+    if reseed or _index is None:
+        return seed()
+    return _index
+
+
+def _publish(added: Dict[int, Rule], removed: Iterable[int]):
+    """Apply a change locally and to the mirror."""
+    global _index
+    removed = [int(r) for r in removed]
+    if _index is None:
+        seed()  # first use in this process: the seed already includes the change
+        return
+    with _lock:
+        rules = dict(_index.rules)
+        for rid in removed:
+            rules.pop(rid, None)
+        rules.update(added)
+        version = _index.version + 1
+        try:
+            pipe = redis_client.pipeline(transaction=True)
+            if added:
+                pipe.hset(RULES_KEY, mapping={str(k): json.dumps(v) for k, v in added.items()})
+            if removed:
+                pipe.hdel(RULES_KEY, *[str(r) for r in removed])
+            pipe.incr(VERSION_KEY)
+            version = pipe.execute()[-1]
+            if version != _index.version + 1:
+                # another process changed the mirror since we last read it
+                mirrored = _read_mirror()
+                if mirrored:
+                    version, rules = mirrored
+        except Exception:
+            pass
+        _index = BlocklistIndex(rules, version)
+
+
+def rules_added(rules: Iterable[BlockRule]):
+    _publish({r.id: (r.ip, _epoch(r.expires_at)) for r in rules if r.active}, ())
+
+
+def rules_removed(rule_ids: Iterable[int]):
+    _publish({}, rule_ids)
+
+
+def is_blocked(ip: Optional[str]) -> bool:
+    return bool(current().matching_rules(ip))
+
+
+def sweep_expired(db: Session) -> List[int]:
+    """Deactivate every expired active rule in one UPDATE; returns their ids."""
+    now = datetime.now(timezone.utc)
+    swept = db.execute(
+        update(BlockRule)
+        .where(BlockRule.active.is_(True), BlockRule.expires_at.is_not(None), BlockRule.expires_at <= now)
+        .values(active=False)
+        .returning(BlockRule.id, BlockRule.ip)
+    ).all()
+    log_changes(db, [(r.id, r.ip, "remove") for r in swept])
+    db.commit()
+    ids = [r.id for r in swept]
+    if ids:
+        rules_removed(ids)
+        invalidate("blocks")
+    return ids
+
+
+def claim_sweep() -> bool:
+    """True for the one process that should sweep this interval (always, without Redis)."""
+    try:
+        ttl = max(int(settings.block_sweep_seconds) - 1, 1)
+        return bool(redis_client.set(SWEEP_LOCK_KEY, "1", nx=True, ex=ttl))
+    except Exception:
+        return True
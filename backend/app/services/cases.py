@@ -1,10 +1,13 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, selectinload, undefer
 from datetime import datetime, timezone
 from typing import List
 from ..models.case import Case, Comment
+from ..models.detection import Detection
+from .pagination import decode_cursor, decode_int, decode_datetime, after_desc
 
-def _encode_ids(ids: List[int]) -> str:
-    return ",".join(str(i) for i in ids)
+# columns of linked detections shown on the case view
+DETECTION_SUMMARY = (Detection.id, Detection.created_at, Detection.rule_id, Detection.severity, Detection.title, Detection.status)
 
 def _touch(c: Case):
     c.updated_at = datetime.now(timezone.utc)
@@ -16,23 +19,49 @@ def create_case(db: Session, title: str, description: str | None, severity: str,
         severity=severity,
         status="open",
         assignee=assignee,
-        detection_ids_json=_encode_ids(detection_ids),
     )
+    if detection_ids:
+        # unknown ids are dropped rather than stored as dangling links
+        c.detections = db.execute(select(Detection).where(Detection.id.in_(set(detection_ids)))).scalars().all()
     db.add(c)
     db.commit()
     db.refresh(c)
     return c
 
-def list_cases(db: Session, status: str | None, severity: str | None, limit: int, offset: int) -> list[Case]:
-    q = db.query(Case).order_by(Case.updated_at.desc())
+def cases_query(db: Session, status: str | None, severity: str | None, limit: int, offset: int, cursor: str | None = None):
+    q = (
+        db.query(Case)
+        .options(undefer(Case.detection_count), undefer(Case.comment_count))
+        .order_by(Case.updated_at.desc(), Case.id.desc())
+    )
     if status:
         q = q.filter(Case.status == status)
     if severity:
         q = q.filter(Case.severity == severity)
-    return q.limit(limit).offset(offset).all()
+    if cursor:
+        updated_at, last_id = decode_cursor(cursor, 2)
+        q = q.filter(after_desc([Case.updated_at, Case.id], [decode_datetime(updated_at), decode_int(last_id)]))
+        offset = 0
+    return q.limit(limit).offset(offset)
+
+def list_cases(db: Session, status: str | None, severity: str | None, limit: int, offset: int, cursor: str | None = None) -> list[Case]:
+    return cases_query(db, status, severity, limit, offset, cursor=cursor).all()
 
 def get_case(db: Session, case_id: int) -> Case | None:
-    return db.get(Case, case_id)
+    """
+    Case with its comments (joined into the case query) and linked detection
+    summaries (one batched SELECT), so a view costs two queries however many
+    detections are attached.
+    """
+    stmt = (
+        select(Case)
+        .where(Case.id == case_id)
+        .options(
+            joinedload(Case.comments),
+            selectinload(Case.detections).load_only(*DETECTION_SUMMARY),
+        )
+    )
+    return db.execute(stmt).unique().scalar_one_or_none()
 
 def update_status(db: Session, case_id: int, status: str) -> Case | None:
     c = db.get(Case, case_id)
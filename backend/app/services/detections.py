@@ -0,0 +1,106 @@
+from typing import Iterable, List
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+from ..models.detection import Detection, DetectionEvent
+from ..models.event import EventNormalized
+from .pagination import decode_cursor, decode_int, after_desc
+
+def detection_conditions(status: str | None, kind: str | None, severity: str | None) -> list:
+    conditions = []
+    if status:
+        conditions.append(Detection.status == status)
+    if kind:
+        conditions.append(Detection.kind == kind)
+    if severity:
+        conditions.append(Detection.severity == severity)
+    return conditions
+
+def detections_query(db: Session, status: str | None, kind: str | None, severity: str | None, limit: int, offset: int, cursor: str | None = None):
+    q = db.query(Detection).order_by(Detection.id.desc())
+    for cond in detection_conditions(status, kind, severity):
+        q = q.filter(cond)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        q = q.filter(after_desc([Detection.id], [decode_int(last_id)]))
+        offset = 0
+    return q.limit(limit).offset(offset)
+
+def list_detections(db: Session, status: str | None, kind: str | None, severity: str | None, limit: int, offset: int, cursor: str | None = None) -> list[Detection]:
+    return detections_query(db, status, kind, severity, limit, offset, cursor=cursor).all()
+
+# ---------------- evidence links ----------------
+
+EVIDENCE_COLUMNS = (
+    EventNormalized.id,
+    EventNormalized.timestamp,
+    EventNormalized.event_module,
+    EventNormalized.event_action,
+    EventNormalized.src_ip,
+    EventNormalized.user,
+    EventNormalized.http_path,
+    EventNormalized.country,
+)
+
+def link_evidence(db: Session, detections: Iterable[Detection]) -> int:
+    """Write detection_events rows for newly added detections in one bulk INSERT; caller commits."""
+    detections = list(detections)
+    if not detections:
+        return 0
+    db.flush()  # assigns detection ids
+    rows = [
+        {"detection_id": d.id, "event_id": eid}
+        for d in detections
+        for eid in dict.fromkeys(d.event_ids or [])
+    ]
+    if rows:
+        db.execute(insert(DetectionEvent), rows)
+    return len(rows)
+
+def evidence_for_detection(db: Session, det_id: int, limit: int = 200) -> List:
+    """Evidence events of a detection, newest first, with only the columns the API returns."""
+    stmt = (
+        select(*EVIDENCE_COLUMNS)
+        .join(DetectionEvent, DetectionEvent.event_id == EventNormalized.id)
+        .where(DetectionEvent.detection_id == det_id)
+        .order_by(EventNormalized.id.desc())
+        .limit(limit)
+    )
+    return db.execute(stmt).all()
+
+def evidence_src_ips(db: Session, det_id: int) -> List[str]:
+    """Distinct source IPs among a detection's evidence events."""
+    stmt = (
+        select(EventNormalized.src_ip)
+        .join(DetectionEvent, DetectionEvent.event_id == EventNormalized.id)
+        .where(DetectionEvent.detection_id == det_id, EventNormalized.src_ip.is_not(None))
+        .distinct()
+        .order_by(EventNormalized.src_ip)
+    )
+    return list(db.execute(stmt).scalars())
+
+def evidence_dict(e) -> dict:
+    return {
+        "id": e.id,
+        "timestamp": e.timestamp,
+        "event_module": e.event_module,
+        "event_action": e.event_action,
+        "src_ip": e.src_ip,
+        "user": e.user,
+        "http_path": e.http_path,
+        "country": e.country,
+    }
+
+def detections_referencing(db: Session, event_id: int | None = None, src_ip: str | None = None, limit: int = 50) -> List[Detection]:
+    """Detections whose evidence includes the event, or any event from src_ip; newest first."""
+    det_ids = select(DetectionEvent.detection_id)
+    if event_id is not None:
+        det_ids = det_ids.where(DetectionEvent.event_id == event_id)
+    if src_ip:
+        det_ids = det_ids.join(EventNormalized, EventNormalized.id == DetectionEvent.event_id).where(EventNormalized.src_ip == src_ip)
+    stmt = (
+        select(Detection)
+        .where(Detection.id.in_(det_ids))
+        .order_by(Detection.id.desc())
+        .limit(limit)
+    )
+    return db.execute(stmt).scalars().all()
@@ -2,6 +2,7 @@ from typing import Optional
 from functools import lru_cache
 from ..core.redis_client import redis_client
 from ..core.config import settings
+from ..core.telemetry import geoip_lookups
 
 # GeoIP reader is optional
 try:
@@ -24,6 +25,9 @@ def _get_reader():
     except Exception:
         return None
 
+def geoip_available() -> bool:
+    return _get_reader() is not None
+
 def country_for_ip(ip: str | None) -> Optional[str]:
     if not ip:
         return None
@@ -33,13 +37,16 @@ def country_for_ip(ip: str | None) -> Optional[str]:
     try:
         cached = redis_client.get(key)
         if cached:
+            geoip_lookups.inc("hit")
             return cached
     except Exception:
         pass  # cache is optional
 
     reader = _get_reader()
     if reader is None:
+        geoip_lookups.inc("unavailable")
         return None
+    geoip_lookups.inc("miss")
 
     try:
         rec = reader.country(ip)
@@ -1,5 +1,7 @@
 from typing import List, Tuple, Optional
-from sqlalchemy.orm import Session
+import anyio
+from sqlalchemy.orm import Session, with_expression
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from datetime import datetime
 from dateutil import parser as dateparser
@@ -7,6 +9,13 @@ from dateutil import parser as dateparser
 from ..models.event import EventNormalized
 from ..schemas.events import EventIn
 from .enrich import country_for_ip   # <— add
+from .intel import tag_events
+from . import blocklist
+from .rollups import record_events
+from ..core.cache import invalidate, invalidate_async
+from ..core.telemetry import record_ingest
+from .pagination import decode_cursor, decode_int, decode_float, after_desc
+from .search import search_clause
 
 def _parse_timestamp(ts: str) -> datetime:
     # accept ISO8601 and common formats; ensure tz-aware
@@ -16,8 +25,12 @@ def _parse_timestamp(ts: str) -> datetime:
         dt = dt.replace(tzinfo=dateparser.tz.UTC)
     return dt
 
-def normalize_event(e: EventIn) -> EventNormalized:
+def normalize_event(e: EventIn, tagged: Optional[dict] = None) -> EventNormalized:
     country = e.country or country_for_ip(e.src_ip)  # <— enrich if missing
+    fields = tagged or e.fields or {}  # tagged: fields plus threat-intel hits under "ioc"
+    blocked_by = blocklist.current().matching_rules(e.src_ip)
+    if blocked_by:
+        fields = {**fields, "blocked_by": blocked_by}  # ids of the block rules covering src_ip
     return EventNormalized(
         timestamp=_parse_timestamp(e.timestamp),
         event_module=e.event_module,
@@ -29,39 +42,60 @@ def normalize_event(e: EventIn) -> EventNormalized:
         http_path=e.http_path,
         user_agent=e.user_agent,
         country=country,
-        fields_json=e.fields or {},
+        fields_json=fields,
         raw_ref=e.raw_ref,
     )
 
-def insert_events(db: Session, items: List[EventIn]) -> Tuple[int, int]:
-    ok, fail = 0, 0
-    for e in items:
+def normalize_batch(items: List[EventIn]) -> Tuple[List[EventNormalized], int]:
+    """Normalize a batch; returns (events, number that failed to parse)."""
+    recs: List[EventNormalized] = []
+    fail = 0
+    # IOC matching for the whole batch at once: IPv4 lookups are vectorised
+    tagged = tag_events([(e.src_ip, e.dst_ip, e.http_path, e.fields or {}) for e in items])
+    for e, t in zip(items, tagged):
         try:
-            rec = normalize_event(e)
-            db.add(rec)
-            ok += 1
+            recs.append(normalize_event(e, t))
         except Exception:
             fail += 1
+    return recs, fail
+
+def insert_events(db: Session, items: List[EventIn]) -> Tuple[int, int]:
+    recs, fail = normalize_batch(items)
+    db.add_all(recs)
+    record_events(db, recs)
     db.commit()
-    return ok, fail
+    record_ingest(len(recs), fail)
+    if recs:
+        invalidate("events")
+    return len(recs), fail
 
+async def insert_events_async(db: AsyncSession, items: List[EventIn]) -> Tuple[int, int]:
+    # GeoIP enrichment does blocking lookups, so normalize off the event loop
+    recs, fail = await anyio.to_thread.run_sync(normalize_batch, items)
+    db.add_all(recs)
+    await db.run_sync(record_events, recs)
+    await db.commit()
+    record_ingest(len(recs), fail)
+    if recs:
+        await invalidate_async("events")
+    return len(recs), fail
 
-def list_events(
-    db: Session,
+
+def event_conditions(
     event_module: Optional[str] = None,
     event_action: Optional[str] = None,
     src_ip: Optional[str] = None,
     user: Optional[str] = None,
     start: Optional[str] = None,
     end: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0,
-) -> List[EventNormalized]:
-    """Return events with optional filters."""
-
-    q = select(EventNormalized)
-
+    q: Optional[str] = None,
+    q_mode: str = "substring",
+    q_field: str = "any",
+) -> list:
+    """WHERE clauses for the event filters shared by listing and export."""
     conditions = []
+    if q:
+        conditions.append(search_clause(q, q_mode, q_field)[0])
     if event_module:
         conditions.append(EventNormalized.event_module == event_module)
     if event_action:
@@ -80,10 +114,84 @@ def list_events(
             conditions.append(EventNormalized.timestamp <= datetime.fromisoformat(end))
         except Exception:
             pass
+    return conditions
+
+
+def events_query(
+    event_module: Optional[str] = None,
+    event_action: Optional[str] = None,
+    src_ip: Optional[str] = None,
+    user: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    q_mode: str = "substring",
+    q_field: str = "any",
+):
+    """
+    Build the list_events statement (also used by the plan checker). With a
+    search query q, hits are ranked by relevance and the cursor is (score, id).
+    """
+    stmt = select(EventNormalized)
+    conditions = event_conditions(event_module, event_action, src_ip, user, start, end, q, q_mode, q_field)
+
+    keys = [EventNormalized.id]
+    if q:
+        score = search_clause(q, q_mode, q_field)[1]
+        stmt = stmt.options(with_expression(EventNormalized.search_score, score))
+        keys = [score, EventNormalized.id]
+
+    if cursor:
+        if q:
+            last_score, last_id = decode_cursor(cursor, 2)
+            values = [decode_float(last_score), decode_int(last_id)]
+        else:
+            (last_id,) = decode_cursor(cursor, 1)
+            values = [decode_int(last_id)]
+        conditions.append(after_desc(keys, values))
+        offset = 0
 
     if conditions:
-        q = q.where(and_(*conditions))
+        stmt = stmt.where(and_(*conditions))
 
-    q = q.order_by(EventNormalized.id.desc()).limit(limit).offset(offset)
+    return stmt.order_by(*[k.desc() for k in keys]).limit(limit).offset(offset)
 
-    return db.execute(q).scalars().all()
\ No newline at end of file
+
+def list_events(
+    db: Session,
+    event_module: Optional[str] = None,
+    event_action: Optional[str] = None,
+    src_ip: Optional[str] = None,
+    user: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    q_mode: str = "substring",
+    q_field: str = "any",
+) -> List[EventNormalized]:
+    """
+    Return events with optional filters, newest first (best match first when
+    searching with q). Pass the cursor of the previous page to
+    keyset-paginate (offset is ignored then).
+    """
+    stmt = events_query(
+        event_module=event_module,
+        event_action=event_action,
+        src_ip=src_ip,
+        user=user,
+        start=start,
+        end=end,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        q=q,
+        q_mode=q_mode,
+        q_field=q_field,
+    )
+    return db.execute(stmt).scalars().all()
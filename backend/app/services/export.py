@@ -0,0 +1,144 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Any, Iterator, List, Optional, Sequence
+import csv
+import io
+import json
+
+from sqlalchemy import select, and_
+
+from ..core.db import ReadSessionLocal
+from ..models.event import EventNormalized
+from ..models.detection import Detection
+from .events import event_conditions
+from .detections import detection_conditions
+
+try:
+    import orjson  # optional: several times faster than json for large exports
+except Exception:
+    orjson = None
+
+# Bulk export as NDJSON or CSV. Rows come off a server-side cursor in chunks
+# of CHUNK_ROWS and each chunk is encoded into one bytes block, so memory
+# stays bounded by the chunk size however many rows match.
+
+CHUNK_ROWS = 5000
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+EVENT_COLUMNS = [
+    EventNormalized.id,
+    EventNormalized.timestamp,
+    EventNormalized.event_module,
+    EventNormalized.event_action,
+    EventNormalized.src_ip,
+    EventNormalized.dst_ip,
+    EventNormalized.user,
+    EventNormalized.http_method,
+    EventNormalized.http_path,
+    EventNormalized.user_agent,
+    EventNormalized.country,
+    EventNormalized.fields_json,
+]
+
+DETECTION_COLUMNS = [
+    Detection.id,
+    Detection.created_at,
+    Detection.rule_id,
+    Detection.kind,
+    Detection.severity,
+    Detection.title,
+    Detection.summary,
+    Detection.status,
+    Detection.assignee,
+    Detection.tags,
+    Detection.event_ids,
+    Detection.features_json,
+]
+
+
+def _default(o: Any):
+    if isinstance(o, datetime):
+        return o.isoformat()
+    raise TypeError(f"not JSON serializable: {type(o).__name__}")
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+
+def _ndjson_chunk(names: Sequence[str], rows: Sequence[Any]) -> bytes:
+    return b"".join(_dumps(dict(zip(names, r))) + b"\n" for r in rows)
+
+
+def _csv_cell(v: Any) -> Any:
+    if v is None:
+        return ""
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, (dict, list)):
+        return _dumps(v).decode()
+    return v
+
+
+def _csv_chunk(rows: Sequence[Any], header: Sequence[str] | None = None) -> bytes:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    if header:
+        w.writerow(header)
+    w.writerows([_csv_cell(v) for v in r] for r in rows)
+    return buf.getvalue().encode()
+
+
+def _stream(columns: List[Any], conditions: list, fmt: str, limit: Optional[int]) -> Iterator[bytes]:
+    names = [c.key for c in columns]
+    # json names the fields after the API (features, fields) rather than the columns
+    names = [n[:-5] if n.endswith("_json") else n for n in names]
+    stmt = select(*columns).order_by(columns[0].asc())
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    if limit:
+        stmt = stmt.limit(limit)
+
+    if fmt == "csv":
+        yield _csv_chunk([], header=names)
+
+    # the request's session is closed before the body streams, so own one
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=CHUNK_ROWS))
+        for rows in result.partitions():
+            yield _ndjson_chunk(names, rows) if fmt == "ndjson" else _csv_chunk(rows)
+    finally:
+        db.close()
+
+
+def export_events(
+    fmt: str,
+    event_module: Optional[str] = None,
+    event_action: Optional[str] = None,
+    src_ip: Optional[str] = None,
+    user: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: Optional[int] = None,
+    q: Optional[str] = None,
+    q_mode: str = "substring",
+    q_field: str = "any",
+) -> Iterator[bytes]:
+    """Stream matching events, oldest first, in the given format."""
+    # built eagerly so bad filters fail before the response starts
+    conditions = event_conditions(event_module, event_action, src_ip, user, start, end, q, q_mode, q_field)
+    return _stream(EVENT_COLUMNS, conditions, fmt, limit)
+
+
+def export_detections(
+    fmt: str,
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    severity: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Iterator[bytes]:
+    """Stream matching detections, oldest first, in the given format."""
+    return _stream(DETECTION_COLUMNS, detection_conditions(status, kind, severity), fmt, limit)
@@ -0,0 +1,209 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import json
+import time
+
+from sqlalchemy import bindparam, select, and_, func, text, Select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+from ..core.config import settings
+from ..models.event import EventNormalized
+from ..schemas.hunt import HuntQuery
+
+# Ad-hoc hunt aggregations. A HuntQuery compiles to one GROUP BY statement
+# over events_normalized. Before it runs, the planner's estimate of the rows
+# it reads (not returns) is checked against settings.hunt_max_rows, and it
+# executes under a per-query statement_timeout so a runaway pivot cannot
+# hold a backend (or the detection runs that share the database) hostage.
+
+FIELDS = {
+    c: getattr(EventNormalized, c)
+    for c in ("event_module", "event_action", "src_ip", "dst_ip", "user", "http_method", "http_path", "user_agent", "country")
+}
+
+
+class HuntRejected(ValueError):
+    """The spec is invalid or would exceed the cost limits."""
+
+
+def _field(name: str):
+    col = FIELDS.get(name)
+    if col is None:
+        raise HuntRejected(f"unknown field '{name}' (allowed: {', '.join(FIELDS)})")
+    return col
+
+
+def _filter(f) -> Any:
+    col = _field(f.field)
+    if f.op == "is_null":
+        return col.is_(None)
+    if f.op == "not_null":
+        return col.is_not(None)
+    if f.op in ("in", "not_in"):
+        values = f.value if isinstance(f.value, list) else [f.value]
+        if not values:
+            raise HuntRejected(f"'{f.op}' on {f.field} needs a non-empty list")
+        return col.in_(values) if f.op == "in" else col.not_in(values)
+    if f.value is None or isinstance(f.value, (list, dict)):
+        raise HuntRejected(f"'{f.op}' on {f.field} needs a scalar value")
+    value = str(f.value)
+    if f.op == "eq":
+        return col == value
+    if f.op == "ne":
+        return col != value
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    if f.op == "prefix":
+        return col.like(escaped + "%", escape="\\")
+    return col.ilike("%" + escaped + "%", escape="\\")  # contains
+
+
+def _aggregate(a) -> tuple[str, Any]:
+    if a.fn == "count":
+        return a.alias or "count", func.count()
+    if a.fn == "count_distinct":
+        if not a.field:
+            raise HuntRejected("count_distinct needs a field")
+        return a.alias or f"distinct_{a.field}", func.count(func.distinct(_field(a.field)))
+    if a.fn == "min_time":
+        return a.alias or "first_seen", func.min(EventNormalized.timestamp)
+    return a.alias or "last_seen", func.max(EventNormalized.timestamp)
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def compile_hunt(spec: HuntQuery) -> Select:
+    start, end = _utc(spec.start), _utc(spec.end or datetime.now(timezone.utc))
+    if start >= end:
+        raise HuntRejected("start must be before end")
+
+    conds = [EventNormalized.timestamp >= start, EventNormalized.timestamp < end]
+    conds += [_filter(f) for f in spec.filters]
+
+    if len(set(spec.group_by)) != len(spec.group_by):
+        raise HuntRejected("group_by has duplicate fields")
+    groups = [_field(g).label(g) for g in spec.group_by]
+    aggs: Dict[str, Any] = {}
+    for a in spec.aggregates:
+        alias, expr = _aggregate(a)
+        if alias in aggs or alias in spec.group_by:
+            raise HuntRejected(f"duplicate output column '{alias}'")
+        aggs[alias] = expr.label(alias)
+
+    order_key = spec.order_by or next(iter(aggs))
+    if order_key not in aggs:
+        raise HuntRejected(f"order_by must be one of {', '.join(aggs)}")
+    order = aggs[order_key].desc() if spec.order == "desc" else aggs[order_key].asc()
+
+    stmt = select(*groups, *aggs.values()).where(and_(*conds))
+    if groups:
+        stmt = stmt.group_by(*groups)
+    return stmt.order_by(order, *groups).limit(spec.top)
+
+
+SCAN_NODES = ("Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Index Scan")
+
+
+def _scan_leaves(node: Dict[str, Any], parallel: int = 1) -> Iterator[Tuple[Dict[str, Any], int]]:
+    if node.get("Node Type") in ("Gather", "Gather Merge"):
+        parallel = int(node.get("Workers Planned", 0)) + 1  # the leader scans too
+    if node.get("Node Type") in SCAN_NODES:
+        yield node, parallel
+    for child in node.get("Plans", []):
+        yield from _scan_leaves(child, parallel)
+
+
+def rows_scanned(
+    plan: Dict[str, Any],
+    reltuples: Dict[str, float],
+    cond_rows: Callable[[str, str], Optional[float]] = lambda rel, cond: None,
+) -> float:
+    """
+    Rows the plan reads, summed over its scans. "Plan Rows" counts what a
+    node returns after its Filter, so a selective filter on a full scan looks
+    cheap; a Seq Scan reads the whole table (reltuples) however few rows it
+    keeps. An Index Scan with a Filter reads what its Index Cond matches,
+    which cond_rows(relation, cond) estimates (None: assume the whole table).
+    """
+    total = 0.0
+    for node, parallel in _scan_leaves(plan):
+        rows = float(node.get("Plan Rows", 0)) * (parallel if node.get("Parallel Aware") else 1)
+        table = float(reltuples.get(node.get("Relation Name"), 0.0))
+        kind = node["Node Type"]
+        if kind == "Seq Scan":
+            total += max(table, rows)
+        elif kind == "Bitmap Index Scan" or "Filter" not in node:
+            total += rows  # index matches, before any heap recheck or filter
+        elif "Index Cond" not in node:
+            total += max(table, rows)  # a full index walk, e.g. for ordering
+        else:
+            matched = cond_rows(node["Relation Name"], node["Index Cond"])
+            total += max(table if matched is None else matched, rows)
+    return total
+
+
+def _explain(conn: Connection, sql: str, params: Any = None) -> Dict[str, Any]:
+    sql = f"EXPLAIN (FORMAT JSON) {sql}"
+    # no params: the driver must not read a literal '%' in sql as a placeholder
+    plan = (conn.exec_driver_sql(sql) if params is None else conn.exec_driver_sql(sql, params)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def estimate_rows(conn: Connection, stmt: Select) -> float:
+    """Rows the planner expects the statement to read (see rows_scanned)."""
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    plan = _explain(conn, str(compiled), compiled.params)
+    relations = sorted({n["Relation Name"] for n, _ in _scan_leaves(plan) if "Relation Name" in n})
+    reltuples: Dict[str, float] = {}
+    if relations:
+        q = text("SELECT relname, reltuples FROM pg_class WHERE relname IN :names").bindparams(
+            bindparam("names", expanding=True)
+        )
+        reltuples = {name: float(n) for name, n in conn.execute(q, {"names": relations})}
+
+    def cond_rows(relation: str, cond: str) -> Optional[float]:
+        # the planner's estimate for the index condition alone; it was
+        # deparsed by Postgres, so re-planning it normally works, and a
+        # savepoint keeps a failure from aborting the hunt's transaction
+        sql = f"SELECT 1 FROM {conn.dialect.identifier_preparer.quote(relation)} WHERE {cond}"
+        try:
+            with conn.begin_nested():
+                return float(_explain(conn, sql).get("Plan Rows", 0))
+        except DBAPIError:
+            return None
+
+    return rows_scanned(plan, reltuples, cond_rows)
+
+
+def run_hunt(conn: Connection, spec: HuntQuery) -> Dict[str, Any]:
+    """
+    Check and run a hunt on conn, inside its current transaction. The caller
+    owns the transaction; SET LOCAL ends with it.
+    """
+    stmt = compile_hunt(spec)
+    timeout_ms = min(spec.timeout_ms or settings.hunt_timeout_ms, settings.hunt_timeout_ms)
+    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+    estimated = estimate_rows(conn, stmt)
+    if estimated > settings.hunt_max_rows:
+        raise HuntRejected(
+            f"query would read about {int(estimated):,} rows (limit {settings.hunt_max_rows:,}); "
+            "narrow the time range or add filters"
+        )
+
+    t0 = time.perf_counter()
+    result = conn.execute(stmt)
+    columns = list(result.keys())
+    rows = [dict(zip(columns, r)) for r in result.all()]
+    return {
+        "columns": columns,
+        "rows": rows,
+        "estimated_rows": int(estimated),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+        "timeout_ms": timeout_ms,
+    }
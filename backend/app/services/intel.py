@@ -0,0 +1,291 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from fnmatch import translate
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import ipaddress
+import logging
+import re
+import sys
+import threading
+import time
+
+from ..core.config import settings
+from ..core.telemetry import Counter
+from .ipindex import IPRangeIndex
+
+log = logging.getLogger(__name__)
+
+# Threat-intel indicators from local feed files (settings.intel_feed_dir).
+# Each file is one feed, named after its stem; one indicator per line, '#'
+# starts a comment. A line is typed by its shape, or explicitly with a
+# prefix (ip:, domain:, path:):
+#
+#   203.0.113.7            ip
+#   198.51.100.0/24        cidr (IPv4 or IPv6)
+#   evil.example           domain, also matches subdomains
+#   /wp-login.php          exact path
+#   /cgi-bin/*.sh          path pattern (fnmatch)
+#
+# All feeds compile into one immutable IntelIndex. current() swaps in a
+# rebuilt index when a feed file's mtime changes; readers keep whichever
+# snapshot they grabbed, so a reload never blocks or tears a lookup.
+
+FEED_GLOBS = ("*.txt", "*.csv", "*.ioc")
+DOMAIN_FIELDS = ("domain", "host", "hostname", "query", "server_name")
+
+ioc_matches = Counter("ioc_matches_total", "Ingested events tagged with an indicator, by feed.", ("feed",))
+
+_DOMAIN_RE = re.compile(r"^(?=.{1,253}$)(?!-)[a-z0-9-]{1,63}(?:\.[a-z0-9-]{1,63})+$")
+
+
+@dataclass
+class FeedInfo:
+    name: str
+    path: str
+    mtime: float
+    ips: int = 0
+    cidrs: int = 0
+    domains: int = 0
+    paths: int = 0
+    patterns: int = 0
+    invalid: int = 0
+    approx_bytes: int = 0
+
+
+@dataclass
+class _Feed:
+    info: FeedInfo
+    networks: List[str] = field(default_factory=list)
+    domains: Set[str] = field(default_factory=set)
+    paths: Set[str] = field(default_factory=set)
+    patterns: List[str] = field(default_factory=list)
+
+
+def _classify(line: str) -> Tuple[str, str]:
+    kind, sep, rest = line.partition(":")
+    if sep and kind in ("ip", "domain", "path"):
+        return kind, rest.strip()
+    if line.startswith("/"):
+        return "path", line
+    try:
+        ipaddress.ip_network(line, strict=False)
+        return "ip", line
+    except ValueError:
+        pass
+    return "domain", line
+
+
+def _load_feed(path: Path) -> _Feed:
+    feed = _Feed(FeedInfo(name=path.stem, path=str(path), mtime=path.stat().st_mtime))
+    info = feed.info
+    with path.open(encoding="utf-8", errors="replace") as fh:
+        for raw in fh:
+            line = raw.split("#", 1)[0].strip().split(",", 1)[0].strip()  # csv: first column
+            if not line:
+                continue
+            kind, value = _classify(line)
+            if kind == "ip":
+                try:
+                    net = ipaddress.ip_network(value, strict=False)
+                except ValueError:
+                    info.invalid += 1
+                    continue
+                feed.networks.append(str(net))
+                if net.num_addresses == 1:
+                    info.ips += 1
+                else:
+                    info.cidrs += 1
+            elif kind == "path":
+                if any(c in value for c in "*?["):
+                    feed.patterns.append(value)
+                    info.patterns += 1
+                else:
+                    feed.paths.add(value)
+                    info.paths += 1
+            else:
+                value = value.lower().rstrip(".")
+                if not _DOMAIN_RE.match(value):
+                    info.invalid += 1
+                    continue
+                feed.domains.add(value)
+                info.domains += 1
+    return feed
+
+
+class IntelIndex:
+    """Immutable lookup structures over every loaded feed."""
+
+    def __init__(self, feeds: List[_Feed]):
+        self.feeds = [f.info for f in feeds]
+        self.loaded_at = datetime.now(timezone.utc)
+        self._ips: IPRangeIndex[Tuple[str, str]] = IPRangeIndex(
+            (net, (f.info.name, net)) for f in feeds for net in f.networks
+        )
+        self._domains: Dict[str, Tuple[str, ...]] = {}
+        self._paths: Dict[str, Tuple[str, ...]] = {}
+        for f in feeds:
+            for d in f.domains:
+                self._domains[d] = self._domains.get(d, ()) + (f.info.name,)
+            for p in f.paths:
+                self._paths[p] = self._paths.get(p, ()) + (f.info.name,)
+        # one alternation per feed, so a path is tested once per feed, not per pattern
+        self._patterns: List[Tuple[str, re.Pattern]] = [
+            (f.info.name, re.compile("|".join(f"(?:{translate(p)})" for p in f.patterns)))
+            for f in feeds if f.patterns
+        ]
+        for f in feeds:
+            f.info.approx_bytes = _feed_bytes(f)
+
+    def __bool__(self) -> bool:
+        return bool(self.feeds)
+
+    def match_ip(self, ip: Optional[str]) -> Tuple[Tuple[str, str], ...]:
+        return self._ips.lookup(ip)
+
+    def match_domain(self, name: Optional[str]) -> List[Tuple[str, str]]:
+        """(feed, indicator) for name and each parent domain listed in a feed."""
+        if not name or not self._domains:
+            return []
+        labels = name.lower().rstrip(".").split(".")
+        out = []
+        for i in range(len(labels) - 1):
+            suffix = ".".join(labels[i:])
+            for feed in self._domains.get(suffix, ()):
+                out.append((feed, suffix))
+        return out
+
+    def match_path(self, path: Optional[str]) -> List[Tuple[str, str]]:
+        if not path:
+            return []
+        path = path.split("?", 1)[0]
+        out = [(feed, path) for feed in self._paths.get(path, ())]
+        for feed, rx in self._patterns:
+            if rx.match(path):
+                out.append((feed, path))
+        return out
+
+    def match_event(self, src_ip, dst_ip, http_path, fields: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Indicator hits for one event, as stored under fields_json["ioc"]."""
+        return self._hits(self.match_ip(src_ip), self.match_ip(dst_ip), http_path, fields)
+
+    def match_events(self, events: Sequence[Tuple[Any, Any, Any, Optional[Dict[str, Any]]]]) -> List[List[Dict[str, str]]]:
+        """match_event for (src_ip, dst_ip, http_path, fields) rows, with one vectorised IP lookup for the batch."""
+        ips = self._ips.lookup_many([ip for e in events for ip in (e[0], e[1])])
+        return [self._hits(ips[2 * i], ips[2 * i + 1], e[2], e[3]) for i, e in enumerate(events)]
+
+    def _hits(self, src_hits, dst_hits, http_path, fields: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+        hits: List[Dict[str, str]] = []
+        for fld, ip_hits in (("src_ip", src_hits), ("dst_ip", dst_hits)):
+            for feed, ind in ip_hits:
+                hits.append({"feed": feed, "type": "ip", "field": fld, "indicator": ind})
+        for feed, ind in self.match_path(http_path):
+            hits.append({"feed": feed, "type": "path", "field": "http_path", "indicator": ind})
+        if fields and self._domains:
+            for fld in DOMAIN_FIELDS:
+                v = fields.get(fld)
+                if isinstance(v, str):
+                    for feed, ind in self.match_domain(v):
+                        hits.append({"feed": feed, "type": "domain", "field": fld, "indicator": ind})
+        return hits
+
+    def ip_index_bytes(self) -> int:
+        return self._ips.approx_bytes()
+
+
+def _feed_bytes(f: _Feed) -> int:
+    # the feed's own strings and sets, plus ~16 bytes per range in the shared IP index
+    size = sys.getsizeof(f.domains) + sum(sys.getsizeof(d) for d in f.domains)
+    size += sys.getsizeof(f.paths) + sum(sys.getsizeof(p) for p in f.paths)
+    size += sum(sys.getsizeof(p) for p in f.patterns)
+    size += sum(sys.getsizeof(n) for n in f.networks) + 16 * len(f.networks)
+    return size
+
+
+_EMPTY = IntelIndex([])
+_index: IntelIndex = _EMPTY
+_signature: Tuple = ()
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _feed_files() -> List[Path]:
+    d = settings.intel_feed_dir
+    if not d:
+        return []
+    root = Path(d)
+    if not root.is_dir():
+        return []
+    return sorted({p for g in FEED_GLOBS for p in root.glob(g) if p.is_file()})
+
+
+def reload(force: bool = False) -> IntelIndex:
+    """Rebuild the index if any feed file was added, removed or modified."""
+    global _index, _signature, _checked_at
+    with _lock:
+        _checked_at = time.monotonic()
+        try:
+            files = _feed_files()
+            sig = tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in files)
+        except OSError:
+            log.warning("could not scan intel feed dir %s", settings.intel_feed_dir, exc_info=True)
+            return _index
+        if sig == _signature and not force:
+            return _index
+        feeds = []
+        for p in files:
+            try:
+                feeds.append(_load_feed(p))
+            except OSError:
+                log.warning("could not read intel feed %s", p, exc_info=True)
+        _index = IntelIndex(feeds) if feeds else _EMPTY  # atomic swap
+        _signature = sig
+        log.info("loaded %d intel feed(s) from %s", len(feeds), settings.intel_feed_dir)
+        return _index
+
+
+def current() -> IntelIndex:
+    """The live index; re-checks feed mtimes at most every intel_reload_seconds."""
+    if time.monotonic() - _checked_at >= settings.intel_reload_seconds and not _lock.locked():
+        return reload()  # a reload already running serves everyone else the old snapshot
+    return _index
+
+
+def tag_event(src_ip, dst_ip, http_path, fields: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """fields with an "ioc" list added when the event matches any indicator, else None."""
+    index = current()
+    if not index:
+        return None
+    hits = index.match_event(src_ip, dst_ip, http_path, fields)
+    if not hits:
+        return None
+    for feed in {h["feed"] for h in hits}:
+        ioc_matches.inc(feed)
+    return {**(fields or {}), "ioc": hits}
+
+
+def tag_events(events: Sequence[Tuple[Any, Any, Any, Optional[Dict[str, Any]]]]) -> List[Optional[Dict[str, Any]]]:
+    """tag_event for a batch of (src_ip, dst_ip, http_path, fields), against one index snapshot."""
+    index = current()
+    if not index:
+        return [None] * len(events)
+    out: List[Optional[Dict[str, Any]]] = []
+    for (_, _, _, fields), hits in zip(events, index.match_events(events)):
+        if not hits:
+            out.append(None)
+            continue
+        for feed in {h["feed"] for h in hits}:
+            ioc_matches.inc(feed)
+        out.append({**(fields or {}), "ioc": hits})
+    return out
+
+
+def feeds_status() -> Dict[str, Any]:
+    index = current()
+    return {
+        "feed_dir": settings.intel_feed_dir,
+        "loaded_at": index.loaded_at.isoformat() if index else None,
+        "ip_index_bytes": index.ip_index_bytes(),
+        "feeds": [vars(f) for f in index.feeds],
+    }
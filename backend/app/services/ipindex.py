@@ -0,0 +1,142 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_right
+from typing import Dict, Generic, Iterable, List, Optional, Sequence, Tuple, TypeVar
+import ipaddress
+import socket
+import sys
+
+import numpy as np
+
+# Overlapping CIDRs flattened into disjoint intervals: every range boundary
+# splits the address line, and each elementary segment keeps the labels of
+# all ranges covering it. A lookup is then one binary search over the
+# segment starts: O(log n) whatever the overlap. IPv4 bounds are packed
+# uint32 arrays (8 bytes per segment), which numpy reads without a copy to
+# resolve whole batches with one searchsorted call.
+
+T = TypeVar("T")
+_U32 = next(t for t in "IL" if array(t).itemsize == 4)
+
+
+def _as_int(ip: str) -> Tuple[int, int]:
+    """(version, integer) for an address; raises ValueError if not an IP."""
+    # inet_pton is several times faster than ipaddress.ip_address
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+    except OSError:
+        raise ValueError(f"not an IP address: {ip!r}")
+
+
+class _Family(Generic[T]):
+    def __init__(self, ranges: Iterable[Tuple[int, int, T]], typecode: str | None = None):
+        points: Dict[int, Tuple[List[T], List[T]]] = {}
+        for lo, hi, label in ranges:
+            points.setdefault(lo, ([], []))[0].append(label)
+            points.setdefault(hi + 1, ([], []))[1].append(label)
+
+        starts: List[int] = []
+        ends: List[int] = []
+        self.labels: List[Tuple[T, ...]] = []
+        interned: Dict[Tuple[T, ...], Tuple[T, ...]] = {}
+        active: Dict[T, int] = {}
+        bounds = sorted(points)
+        for i, p in enumerate(bounds):
+            opened, closed = points[p]
+            for label in closed:
+                active[label] -= 1
+                if not active[label]:
+                    del active[label]
+            for label in opened:
+                active[label] = active.get(label, 0) + 1
+            if active and i + 1 < len(bounds):
+                starts.append(p)
+                ends.append(bounds[i + 1] - 1)
+                t = tuple(active)
+                self.labels.append(interned.setdefault(t, t))
+        # IPv6 needs 128-bit ints, so only IPv4 packs into an array
+        self.starts = array(typecode, starts) if typecode else starts
+        self.ends = array(typecode, ends) if typecode else ends
+
+    def lookup(self, n: int) -> Tuple[T, ...]:
+        i = bisect_right(self.starts, n) - 1
+        if i >= 0 and n <= self.ends[i]:
+            return self.labels[i]
+        return ()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class IPRangeIndex(Generic[T]):
+    """Immutable IP/CIDR -> labels index for IPv4 and IPv6."""
+
+    def __init__(self, entries: Iterable[Tuple[str, T]]):
+        v4: List[Tuple[int, int, T]] = []
+        v6: List[Tuple[int, int, T]] = []
+        for cidr, label in entries:
+            net = ipaddress.ip_network(cidr, strict=False)
+            (v4 if net.version == 4 else v6).append((int(net.network_address), int(net.broadcast_address), label))
+        self._v4: _Family[T] = _Family(v4, typecode=_U32)
+        self._v6: _Family[T] = _Family(v6)
+        self._v4_starts = np.frombuffer(self._v4.starts, dtype=np.uint32)
+        self._v4_ends = np.frombuffer(self._v4.ends, dtype=np.uint32)
+
+    def lookup(self, ip: Optional[str]) -> Tuple[T, ...]:
+        """Labels of every range containing ip; () for no match or a non-IP."""
+        if not ip:
+            return ()
+        try:
+            version, n = _as_int(ip)
+        except ValueError:
+            return ()
+        return (self._v4 if version == 4 else self._v6).lookup(n)
+
+    def lookup_many(self, ips: Sequence[Optional[str]]) -> List[Tuple[T, ...]]:
+        """lookup() for a batch: IPv4 addresses are packed and resolved in one searchsorted call."""
+        out: List[Tuple[T, ...]] = [()] * len(ips)
+        packed: List[bytes] = []
+        pos: List[int] = []
+        for i, ip in enumerate(ips):
+            if not ip:
+                continue
+            try:
+                packed.append(socket.inet_pton(socket.AF_INET, ip))
+                pos.append(i)
+            except OSError:
+                out[i] = self.lookup(ip)  # IPv6, or not an address
+        if packed:
+            a = np.frombuffer(b"".join(packed), dtype=">u4")
+            for i, labels in zip(pos, self._lookup_v4(a)):
+                out[i] = labels
+        return out
+
+    def lookup_many_v4(self, addrs: Sequence[int]) -> List[Tuple[T, ...]]:
+        """Vectorised lookup of IPv4 addresses given as integers."""
+        return self._lookup_v4(np.asarray(addrs, dtype=np.uint32))
+
+    def _lookup_v4(self, a: np.ndarray) -> List[Tuple[T, ...]]:
+        if not len(self._v4_starts):
+            return [()] * len(a)
+        a = a.astype(np.uint32, copy=False)
+        idx = np.searchsorted(self._v4_starts, a, side="right") - 1
+        hit = (idx >= 0) & (a <= self._v4_ends[np.maximum(idx, 0)])
+        labels = self._v4.labels
+        return [labels[i] if h else () for i, h in zip(idx.tolist(), hit.tolist())]
+
+    def __len__(self) -> int:
+        return len(self._v4) + len(self._v6)
+
+    def approx_bytes(self) -> int:
+        """Rough resident size of the index structures."""
+        total = 0
+        for fam in (self._v4, self._v6):
+            total += sys.getsizeof(fam.starts) + sys.getsizeof(fam.ends) + sys.getsizeof(fam.labels)
+            if isinstance(fam.starts, list):
+                total += sum(sys.getsizeof(n) for n in fam.starts) + sum(sys.getsizeof(n) for n in fam.ends)
+            total += sum(sys.getsizeof(t) for t in {id(t): t for t in fam.labels}.values())
+        return total
@@ -0,0 +1,70 @@
+from __future__ import annotations
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+from sqlalchemy import tuple_
+
+# Opaque keyset cursors. A cursor is the (order key, id) of the last row of a
+# page; the next page starts strictly after it, so the cost of a page does
+# not depend on how deep it is and rows inserted meanwhile never shift it.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _default(o: Any):
+    if isinstance(o, datetime):
+        return o.isoformat()
+    raise TypeError(f"unsupported cursor value {type(o).__name__}")
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), default=_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, arity: int) -> List[Any]:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(values, list) or len(values) != arity:
+        raise ValueError("invalid cursor")
+    return values
+
+
+def decode_int(value: Any) -> int:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError("invalid cursor")
+    return value
+
+
+def decode_float(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("invalid cursor")
+    return float(value)
+
+
+def decode_datetime(value: Any) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+
+def after_desc(cols: Sequence[Any], values: Sequence[Any]):
+    """WHERE clause for the rows that follow `values` in (cols...) DESC order."""
+    if len(cols) == 1:
+        return cols[0] < values[0]
+    return tuple_(*cols) < tuple_(*values)
+
+
+def next_cursor(rows: Sequence[Any], limit: int, *key_attrs: str) -> str | None:
+    """Cursor for the page after `rows`, or None when this was the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(*(getattr(last, a) for a in key_attrs))
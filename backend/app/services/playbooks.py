@@ -0,0 +1,382 @@
+from __future__ import annotations
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import threading
+import time
+
+import yaml
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.redis_client import redis_client
+from ..core.telemetry import Counter, Histogram
+from ..detectors.engine import parse_window
+from . import cases as case_service
+from .respond import bulk_block
+
+log = logging.getLogger(__name__)
+
+# Declarative response playbooks, one YAML file each in app/playbooks (or
+# settings.playbooks_dir). The playbook runner (workers/playbook_runner.py)
+# checks every new detection against them:
+#
+#   id: ssh-bruteforce-containment
+#   dry_run: true                       # report only
+#   match: {rule_id: SSH-Bruteforce, min_severity: high}
+#   idempotency_key: "{playbook}:{src_ip}"
+#   idempotency_ttl: "24h"
+#   rate_limit: {count: 10, per: "1m"}
+#   actions:
+#     - {type: block_src_ip, ttl_minutes: 60, max_targets: 5}
+#     - {type: open_case, title: "SSH brute force from {src_ip}"}
+#
+# Guard rails, in order: the idempotency key is claimed with SET NX (a held
+# key means "already handled"), then the per-playbook and global
+# (playbooks_max_runs_per_minute) fixed-window limits are taken. All of it
+# lives in Redis, so it holds across processes; without Redis nothing runs.
+# A run is at most once: a failed run keeps its key and is not retried.
+# Automated blocks must carry a TTL and are refused when the evidence holds
+# more than max_targets source IPs.
+
+PLAYBOOKS_DIR = Path(__file__).resolve().parents[1] / "playbooks"
+SEVERITIES = ("low", "medium", "high", "critical")
+MATCH_KEYS = ("rule_id", "kind", "severity")
+DEFAULT_KEY = "{playbook}:{detection_id}"
+KEY_PREFIX = "playbooks:"
+RUNS_KEY = "playbooks:runs"
+RUNS_KEPT = 500
+
+playbook_runs = Counter("playbook_runs_total", "Playbook evaluations by outcome.", ("playbook", "outcome"))
+playbook_delay = Histogram(
+    "playbook_action_delay_seconds",
+    "Time from detection creation to a playbook's actions completing.",
+    ("playbook",),
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+# names usable in idempotency_key and case title/description templates
+_TEMPLATE_VARS = {"playbook": "", "detection_id": 0, "rule_id": "", "severity": "", "title": "", "src_ip": ""}
+
+
+@dataclass
+class Playbook:
+    id: str
+    path: str
+    actions: List[Dict[str, Any]]
+    description: str = ""
+    match: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    min_severity: Optional[str] = None
+    dry_run: bool = False
+    idempotency_key: str = DEFAULT_KEY
+    idempotency_ttl: int = 86400  # seconds
+    rate_count: int = 10
+    rate_per: int = 60  # seconds
+
+    def matches(self, det) -> bool:
+        for key, allowed in self.match.items():
+            value = getattr(det, key) or ""
+            if (value.lower() if key == "severity" else value) not in allowed:
+                return False
+        if self.min_severity and _rank(det.severity) < _rank(self.min_severity):
+            return False
+        return True
+
+
+def _rank(severity: Optional[str]) -> int:
+    s = (severity or "").lower()
+    return SEVERITIES.index(s) if s in SEVERITIES else -1
+
+
+def _template(value: Any, what: str) -> str:
+    s = str(value)
+    try:
+        s.format_map(_TEMPLATE_VARS)
+    except (KeyError, ValueError, IndexError) as e:
+        raise ValueError(f"{what}: invalid template {s!r} ({e!r})")
+    return s
+
+
+def _strings(value: Any) -> Tuple[str, ...]:
+    return tuple(str(v) for v in (value if isinstance(value, list) else [value]))
+
+
+def _severity(value: Any, what: str) -> str:
+    s = str(value).lower()
+    if s not in SEVERITIES:
+        raise ValueError(f"{what} must be one of {', '.join(SEVERITIES)}")
+    return s
+
+
+def _positive_int(value: Any, what: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"{what} must be a positive integer")
+    return value
+
+
+def _window(value: Any, what: str) -> int:
+    # parse_window accepts "0m" and "-5m"; a zero window would divide by zero in _take
+    seconds = int(parse_window(str(value)).total_seconds())
+    if seconds < 1:
+        raise ValueError(f"{what} must be a positive duration")
+    return seconds
+
+
+def _parse_action(a: Any, i: int) -> Dict[str, Any]:
+    where = f"actions[{i}]"
+    if not isinstance(a, dict):
+        raise ValueError(f"{where} must be a mapping")
+    kind = a.get("type")
+    if kind == "block_src_ip":
+        # no open-ended automated blocks
+        return {
+            "type": kind,
+            "ttl_minutes": _positive_int(a.get("ttl_minutes"), f"{where}.ttl_minutes"),
+            "max_targets": _positive_int(a.get("max_targets", 5), f"{where}.max_targets"),
+        }
+    if kind == "open_case":
+        return {
+            "type": kind,
+            "title": _template(a.get("title", "{title}"), f"{where}.title"),
+            "description": _template(a["description"], f"{where}.description") if a.get("description") else None,
+            "severity": _severity(a["severity"], f"{where}.severity") if a.get("severity") else None,
+            "assignee": a.get("assignee"),
+        }
+    raise ValueError(f"{where}.type must be one of {', '.join(ACTIONS)}")
+
+
+def parse_playbook(data: Any, path: str) -> Playbook:
+    """Validate one playbook document; raises ValueError describing the first problem."""
+    if not isinstance(data, dict):
+        raise ValueError("playbook must be a mapping")
+    pid = data.get("id")
+    if not isinstance(pid, str) or not pid:
+        raise ValueError("id is required")
+
+    spec = data.get("match")
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError("match is required (a playbook may not match every detection)")
+    match: Dict[str, Tuple[str, ...]] = {}
+    for key, value in spec.items():
+        if key == "min_severity":
+            continue
+        if key not in MATCH_KEYS:
+            raise ValueError(f"unknown match key '{key}' (use {', '.join(MATCH_KEYS)} or min_severity)")
+        match[key] = tuple(v.lower() for v in _strings(value)) if key == "severity" else _strings(value)
+
+    actions = data.get("actions")
+    if not isinstance(actions, list) or not actions:
+        raise ValueError("actions must be a non-empty list")
+
+    rate = data.get("rate_limit") or {}
+    if not isinstance(rate, dict):
+        raise ValueError("rate_limit must be a mapping")
+
+    return Playbook(
+        id=pid,
+        path=path,
+        description=str(data.get("description") or ""),
+        match=match,
+        min_severity=_severity(spec["min_severity"], "match.min_severity") if spec.get("min_severity") else None,
+        actions=[_parse_action(a, i) for i, a in enumerate(actions)],
+        dry_run=bool(data.get("dry_run", False)),
+        idempotency_key=_template(data.get("idempotency_key", DEFAULT_KEY), "idempotency_key"),
+        idempotency_ttl=_window(data.get("idempotency_ttl", "24h"), "idempotency_ttl"),
+        rate_count=_positive_int(rate.get("count", 10), "rate_limit.count"),
+        rate_per=_window(rate.get("per", "1m"), "rate_limit.per"),
+    )
+
+
+# ---------- loading ----------
+
+_playbooks: List[Playbook] = []
+_errors: List[Dict[str, str]] = []
+_signature: Tuple = ()
+_lock = threading.Lock()
+
+
+def playbooks_dir() -> Path:
+    return Path(settings.playbooks_dir) if settings.playbooks_dir else PLAYBOOKS_DIR
+
+
+def load(force: bool = False) -> List[Playbook]:
+    """The valid playbooks; files are re-read when any of them changes."""
+    global _playbooks, _errors, _signature
+    with _lock:
+        root = playbooks_dir()
+        files = sorted(p for g in ("*.yml", "*.yaml") for p in root.glob(g)) if root.is_dir() else []
+        try:
+            sig = tuple((str(p), p.stat().st_mtime_ns) for p in files)
+        except OSError:
+            return _playbooks
+        if sig == _signature and not force:
+            return _playbooks
+        loaded: List[Playbook] = []
+        errors: List[Dict[str, str]] = []
+        for p in files:
+            try:
+                with p.open("r", encoding="utf-8") as fh:
+                    pb = parse_playbook(yaml.safe_load(fh), str(p))
+                if any(other.id == pb.id for other in loaded):
+                    raise ValueError(f"duplicate playbook id '{pb.id}'")
+            except (OSError, yaml.YAMLError, ValueError) as e:
+                log.warning("skipping playbook %s: %s", p, e)
+                errors.append({"path": str(p), "error": str(e)})
+                continue
+            loaded.append(pb)
+        _playbooks, _errors, _signature = loaded, errors, sig
+        return loaded
+
+
+def status() -> Dict[str, Any]:
+    pbs = load()
+    return {
+        "enabled": settings.playbooks_enabled,
+        "dry_run_all": settings.playbooks_dry_run,
+        "max_runs_per_minute": settings.playbooks_max_runs_per_minute,
+        "dir": str(playbooks_dir()),
+        "playbooks": [asdict(pb) for pb in pbs],
+        "errors": list(_errors),
+    }
+
+
+# ---------- guard rails (Redis) ----------
+
+def _prefix(dry: bool) -> str:
+    # dry runs keep their own keys and counters, so they never hold back real ones
+    return KEY_PREFIX + ("dry:" if dry else "")
+
+
+def _claim(key: str, ttl: int, dry: bool) -> bool:
+    return bool(redis_client.set(f"{_prefix(dry)}idem:{key}", "1", nx=True, ex=ttl))
+
+
+def _release(key: str, dry: bool):
+    redis_client.delete(f"{_prefix(dry)}idem:{key}")
+
+
+def _take(scope: str, limit: int, per: int, dry: bool) -> bool:
+    """Count one run in the current fixed window; False once the window is full."""
+    k = f"{_prefix(dry)}rate:{scope}:{int(time.time()) // per}"
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.incr(k)
+    pipe.expire(k, per * 2)
+    count, _ = pipe.execute()
+    return count <= limit
+
+
+# ---------- actions ----------
+
+def _block_src_ip(db: Session, pb: Playbook, action: Dict[str, Any], det, ips: List[str], tv: Dict[str, Any], dry: bool):
+    out: Dict[str, Any] = {"type": "block_src_ip"}
+    if not ips:
+        return {**out, "status": "skipped", "reason": "no source IPs in evidence"}
+    if len(ips) > action["max_targets"]:
+        return {**out, "status": "skipped", "reason": f"{len(ips)} source IPs exceeds max_targets={action['max_targets']}"}
+    if dry:
+        return {**out, "status": "dry_run", "targets": ips, "ttl_minutes": action["ttl_minutes"]}
+    results = bulk_block(
+        db, ips,
+        reason=f"playbook {pb.id}: detection {det.id} ({det.rule_id})"[:512],
+        created_by=f"playbook:{pb.id}",
+        ttl_minutes=action["ttl_minutes"],
+    )
+    return {**out, "status": "done", "results": results}
+
+
+def _open_case(db: Session, pb: Playbook, action: Dict[str, Any], det, ips: List[str], tv: Dict[str, Any], dry: bool):
+    title = action["title"].format_map(tv)[:256]
+    if dry:
+        return {"type": "open_case", "status": "dry_run", "title": title}
+    severity = action["severity"] or ((det.severity or "").lower() if _rank(det.severity) >= 0 else "medium")
+    description = action["description"].format_map(tv) if action["description"] else det.summary
+    c = case_service.create_case(
+        db, title=title, description=description, severity=severity,
+        detection_ids=[det.id], assignee=action["assignee"],
+    )
+    return {"type": "open_case", "status": "done", "case_id": c.id}
+
+
+ACTIONS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "block_src_ip": _block_src_ip,
+    "open_case": _open_case,
+}
+
+
+# ---------- runs ----------
+
+_recent: deque = deque(maxlen=RUNS_KEPT)  # fallback for recent_runs() without Redis
+
+
+def _finish(run: Dict[str, Any], outcome: str) -> Dict[str, Any]:
+    run["outcome"] = outcome
+    playbook_runs.inc(run["playbook"], outcome)
+    _recent.appendleft(run)
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.lpush(RUNS_KEY, json.dumps(run, default=str))
+        pipe.ltrim(RUNS_KEY, 0, RUNS_KEPT - 1)
+        pipe.execute()
+    except Exception:
+        pass
+    if outcome != "duplicate":
+        log.info("playbook %s on detection %s: %s", run["playbook"], run["detection_id"], outcome)
+    return run
+
+
+def run_playbook(db: Session, pb: Playbook, det, ips: List[str]) -> Dict[str, Any]:
+    """
+    Run pb's actions for a detection it matched, behind its idempotency key and
+    rate limits. ips are the detection's evidence source IPs. Redis errors
+    propagate, so the caller stops rather than acting unguarded.
+    """
+    dry = pb.dry_run or settings.playbooks_dry_run
+    tv = {
+        "playbook": pb.id,
+        "detection_id": det.id,
+        "rule_id": det.rule_id or "",
+        "severity": det.severity or "",
+        "title": det.title or "",
+        "src_ip": ",".join(ips) or "-",
+    }
+    key = pb.idempotency_key.format_map(tv)
+    run: Dict[str, Any] = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "playbook": pb.id,
+        "detection_id": det.id,
+        "rule_id": det.rule_id,
+        "dry_run": dry,
+        "key": key,
+    }
+    if not _claim(key, pb.idempotency_ttl, dry):
+        return _finish(run, "duplicate")
+    if not (_take(f"pb:{pb.id}", pb.rate_count, pb.rate_per, dry)
+            and _take("global", settings.playbooks_max_runs_per_minute, 60, dry)):
+        _release(key, dry)  # a later detection may still act once there is room
+        return _finish(run, "rate_limited")
+
+    run["actions"] = []
+    try:
+        for action in pb.actions:
+            run["actions"].append(ACTIONS[action["type"]](db, pb, action, det, ips, tv, dry))
+    except Exception as e:
+        db.rollback()
+        log.exception("playbook %s failed on detection %s", pb.id, det.id)
+        run["error"] = str(e)
+        return _finish(run, "failed")
+    if not dry and det.created_at is not None:
+        created = det.created_at if det.created_at.tzinfo else det.created_at.replace(tzinfo=timezone.utc)
+        playbook_delay.observe((datetime.now(timezone.utc) - created).total_seconds(), pb.id)
+    return _finish(run, "dry_run" if dry else "executed")
+
+
+def recent_runs(limit: int = 50) -> List[Dict[str, Any]]:
+    limit = max(1, min(limit, RUNS_KEPT))
+    try:
+        return [json.loads(r) for r in redis_client.lrange(RUNS_KEY, 0, limit - 1)]
+    except Exception:
+        return list(_recent)[:limit]
@@ -1,44 +1,162 @@
+from sqlalchemy import insert, or_, select, update
 from sqlalchemy.orm import Session
-from sqlalchemy import select
 from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
 from ..models.block import BlockRule
+from ..core.cache import invalidate
+from .pagination import decode_cursor, decode_int, after_desc
+from . import blocklist
+from .blockfeed import log_changes
 
 def utcnow():
     return datetime.now(timezone.utc)
 
 def add_block(db: Session, ip: str, reason: str, created_by: str | None, ttl_minutes: int | None = None) -> BlockRule:
+    ip = blocklist.normalize_target(ip)  # ValueError for anything but an IP or CIDR
     expires = None
     if ttl_minutes and ttl_minutes > 0:
         expires = utcnow() + timedelta(minutes=ttl_minutes)
     rule = BlockRule(ip=ip, reason=reason, created_by=created_by, expires_at=expires, active=True)
     db.add(rule)
+    db.flush()
+    log_changes(db, [(rule.id, rule.ip, "add")])
     db.commit()
+    invalidate("blocks")
     db.refresh(rule)
+    blocklist.rules_added([rule])
     return rule
 
-def list_blocks(db: Session, active_only: bool = True, limit: int = 200, offset: int = 0):
+def blocks_query(db: Session, active_only: bool = True, limit: int = 200, offset: int = 0, cursor: str | None = None):
     q = db.query(BlockRule).order_by(BlockRule.id.desc())
     if active_only:
         q = q.filter(BlockRule.active.is_(True))
-    return q.limit(limit).offset(offset).all()
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        q = q.filter(after_desc([BlockRule.id], [decode_int(last_id)]))
+        offset = 0
+    return q.limit(limit).offset(offset)
+
+def list_blocks(db: Session, active_only: bool = True, limit: int = 200, offset: int = 0, cursor: str | None = None):
+    return blocks_query(db, active_only=active_only, limit=limit, offset=offset, cursor=cursor).all()
 
 def deactivate_block(db: Session, rule_id: int) -> bool:
     r = db.get(BlockRule, rule_id)
     if not r:
         return False
+    if not r.active:
+        return True
     r.active = False
+    log_changes(db, [(r.id, r.ip, "remove")])
     db.commit()
+    invalidate("blocks")
+    blocklist.rules_removed([rule_id])
     return True
 
-def is_blocked(db: Session, ip: str) -> bool:
-    # true if there's an active, non-expired rule
+# ---------- bulk ----------
+# One request may carry up to BULK_MAX targets. Each input gets a result dict
+# in request order: {"input", "target", "status", ...}; an input that repeats
+# an earlier one (after normalisation) is reported as "duplicate".
+
+BULK_MAX = 5000
+
+def _prepare(targets: Iterable[str]) -> Tuple[List[dict], Dict[str, dict]]:
+    """(results in request order, normalised target -> its result)"""
+    targets = list(targets)
+    if len(targets) > BULK_MAX:
+        raise ValueError(f"at most {BULK_MAX} targets per request")
+    results, pending = [], {}
+    for raw in targets:
+        try:
+            target = blocklist.normalize_target(raw)
+        except ValueError as e:
+            results.append({"input": raw, "status": "invalid", "error": str(e)})
+            continue
+        if target in pending:
+            results.append({"input": raw, "target": target, "status": "duplicate"})
+            continue
+        res = {"input": raw, "target": target}
+        pending[target] = res
+        results.append(res)
+    return results, pending
+
+def bulk_block(db: Session, targets: Iterable[str], reason: str, created_by: str | None,
+               ttl_minutes: int | None = None) -> List[dict]:
+    """
+    Block many IPs/CIDRs with one INSERT. Targets that already have a live
+    rule, or plain IPs inside a blocked CIDR, are reported as "exists" with
+    the covering rule ids instead of getting another rule.
+    """
+    results, pending = _prepare(targets)
+    if not pending:
+        return results
     now = utcnow()
-    stmt = select(BlockRule).where(
-        BlockRule.ip == ip,
-        BlockRule.active.is_(True),
-    )
-    rows = db.execute(stmt).scalars().all()
+    live = db.execute(
+        select(BlockRule.id, BlockRule.ip).where(
+            BlockRule.active.is_(True),
+            BlockRule.ip.in_(list(pending)),
+            or_(BlockRule.expires_at.is_(None), BlockRule.expires_at > now),
+        )
+    ).all()
+    for r in live:
+        res = pending[r.ip]
+        res["status"] = "exists"
+        res.setdefault("rule_ids", []).append(r.id)
+    index = blocklist.current()
+    for target, res in pending.items():
+        if "status" not in res and "/" not in target:
+            covering = index.matching_rules(target)
+            if covering:
+                res.update(status="exists", rule_ids=covering)
+
+    new = [t for t, res in pending.items() if "status" not in res]
+    if not new:
+        return results
+    expires = now + timedelta(minutes=ttl_minutes) if ttl_minutes and ttl_minutes > 0 else None
+    rows = db.execute(
+        insert(BlockRule).returning(BlockRule.id, BlockRule.ip, BlockRule.expires_at, BlockRule.active),
+        [{"ip": t, "reason": reason, "created_by": created_by, "expires_at": expires, "active": True} for t in new],
+    ).all()
+    log_changes(db, [(r.id, r.ip, "add") for r in rows])
+    db.commit()
+    invalidate("blocks")
+    blocklist.rules_added(rows)
+    for r in rows:
+        pending[r.ip].update(status="blocked", rule_id=r.id)
+    return results
+
+def bulk_unblock(db: Session, targets: Iterable[str]) -> List[dict]:
+    """
+    Deactivate every active rule on each target with one UPDATE. A plain IP
+    that stays covered by a blocked CIDR lists those rules as still_blocked_by.
+    """
+    results, pending = _prepare(targets)
+    if not pending:
+        return results
+    rows = db.execute(
+        update(BlockRule)
+        .where(BlockRule.active.is_(True), BlockRule.ip.in_(list(pending)))
+        .values(active=False)
+        .returning(BlockRule.id, BlockRule.ip)
+    ).all()
+    if rows:
+        log_changes(db, [(r.id, r.ip, "remove") for r in rows])
+        db.commit()
+        invalidate("blocks")
+        blocklist.rules_removed([r.id for r in rows])
     for r in rows:
-        if r.expires_at is None or r.expires_at > now:
-            return True
-    return False
\ No newline at end of file
+        res = pending[r.ip]
+        res["status"] = "unblocked"
+        res.setdefault("rule_ids", []).append(r.id)
+    index = blocklist.current()
+    for target, res in pending.items():
+        res.setdefault("status", "not_blocked")
+        if "/" not in target:
+            still = index.matching_rules(target)
+            if still:
+                res["still_blocked_by"] = still
+    return results
+
+def is_blocked(db: Session, ip: str) -> bool:
+    # true if an active, non-expired rule covers ip (exact or CIDR); served
+    # from the in-memory blocklist index, db is kept for callers' signatures
+    return blocklist.is_blocked(ip)
\ No newline at end of file
@@ -0,0 +1,262 @@
+import hashlib
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, and_, or_, func, literal, text
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..models.event import EventNormalized
+from ..models.rollup import EventRollupMinute, EventRollupHour, EventRollupDay, SKETCH_BITS
+
+# Event rollups at minute/hour/day resolution, keyed by (bucket, module,
+# action, country) and carrying a count plus a distinct-src_ip bitmap. All
+# three are upserted in the ingest transaction, so they are always current.
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+# coarsest first: the histogram planner tries them in this order
+LEVELS: List[Tuple[int, Any]] = [(DAY, EventRollupDay), (HOUR, EventRollupHour), (MINUTE, EventRollupMinute)]
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MAX_BUCKETS = 5000
+GROUPABLE = ("event_module", "event_action", "country")
+
+# ---------------- sketches ----------------
+
+def sketch_position(ip: str) -> int:
+    # must match the SQL in _SKETCH_SQL (migrations and rebuild_rollups)
+    return int(hashlib.md5(ip.encode()).hexdigest()[:8], 16) % SKETCH_BITS
+
+def _sketch_str(mask: int) -> str:
+    return format(mask, f"0{SKETCH_BITS}b")
+
+def _sketch_bit(ip: str) -> int:
+    # string position p of a BIT(n) value is bit (n - 1 - p) of the integer
+    return 1 << (SKETCH_BITS - 1 - sketch_position(ip))
+
+def estimate_distinct(mask: int) -> int:
+    """Linear-counting estimate; saturates at a few thousand sources per bucket."""
+    zeros = SKETCH_BITS - mask.bit_count()
+    if zeros == 0:
+        return int(SKETCH_BITS * math.log(SKETCH_BITS))
+    return int(round(-SKETCH_BITS * math.log(zeros / SKETCH_BITS)))
+
+# ---------------- maintenance ----------------
+
+def _floor(ts: datetime, seconds: int) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    return EPOCH + timedelta(seconds=(int((ts - EPOCH).total_seconds()) // seconds) * seconds)
+
+def minute_bucket(ts: datetime) -> datetime:
+    return _floor(ts, MINUTE)
+
+def _apply(db: Session, deltas: Dict[Tuple[datetime, str, str, str], List[int]], level: int, model) -> int:
+    if not deltas:
+        return 0
+    merged: Dict[Tuple[datetime, str, str, str], List[int]] = {}
+    for (ts, m, a, c), (n, mask) in deltas.items():
+        acc = merged.setdefault((_floor(ts, level), m, a, c), [0, 0])
+        acc[0] += n
+        acc[1] |= mask
+    # sorted keys keep concurrent ingests locking rows in the same order
+    values = [
+        {"bucket": b, "event_module": m, "event_action": a, "country": c, "count": n, "src_sketch": _sketch_str(mask)}
+        for (b, m, a, c), (n, mask) in sorted(merged.items())
+    ]
+    stmt = pg_insert(model).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bucket", "event_module", "event_action", "country"],
+        set_={
+            "count": model.count + stmt.excluded["count"],
+            "src_sketch": model.src_sketch.op("|")(stmt.excluded["src_sketch"]),
+        },
+    )
+    db.execute(stmt)
+    return len(values)
+
+def _apply_all(db: Session, deltas) -> int:
+    return sum(_apply(db, deltas, level, model) for level, model in LEVELS)
+
+def record_events(db: Session, events: Iterable[EventNormalized]) -> int:
+    """
+    Add events to every rollup, one upsert per resolution, inside the
+    caller's transaction so counts commit (or roll back) with the events.
+    """
+    deltas: Dict[Tuple[datetime, str, str, str], List[int]] = {}
+    for e in events:
+        acc = deltas.setdefault((minute_bucket(e.timestamp), e.event_module, e.event_action, e.country or ""), [0, 0])
+        acc[0] += 1
+        if e.src_ip:
+            acc[1] |= _sketch_bit(e.src_ip)
+    return _apply_all(db, deltas)
+
+def record_pending_events(db: Session) -> int:
+    """Roll up events added to the session but not yet flushed."""
+    return record_events(db, [o for o in db.new if isinstance(o, EventNormalized)])
+
+def move_country(db: Session, moves: Iterable[Tuple[datetime, str, str, Optional[str], Optional[str], Optional[str]]]) -> int:
+    """
+    Re-key events whose country changed (e.g. GeoIP backfill). Each move is
+    (timestamp, module, action, src_ip, old_country, new_country). Counts
+    move exactly; the old key's sketch keeps its bits (it can only over-count).
+    """
+    deltas: Dict[Tuple[datetime, str, str, str], List[int]] = {}
+    for ts, m, a, ip, old, new in moves:
+        t = minute_bucket(ts)
+        deltas.setdefault((t, m, a, old or ""), [0, 0])[0] -= 1
+        acc = deltas.setdefault((t, m, a, new or ""), [0, 0])
+        acc[0] += 1
+        if ip:
+            acc[1] |= _sketch_bit(ip)
+    return _apply_all(db, deltas)
+
+_SKETCH_SQL = f"""
+    bit_or(CASE WHEN src_ip IS NULL THEN repeat('0', {SKETCH_BITS})::bit({SKETCH_BITS})
+           ELSE set_bit(repeat('0', {SKETCH_BITS})::bit({SKETCH_BITS}),
+                        (('x' || substr(md5(src_ip), 1, 8))::bit(32)::bigint % {SKETCH_BITS})::int, 1)
+           END)
+"""
+
+def rebuild_rollups(db: Session, start: datetime, end: datetime) -> None:
+    """
+    Recompute all rollups for whole days covering [start, end) from raw
+    events, e.g. after bulk-loading historical data. Caller commits.
+    """
+    start, end = _floor(start, DAY), _floor(end, DAY) + timedelta(days=1)
+    for level, model in LEVELS:
+        table = model.__tablename__
+        db.execute(text(f"DELETE FROM {table} WHERE bucket >= :start AND bucket < :end"), {"start": start, "end": end})
+        db.execute(text(f"""
+            INSERT INTO {table} (bucket, event_module, event_action, country, count, src_sketch)
+            SELECT date_bin(make_interval(secs => {level}), "timestamp", :origin),
+                   event_module, event_action, coalesce(country, ''), count(*), {_SKETCH_SQL}
+            FROM events_normalized
+            WHERE "timestamp" >= :start AND "timestamp" < :end
+            GROUP BY 1, 2, 3, 4
+        """), {"start": start, "end": end, "origin": EPOCH})
+
+# ---------------- histogram ----------------
+
+def parse_interval(s: str) -> int:
+    """Parse 'Xm', 'Xh' or 'Xd' into seconds; rollups are no finer than a minute."""
+    s = (s or "").strip().lower()
+    units = {"m": MINUTE, "h": HOUR, "d": DAY}
+    if len(s) < 2 or s[-1] not in units or not s[:-1].isdigit() or int(s[:-1]) <= 0:
+        raise ValueError(f"unsupported interval '{s}' (use 'Xm', 'Xh' or 'Xd')")
+    return int(s[:-1]) * units[s[-1]]
+
+def _plan(start: datetime, end: datetime, levels: List[Tuple[int, Any]]) -> List[Tuple[Any, datetime, datetime]]:
+    """
+    Split [start, end) into segments answered by the coarsest rollup whose
+    buckets fit entirely inside them; leftovers shorter than a minute at
+    either edge (typically the newest partial bucket) come from raw events.
+    """
+    if start >= end:
+        return []
+    if not levels:
+        return [(None, start, end)]
+    level, model = levels[0]
+    a = _floor(start, level)
+    if a < start:
+        a += timedelta(seconds=level)
+    b = _floor(end, level)
+    if a >= b:
+        return _plan(start, end, levels[1:])
+    return _plan(start, a, levels[1:]) + [(model, a, b)] + _plan(b, end, levels[1:])
+
+def histogram(
+    db: Session,
+    interval: str,
+    start: datetime,
+    end: datetime,
+    event_module: Optional[str] = None,
+    event_action: Optional[str] = None,
+    country: Optional[str] = None,
+    group_by: Optional[str] = None,
+) -> Dict[str, Any]:
+    step = parse_interval(interval)
+    if group_by and group_by not in GROUPABLE:
+        raise ValueError(f"group_by must be one of {', '.join(GROUPABLE)}")
+    if end <= start:
+        raise ValueError("end must be after start")
+    if (end - start).total_seconds() / step > MAX_BUCKETS:
+        raise ValueError(f"too many buckets (max {MAX_BUCKETS}); use a larger interval")
+
+    # rollup buckets nest inside output buckets only if their size divides the interval
+    levels = [(lv, m) for lv, m in LEVELS if step % lv == 0]
+    segments = _plan(start, end, levels)
+    step_iv = literal(timedelta(seconds=step))
+
+    # (bucket start, group value) -> [count, sketch]
+    acc: Dict[Tuple[datetime, Any], List[int]] = {}
+
+    def _add(ts: datetime, key: Any, n: int, mask: int):
+        a = acc.setdefault((ts.astimezone(timezone.utc), key), [0, 0])
+        a[0] += int(n or 0)
+        a[1] |= mask
+
+    for model, seg_start, seg_end in segments:
+        if model is not None:
+            conds = [model.bucket >= seg_start, model.bucket < seg_end]
+            if event_module:
+                conds.append(model.event_module == event_module)
+            if event_action:
+                conds.append(model.event_action == event_action)
+            if country is not None:
+                conds.append(model.country == country)
+            b = func.date_bin(step_iv, model.bucket, EPOCH).label("b")
+            keys = [b, getattr(model, group_by)] if group_by else [b]
+            stmt = (
+                select(*keys, func.sum(model.count), func.bit_or(model.src_sketch))
+                .where(and_(*conds))
+                .group_by(*keys)
+            )
+            for row in db.execute(stmt).all():
+                ts, key, n, sketch = row if group_by else (row[0], None, row[1], row[2])
+                _add(ts, key, n, int(sketch, 2) if sketch else 0)
+        else:
+            ev = EventNormalized
+            conds = [ev.timestamp >= seg_start, ev.timestamp < seg_end]
+            if event_module:
+                conds.append(ev.event_module == event_module)
+            if event_action:
+                conds.append(ev.event_action == event_action)
+            if country is not None:
+                conds.append(ev.country == country if country else or_(ev.country.is_(None), ev.country == ""))
+            b = func.date_bin(step_iv, ev.timestamp, EPOCH).label("b")
+            keys = [b]
+            if group_by == "country":
+                keys.append(func.coalesce(ev.country, ""))
+            elif group_by:
+                keys.append(getattr(ev, group_by))
+            stmt = select(*keys, ev.src_ip, func.count()).where(and_(*conds)).group_by(*keys, ev.src_ip)
+            for row in db.execute(stmt).all():
+                ts, key, ip, n = row if group_by else (row[0], None, row[1], row[2])
+                _add(ts, key, n, _sketch_bit(ip) if ip else 0)
+
+    if not group_by:
+        # emit every bucket in range, including empty ones (buckets are epoch-aligned like date_bin)
+        t = _floor(start, step)
+        while t < end:
+            acc.setdefault((t, None), [0, 0])
+            t += timedelta(seconds=step)
+
+    buckets = []
+    for (ts, key), (n, mask) in sorted(acc.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+        item = {"ts": ts.isoformat(), "count": n, "distinct_src": estimate_distinct(mask)}
+        if group_by:
+            item[group_by] = key
+        buckets.append(item)
+
+    return {
+        "interval": interval,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "group_by": group_by,
+        "segments": [
+            {"source": m.__tablename__ if m is not None else "events_normalized", "start": s.isoformat(), "end": e.isoformat()}
+            for m, s, e in segments
+        ],
+        "buckets": buckets,
+    }
@@ -0,0 +1,92 @@
+from typing import Any, List, Tuple
+import re
+
+from sqlalchemy import Float, Text, cast, func, literal_column, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from ..models.event import EventNormalized
+
+# Hunt search over events. http_path and user_agent are matched with
+# ILIKE / ~* so the pg_trgm GIN indexes serve every mode; fields_json goes
+# through a full-text GIN index on to_tsvector('simple', fields_json::text).
+# Results are ranked by trigram similarity or ts_rank.
+
+MODES = ("substring", "prefix", "regex")
+FIELDS = ("any", "http_path", "user_agent", "fields")
+MIN_QUERY_LEN = 3  # shorter strings have no trigrams, so the index can't help
+MAX_REGEX_LEN = 256
+_NAMED_GROUP = re.compile(r"\(\?(?:P|<(?![=!]))")  # (?P<x>...), (?<x>...) but not lookbehind
+
+# must match the expression of ix_events_normalized_fields_fts
+_SIMPLE = literal_column("'simple'::regconfig")
+FIELDS_TSV = func.to_tsvector(_SIMPLE, cast(EventNormalized.fields_json, Text))
+
+
+def _like_escape(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _tsquery(q: str, prefix: bool):
+    if not prefix:
+        return func.plainto_tsquery(_SIMPLE, q)
+    # every word must match; the last one as a prefix
+    words = [w for w in "".join(c if c.isalnum() else " " for c in q).split() if w]
+    if not words:
+        raise ValueError("prefix search needs at least one word")
+    return func.to_tsquery(_SIMPLE, " & ".join(words[:-1] + [words[-1] + ":*"]))
+
+
+def check_regex(q: str):
+    """
+    Reject patterns Postgres would fail on (a 2201B error mid-query) before
+    they reach it. Python's syntax is close to Postgres ARE; the named-group
+    forms it has and ARE lacks are refused explicitly.
+    """
+    if len(q) > MAX_REGEX_LEN:
+        raise ValueError(f"regex is limited to {MAX_REGEX_LEN} characters")
+    if _NAMED_GROUP.search(q):
+        raise ValueError("named groups are not supported in regex search")
+    try:
+        re.compile(q)
+    except re.error as e:
+        raise ValueError(f"invalid regex: {e}")
+
+
+def search_clause(q: str, mode: str = "substring", field: str = "any") -> Tuple[ColumnElement, ColumnElement]:
+    """Return (WHERE condition, relevance score) for a hunt query."""
+    q = (q or "").strip()
+    if mode not in MODES:
+        raise ValueError(f"q_mode must be one of {', '.join(MODES)}")
+    if field not in FIELDS:
+        raise ValueError(f"q_field must be one of {', '.join(FIELDS)}")
+    if len(q) < MIN_QUERY_LEN:
+        raise ValueError(f"q must be at least {MIN_QUERY_LEN} characters")
+    if mode == "regex" and field == "fields":
+        raise ValueError("regex search is not supported on fields")
+    if mode == "regex":
+        check_regex(q)
+
+    columns = []
+    if field in ("any", "http_path"):
+        columns.append(EventNormalized.http_path)
+    if field in ("any", "user_agent"):
+        columns.append(EventNormalized.user_agent)
+
+    conds: List[Any] = []
+    scores: List[Any] = []
+    for col in columns:
+        if mode == "regex":
+            conds.append(col.op("~*")(q))
+        elif mode == "prefix":
+            conds.append(col.ilike(_like_escape(q) + "%", escape="\\"))
+        else:
+            conds.append(col.ilike("%" + _like_escape(q) + "%", escape="\\"))
+        scores.append(func.similarity(col, q))
+
+    if field in ("any", "fields") and mode != "regex":
+        tsq = _tsquery(q, prefix=(mode == "prefix"))
+        conds.append(FIELDS_TSV.op("@@")(tsq))
+        scores.append(func.ts_rank(FIELDS_TSV, tsq))
+
+    score = scores[0] if len(scores) == 1 else func.greatest(*scores)
+    return or_(*conds), cast(func.coalesce(score, 0.0), Float)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from heapq import merge
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, and_, tuple_
+from sqlalchemy.orm import Session
+
+from ..models.event import EventNormalized
+from ..models.detection import Detection, DetectionEvent
+from ..models.block import BlockRule
+from .pagination import decode_cursor, decode_datetime, decode_int, encode_cursor
+
+# One newest-first stream of everything about an entity (src_ip or user):
+# its events, the detections whose evidence includes them, and blocks on
+# the IP. Each source is a LIMIT n keyset scan on its own index, so a page
+# costs three short index range reads whatever the entity's history; the
+# merge happens here. Items are ordered by (ts, kind rank, id), which is
+# also the cursor.
+
+ENTITY_KINDS = ("src_ip", "user")
+KIND_RANK = {"event": 0, "detection": 1, "block": 2}  # tie-break at equal ts
+DEFAULT_WINDOW = timedelta(days=7)
+MAX_WINDOW = timedelta(days=90)
+MAX_LIMIT = 500
+
+
+def parse_entity(entity: str) -> Tuple[str, str]:
+    kind, sep, value = (entity or "").partition(":")
+    if not sep or kind not in ENTITY_KINDS or not value:
+        raise ValueError("entity must look like src_ip:<ip> or user:<name>")
+    return kind, value
+
+
+def _utc(value: Optional[str], default: datetime) -> datetime:
+    if not value:
+        return default
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError as e:
+        raise ValueError(f"invalid timestamp '{value}'") from e
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _after(ts_col, id_col, rank: int, cursor: Optional[Tuple[datetime, int, int]]):
+    """Rows of one source that sort after the cursor in (ts, rank, id) DESC order."""
+    if cursor is None:
+        return None
+    c_ts, c_rank, c_id = cursor
+    if rank < c_rank:
+        return ts_col <= c_ts
+    if rank > c_rank:
+        return ts_col < c_ts
+    return tuple_(ts_col, id_col) < tuple_(c_ts, c_id)
+
+
+def _page(db: Session, stmt, ts_col, id_col, rank: int, conds: list, cursor, limit: int):
+    after = _after(ts_col, id_col, rank, cursor)
+    if after is not None:
+        conds = conds + [after]
+    return db.execute(stmt.where(and_(*conds)).order_by(ts_col.desc(), id_col.desc()).limit(limit)).all()
+
+
+def _event_item(r) -> Dict[str, Any]:
+    return {
+        "kind": "event",
+        "ts": r.timestamp,
+        "id": r.id,
+        "event_module": r.event_module,
+        "event_action": r.event_action,
+        "src_ip": r.src_ip,
+        "user": r.user,
+        "http_path": r.http_path,
+        "country": r.country,
+    }
+
+
+def _detection_item(r) -> Dict[str, Any]:
+    return {
+        "kind": "detection",
+        "ts": r.created_at,
+        "id": r.id,
+        "rule_id": r.rule_id,
+        "severity": r.severity,
+        "title": r.title,
+        "status": r.status,
+    }
+
+
+def _block_item(r) -> Dict[str, Any]:
+    return {
+        "kind": "block",
+        "ts": r.created_at,
+        "id": r.id,
+        "ip": r.ip,
+        "reason": r.reason,
+        "active": r.active,
+        "expires_at": r.expires_at,
+        "created_by": r.created_by,
+    }
+
+
+def _sort_key(item: Dict[str, Any]):
+    return (item["ts"], KIND_RANK[item["kind"]], item["id"])
+
+
+def timeline(
+    db: Session,
+    entity: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Returns (items newest first, cursor for the next page or None)."""
+    kind, value = parse_entity(entity)
+    limit = max(1, min(limit, MAX_LIMIT))
+    end_dt = _utc(end, datetime.now(timezone.utc))
+    start_dt = _utc(start, end_dt - DEFAULT_WINDOW)
+    if start_dt >= end_dt:
+        raise ValueError("start must be before end")
+    if end_dt - start_dt > MAX_WINDOW:
+        raise ValueError(f"window is limited to {MAX_WINDOW.days} days")
+
+    after = None
+    if cursor:
+        ts, rank, last_id = decode_cursor(cursor, 3)
+        after = (decode_datetime(ts), decode_int(rank), decode_int(last_id))
+
+    E = EventNormalized
+    entity_col = E.src_ip if kind == "src_ip" else E.user
+    in_window = [entity_col == value, E.timestamp >= start_dt, E.timestamp < end_dt]
+
+    events = _page(
+        db,
+        select(E.id, E.timestamp, E.event_module, E.event_action, E.src_ip, E.user, E.http_path, E.country),
+        E.timestamp, E.id, KIND_RANK["event"], in_window, after, limit,
+    )
+
+    # detections citing any of the entity's events in the window; the
+    # semi-join reads the (entity, timestamp) index range, not all history
+    cited = (
+        select(DetectionEvent.detection_id)
+        .join(E, E.id == DetectionEvent.event_id)
+        .where(and_(*in_window))
+    )
+    detections = _page(
+        db,
+        select(Detection.id, Detection.created_at, Detection.rule_id, Detection.severity, Detection.title, Detection.status),
+        Detection.created_at, Detection.id, KIND_RANK["detection"],
+        [Detection.id.in_(cited)], after, limit,
+    )
+
+    blocks = []
+    if kind == "src_ip":
+        blocks = _page(
+            db,
+            select(BlockRule.id, BlockRule.created_at, BlockRule.ip, BlockRule.reason,
+                   BlockRule.active, BlockRule.expires_at, BlockRule.created_by),
+            BlockRule.created_at, BlockRule.id, KIND_RANK["block"],
+            [BlockRule.ip == value, BlockRule.created_at >= start_dt, BlockRule.created_at < end_dt], after, limit,
+        )
+
+    streams = [
+        [_event_item(r) for r in events],
+        [_detection_item(r) for r in detections],
+        [_block_item(r) for r in blocks],
+    ]
+    items = list(merge(*streams, key=_sort_key, reverse=True))[:limit]
+
+    nxt = None
+    if len(items) == limit:
+        last = items[-1]
+        nxt = encode_cursor(last["ts"], KIND_RANK[last["kind"]], last["id"])
+    return items, nxt
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from ..models.user import User
 from ..core.security import hash_password, verify_password
+from ..core.user_cache import invalidate_user
 
 def get_user_by_email(db: Session, email: str) -> User | None:
     return db.query(User).filter(User.email == email).first()
@@ -18,4 +19,22 @@ def check_user_credentials(db: Session, email: str, password: str) -> User | Non
         return None
     if not verify_password(password, user.password_hash):
         return None
-    return user
\ No newline at end of file
+    return user
+
+def set_user_role(db: Session, email: str, role: str) -> User | None:
+    user = get_user_by_email(db, email)
+    if not user:
+        return None
+    user.role = role
+    db.commit()
+    invalidate_user(email)
+    return user
+
+def delete_user(db: Session, email: str) -> bool:
+    user = get_user_by_email(db, email)
+    if not user:
+        return False
+    db.delete(user)
+    db.commit()
+    invalidate_user(email)
+    return True
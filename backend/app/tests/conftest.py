@@ -0,0 +1,134 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# settings are read at import time; point them somewhere harmless
+_db = os.path.join(tempfile.gettempdir(), "threathunt-tests.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db}")
+os.environ.setdefault("DATABASE_ASYNC_URL", f"sqlite+aiosqlite:///{_db}")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6399/0")
+
+# the ML detectors import the app as backend.app, i.e. from the repo root
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)
+
+
+class FakeRedis:
+    """The slice of redis-py the app uses, in memory (no expiry)."""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def setex(self, key, ttl, value):
+        self.data[key] = str(value)
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, *keys):
+        return sum(self.data.pop(k, None) is not None for k in keys)
+
+    def expire(self, key, ttl):
+        return key in self.data
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def lpush(self, key, *values):
+        lst = self.data.setdefault(key, [])
+        for v in values:
+            lst.insert(0, v)
+        return len(lst)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:end + 1]
+        return True
+
+    def lrange(self, key, start, end):
+        return self.data.get(key, [])[start:end + 1]
+
+    def eval(self, script, numkeys, key, token, *args):
+        from app.core import redis_client as rc
+
+        if self.data.get(key) != str(token):
+            return 0
+        if script == rc._CAS_DELETE:
+            return self.delete(key)
+        if script == rc._CAS_EXPIRE:
+            return 1
+        if script == rc._CAS_SET:
+            self.data[key] = str(args[0])
+            return 1
+        raise NotImplementedError(script)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, r):
+        self._r = r
+        self._ops = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kw):
+            self._ops.append((name, args, kw))
+            return self
+        return queue
+
+    def execute(self):
+        ops, self._ops = self._ops, []
+        return [getattr(self._r, name)(*args, **kw) for name, args, kw in ops]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Swap the sync Redis client for a FakeRedis in every loaded app module."""
+    from app.core import redis_client as rc
+
+    fake = FakeRedis()
+    real = rc.redis_client
+    for name, mod in list(sys.modules.items()):
+        if name.startswith("app.") and getattr(mod, "redis_client", None) is real:
+            monkeypatch.setattr(mod, "redis_client", fake)
+    return fake
+
+
+class FakeSession:
+    """Stands in for a Session whose only query returns canned rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(stmt)
+        return self
+
+    def all(self):
+        return list(self.rows)
+
+
+@pytest.fixture
+def ml_state_dir(tmp_path, monkeypatch):
+    """Checkpoint the ML detectors into tmp_path instead of Redis."""
+    from backend.app.core.config import settings
+
+    monkeypatch.setattr(settings, "ml_state_dir", str(tmp_path))
+    return tmp_path
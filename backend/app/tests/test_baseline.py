@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from backend.app.detectors.ml import baseline as bl
+from backend.app.detectors.ml._state import load_state, save_state
+
+from .conftest import FakeSession
+
+MONDAY = datetime(2024, 1, 1, tzinfo=timezone.utc)  # hour-of-week 0
+
+
+@pytest.fixture(autouse=True)
+def _no_pending(monkeypatch):
+    monkeypatch.setattr(bl, "_pending", None)
+
+
+def _rows(events):
+    """(ts, action, src_ip, user) -> the (id, ts, action, src_ip, user) rows run() selects."""
+    return [(i + 1, ts, action, ip, user) for i, (ts, action, ip, user) in enumerate(sorted(events, key=lambda e: e[0]))]
+
+
+def _run(events):
+    return bl.run(FakeSession(_rows(events)), until=MONDAY + timedelta(days=60))
+
+
+def test_steady_failures_are_quiet_and_a_spike_fires(ml_state_dir):
+    steady = [(MONDAY + timedelta(minutes=10 * k), "login_failed", "10.0.0.1", None) for k in range(288)]
+    spike = [(MONDAY + timedelta(days=1, seconds=3 * k), "login_failed", "10.0.0.2", None) for k in range(20)]
+    findings = _run(steady + spike)
+    assert [f["features"]["entity"] for f in findings] == ["ip:10.0.0.2"]
+    f = findings[0]
+    assert f["features"]["kind"] == "surge" and f["severity"] == "high"
+    assert f["features"]["fast_count"] >= bl.SURGE_MIN
+    assert f["features"]["fast_count"] >= bl.SURGE_RATIO * f["features"]["expected"]
+
+
+def test_activity_outside_the_usual_hours_fires(ml_state_dir):
+    # four weeks of weekday office hours, then a Sunday 03:00 login
+    usual = [
+        (MONDAY + timedelta(weeks=w, days=d, hours=h), "login_success", None, "alice")
+        for w in range(4) for d in range(5) for h in range(9, 17)
+    ]
+    odd = (MONDAY + timedelta(weeks=4, days=6, hours=3), "login_success", None, "alice")
+    assert _run(usual) == []
+
+    bl.checkpoint()
+    findings = bl.run(FakeSession([(len(usual) + 1, *odd)]), until=MONDAY + timedelta(days=60))
+    assert len(findings) == 1
+    f = findings[0]["features"]
+    assert (f["entity"], f["kind"], f["hour_of_week"]) == ("user:alice", "hours", 6 * 24 + 3)
+    assert f["share"] < bl.OFF_HOURS_PROB and f["profile_events"] >= bl.PROFILE_MIN_EVENTS
+
+
+def test_hour_of_week_score():
+    b = bl._Baselines()
+    i = b.users.row("bob")
+    t0 = MONDAY.timestamp()
+    for k in range(100):
+        b.observe_activity(i, t0 + k, 10)  # always Monday 10:00
+    share, total = b.observe_activity(i, t0 + 100, 11)  # the neighbouring hour counts
+    assert share == pytest.approx(1.0) and total == pytest.approx(100, rel=1e-3)
+    share, _ = b.observe_activity(i, t0 + 101, 100)
+    assert share == 0.0
+
+
+def _table(cap_rows, now, **slow):
+    tab = bl._Table(bl._FAILURE_COLUMNS, cap_rows=cap_rows)
+    for key, value in slow.items():
+        i = tab.row(key)
+        tab.slow[i], tab.last_ts[i] = value, now
+    return tab
+
+
+def test_prune_forgets_idle_entities_unless_cooling_down():
+    now = 1_000_000.0
+    tab = _table(10, now, busy=5.0, idle=0.001, cooling=0.0)
+    tab.surge_alert_ts[tab.index["cooling"]] = now - 60  # alerted a minute ago
+    tab.prune(now)
+    assert tab.keys == ["busy", "cooling"]
+
+    tab = _table(10, now - 10 * bl.SLOW_TAU_S, faded=20.0)  # decays to ~0.001
+    tab.prune(now)
+    assert tab.keys == []
+
+
+def test_prune_caps_the_table_keeping_the_busiest():
+    now = 1_000_000.0
+    tab = _table(3, now, a=5.0, b=1.0, c=9.0, d=3.0)
+    tab.prune(now)
+    assert tab.keys == ["a", "c", "d"]
+    assert {k: float(tab.slow[tab.index[k]]) for k in tab.keys} == {"a": 5.0, "c": 9.0, "d": 3.0}
+    i = tab.row("e")  # still usable after the arrays were compacted
+    assert i == 3 and tab.keys[i] == "e"
+
+
+def test_baselines_prune_each_table_to_its_cap(monkeypatch):
+    monkeypatch.setattr(bl, "MAX_IPS", 2)
+    monkeypatch.setattr(bl, "MAX_USERS", 1)
+    b = bl._Baselines()
+    now = 1_000_000.0
+    for n, ip in enumerate(("10.0.0.1", "10.0.0.2", "10.0.0.3")):
+        for _ in range(n + 1):
+            b.observe_failure(b.ips, b.ips.row(ip), now)
+    for n, user in enumerate(("u1", "u2")):
+        for _ in range(n + 1):
+            b.observe_activity(b.users.row(user), now, 0)
+    b.prune(now)
+    assert b.ips.keys == ["10.0.0.2", "10.0.0.3"] and b.users.keys == ["u2"]
+    # the user table keeps profiles alive on their own; IPs have no profile columns
+    assert "profile" not in b.ips.columns and b.users.profile_total[0] == 2.0
+
+
+def test_legacy_state_is_split_into_ip_and_user_tables():
+    keys = ["ip:10.0.0.1", "user:bob", "ip:10.0.0.2"]
+    legacy = {"keys": np.array(keys), "last_id": np.array([42], dtype=np.int64)}
+    for name, (dtype, shape) in {**bl._FAILURE_COLUMNS, **bl._PROFILE_COLUMNS}.items():
+        legacy[name] = np.zeros((3,) + shape, dtype=dtype)
+    legacy["fast"][:] = [1.0, 2.0, 3.0]
+    legacy["profile"][1, 5] = 7.0
+    b = bl._Baselines(legacy)
+    assert b.last_id == 42
+    assert b.ips.keys == ["10.0.0.1", "10.0.0.2"] and list(b.ips.fast[:2]) == [1.0, 3.0]
+    assert b.users.keys == ["bob"] and b.users.fast[0] == 2.0 and b.users.profile[0, 5] == 7.0
+    # and it saves in the split layout
+    state = b.to_state()
+    assert "keys" not in state and list(state["user_keys"]) == ["bob"]
+    assert bl._Baselines(state).ips.keys == b.ips.keys
+
+
+def test_state_is_saved_only_on_checkpoint(ml_state_dir):
+    _run([(MONDAY, "login_failed", "10.0.0.1", "bob")])
+    assert load_state(bl.STATE_KEY) is None  # findings not committed yet
+    bl.checkpoint()
+    state = load_state(bl.STATE_KEY)
+    assert int(state["last_id"][0]) == 1 and list(state["ip_keys"]) == ["10.0.0.1"]
+    bl.checkpoint()  # nothing pending: no-op
+    assert (ml_state_dir / f"{bl.STATE_KEY}.npz").exists()
+
+    # a run that finds nothing new leaves the checkpoint alone
+    assert bl.run(FakeSession([])) == [] and bl._pending is None
+
+
+def test_state_round_trip_on_disk(ml_state_dir):
+    arrays = {"a": np.arange(3, dtype=np.float32), "keys": np.array(["x", "y"])}
+    assert save_state("t", arrays)
+    got = load_state("t")
+    assert list(got["a"]) == [0.0, 1.0, 2.0] and list(got["keys"]) == ["x", "y"]
+    assert load_state("missing") is None
+    (ml_state_dir / "t.npz").write_bytes(b"garbage")
+    assert load_state("t") is None
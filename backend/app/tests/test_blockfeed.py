@@ -0,0 +1,84 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import blockfeed as bf
+
+
+def _row(id, target, op="add"):
+    return SimpleNamespace(id=id, target=target, op=op)
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """A loaded in-memory feed at version 0 that never polls the database."""
+    f = bf._Feed(0, {})
+    monkeypatch.setattr(bf, "_feed", f)
+    monkeypatch.setattr(bf, "_checked_at", float("inf"))
+    monkeypatch.setattr(bf, "_forced_at", time.monotonic())
+    return f
+
+
+def test_add_remove_readd(feed):
+    feed.apply([_row(1, "1.1.1.1"), _row(2, "10.0.0.0/8"), _row(3, "1.1.1.1", "remove")], 0.0)
+    d = bf.changes(0)
+    assert d["version"] == 3 and not d["reset"]
+    assert d["added"] == ["10.0.0.0/8"] and d["removed"] == ["1.1.1.1"]
+
+    feed.apply([_row(4, "1.1.1.1")], 0.0)
+    assert bf.changes(3)["added"] == ["1.1.1.1"]
+    assert bf.changes(2) == {"version": 4, "since": 2, "reset": False, "added": ["1.1.1.1"], "removed": []}
+    assert bf.changes(4)["added"] == [] and bf.changes(4)["removed"] == []
+
+
+def test_target_stays_until_its_last_rule_is_removed(feed):
+    feed.apply([_row(1, "2.2.2.2"), _row(2, "2.2.2.2"), _row(3, "2.2.2.2", "remove")], 0.0)
+    assert bf.changes(0)["added"] == ["2.2.2.2"]
+    feed.apply([_row(4, "2.2.2.2", "remove")], 0.0)
+    assert bf.changes(2)["removed"] == ["2.2.2.2"]
+
+
+def test_gap_holds_the_version_then_skips(feed):
+    feed.apply([_row(1, "1.1.1.1"), _row(3, "3.3.3.3")], 100.0)
+    assert feed.version == 1  # 2 may still commit
+
+    feed.apply([_row(2, "2.2.2.2"), _row(3, "3.3.3.3")], 105.0)
+    assert feed.version == 3 and feed.skipped == {} and feed.gap_since is None
+
+    feed.apply([_row(5, "5.5.5.5")], 200.0)
+    assert feed.version == 3
+    feed.apply([_row(5, "5.5.5.5")], 200.0 + bf.GAP_GRACE_SECONDS)
+    assert feed.version == 5 and set(feed.skipped) == {4}
+
+
+def test_late_row_after_skip_reaches_every_client(feed):
+    feed.apply([_row(1, "1.1.1.1"), _row(3, "3.3.3.3")], 0.0)
+    feed.apply([_row(3, "3.3.3.3")], bf.GAP_GRACE_SECONDS)
+    assert bf.changes(0)["added"] == ["1.1.1.1", "3.3.3.3"]
+
+    feed.apply_late([_row(2, "2.2.2.2")])
+    assert feed.skipped == {}
+    assert "2.2.2.2" in bf.changes(1)["added"]  # behind: in this delta
+    assert bf.changes(3)["added"] == []  # current: with the next change
+    feed.apply([_row(4, "4.4.4.4")], 0.0)
+    assert bf.changes(3)["added"] == ["2.2.2.2", "4.4.4.4"]
+    assert "2.2.2.2" in bf.snapshot("plain")[1]
+
+    feed.apply_late([_row(2, "2.2.2.2")])  # no longer tracked: not applied twice
+    assert feed.counts["2.2.2.2"] == 1
+
+
+def test_since_before_history_is_a_reset(feed):
+    feed.floor = feed.version = 10
+    feed.counts = {"1.1.1.1": 1}
+    d = bf.changes(4)
+    assert d["reset"] and d["added"] == ["1.1.1.1"] and d["version"] == 10
+
+
+def test_since_ahead_waits_instead_of_resetting(feed):
+    feed.apply([_row(1, "1.1.1.1")], 0.0)
+    # a forced refresh just ran, so this one must not reach the database
+    d = bf.changes(7)
+    assert d["version"] == 7 and not d["reset"] and d["added"] == [] and d["removed"] == []
+    assert d["retry_after"] > 0
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, select
+
+from app.core.db import SessionLocal, engine
+from app.models import Base
+from app.models.block import BlockFeedChange, BlockRule
+from app.services import blocklist
+from app.services.respond import BULK_MAX, bulk_block, bulk_unblock
+
+TABLES = [BlockRule.__table__, BlockFeedChange.__table__]
+
+
+@pytest.fixture
+def db(fake_redis, monkeypatch):
+    Base.metadata.drop_all(engine, tables=TABLES)
+    Base.metadata.create_all(engine, tables=TABLES)
+    monkeypatch.setattr(blocklist, "_index", blocklist.BlocklistIndex({}))
+    monkeypatch.setattr(blocklist, "_checked_at", float("inf"))
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def inserts():
+    seen = []
+
+    def count(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO BLOCK_RULES"):
+            seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield seen
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def _status(results):
+    return [(r["input"], r["status"]) for r in results]
+
+
+def test_bulk_block_outcomes(db, inserts):
+    first = bulk_block(db, ["10.0.0.0/8", "192.0.2.1"], "seed", "a@b")
+    assert _status(first) == [("10.0.0.0/8", "blocked"), ("192.0.2.1", "blocked")]
+    cidr_id, ip_id = first[0]["rule_id"], first[1]["rule_id"]
+    inserts.clear()
+
+    results = bulk_block(db, [
+        "198.51.100.7",
+        " 198.51.100.7/32",  # the same address once normalised
+        "not-an-ip",
+        "192.0.2.1",         # exact live rule
+        "10.20.30.40",       # inside the blocked /8
+        "10.1.2.3/8",        # host bits: the same network as the live /8
+        "203.0.113.0/24",
+        "2001:DB8::1",
+    ], "bulk", "a@b", ttl_minutes=30)
+
+    assert _status(results) == [
+        ("198.51.100.7", "blocked"),
+        (" 198.51.100.7/32", "duplicate"),
+        ("not-an-ip", "invalid"),
+        ("192.0.2.1", "exists"),
+        ("10.20.30.40", "exists"),
+        ("10.1.2.3/8", "exists"),
+        ("203.0.113.0/24", "blocked"),
+        ("2001:DB8::1", "blocked"),
+    ]
+    assert results[1]["target"] == "198.51.100.7" and "error" in results[2]
+    assert results[3]["rule_ids"] == [ip_id]
+    assert results[4]["rule_ids"] == [cidr_id] and results[5]["rule_ids"] == [cidr_id]
+    assert results[7]["target"] == "2001:db8::1"
+    assert len(inserts) == 1  # every new target in one INSERT
+
+    rows = {r.ip: r for r in db.execute(select(BlockRule)).scalars()}
+    assert set(rows) == {"10.0.0.0/8", "192.0.2.1", "198.51.100.7", "203.0.113.0/24", "2001:db8::1"}
+    assert rows["198.51.100.7"].expires_at is not None and rows["192.0.2.1"].expires_at is None
+    assert blocklist.is_blocked("203.0.113.9")
+    changes = db.execute(select(BlockFeedChange.target, BlockFeedChange.op).order_by(BlockFeedChange.id)).all()
+    assert [c.target for c in changes][-3:] == ["198.51.100.7", "203.0.113.0/24", "2001:db8::1"]
+
+
+def test_expired_rule_does_not_count_as_existing(db, inserts):
+    past = datetime.now(timezone.utc) - timedelta(minutes=1)
+    db.add(BlockRule(ip="192.0.2.1", reason="old", active=True, expires_at=past))
+    db.commit()
+    assert _status(bulk_block(db, ["192.0.2.1"], "again", None)) == [("192.0.2.1", "blocked")]
+
+
+def test_nothing_new_means_no_insert(db, inserts):
+    bulk_block(db, ["192.0.2.1"], "seed", None)
+    inserts.clear()
+    assert _status(bulk_block(db, ["192.0.2.1", "bad"], "again", None)) == [("192.0.2.1", "exists"), ("bad", "invalid")]
+    assert inserts == []
+
+
+def test_bulk_unblock_reports_covering_cidrs(db):
+    seeded = bulk_block(db, ["10.0.0.0/8", "10.1.1.1", "192.0.2.1"], "seed", None)
+    cidr_id = seeded[0]["rule_id"]
+
+    results = bulk_unblock(db, ["10.1.1.1", "10.1.1.1/32", "192.0.2.1", "198.51.100.1", "10.2.2.2", "nope"])
+    assert _status(results) == [
+        ("10.1.1.1", "unblocked"),
+        ("10.1.1.1/32", "duplicate"),
+        ("192.0.2.1", "unblocked"),
+        ("198.51.100.1", "not_blocked"),
+        ("10.2.2.2", "not_blocked"),
+        ("nope", "invalid"),
+    ]
+    assert results[0]["rule_ids"] == [seeded[1]["rule_id"]]
+    assert results[0]["still_blocked_by"] == [cidr_id]  # the /8 still covers it
+    assert results[4]["still_blocked_by"] == [cidr_id]
+    assert "still_blocked_by" not in results[2]
+    active = db.execute(select(BlockRule.ip).where(BlockRule.active.is_(True))).scalars().all()
+    assert active == ["10.0.0.0/8"]
+
+
+def test_too_many_targets_are_refused(db):
+    with pytest.raises(ValueError):
+        bulk_block(db, ["192.0.2.1"] * (BULK_MAX + 1), "x", None)
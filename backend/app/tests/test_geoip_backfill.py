@@ -0,0 +1,57 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+from app.workers import geoip_backfill as gb
+
+INFLIGHT = "jobs:geoip_backfill:inflight"
+
+
+def _job(job_id, beat_age):
+    beat = (datetime.now(timezone.utc) - beat_age).isoformat()
+    return json.dumps({"id": job_id, "kind": "geoip_backfill", "status": "running",
+                       "created_at": beat, "heartbeat_at": beat})
+
+
+def _checkpoint():
+    end = datetime.now(timezone.utc)
+    return {"start": (end - timedelta(hours=24)).isoformat(), "end": end.isoformat(),
+            "first_id": 1, "max_id": 100, "last_id": 40, "scanned": 40, "updated": 3}
+
+
+def test_resumes_checkpoint_after_crashed_job(fake_redis, monkeypatch):
+    # a previous process died mid-run: its inflight claim and 'running' record survive
+    fake_redis.set(INFLIGHT, "dead")
+    fake_redis.set("jobs:geoip_backfill:dead", _job("dead", timedelta(minutes=5)))
+    fake_redis.set(gb.CHECKPOINT_KEY, json.dumps(_checkpoint()))
+
+    ran = threading.Event()
+    seen = {}
+
+    def fake_run(report, cp):
+        seen.update(cp)
+        ran.set()
+        return {}
+
+    monkeypatch.setattr(gb, "_run", fake_run)
+    job, coalesced = gb.submit_geoip_backfill(hours=24, resume=True)
+
+    assert not coalesced
+    assert job["id"] != "dead"
+    assert job["params"]["resumed_from"] == 40
+    assert fake_redis.get(INFLIGHT) != "dead"
+    assert ran.wait(5)
+    assert seen["last_id"] == 40 and seen["max_id"] == 100
+    assert gb.get_geoip_backfill("dead")["status"] == "lost"
+
+
+def test_live_job_in_another_process_coalesces(fake_redis, monkeypatch):
+    fake_redis.set(INFLIGHT, "alive")
+    fake_redis.set("jobs:geoip_backfill:alive", _job("alive", timedelta(seconds=2)))
+    monkeypatch.setattr(gb, "_run", lambda report, cp: {})
+
+    job, coalesced = gb.submit_geoip_backfill()
+
+    assert coalesced
+    assert job["id"] == "alive"
+    assert fake_redis.get(INFLIGHT) == "alive"
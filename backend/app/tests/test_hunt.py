@@ -0,0 +1,99 @@
+import json
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.schemas.hunt import HuntQuery
+from app.services.hunt import HuntRejected, rows_scanned, run_hunt
+
+TABLE = 50_000_000.0
+
+
+def _seq_scan(plan_rows, **extra):
+    return {"Node Type": "Seq Scan", "Relation Name": "events_normalized", "Plan Rows": plan_rows,
+            "Filter": "((src_ip)::text = '203.0.113.7'::text)", **extra}
+
+
+def _aggregate(*children):
+    return {"Node Type": "Aggregate", "Plan Rows": 1, "Plans": list(children)}
+
+
+def test_filtered_seq_scan_counts_the_whole_table():
+    assert rows_scanned(_aggregate(_seq_scan(12)), {"events_normalized": TABLE}) == TABLE
+
+
+def test_parallel_and_bitmap_scans():
+    parallel = {"Node Type": "Gather", "Workers Planned": 2, "Plan Rows": 30, "Plans": [
+        {"Node Type": "Bitmap Heap Scan", "Relation Name": "events_normalized", "Plan Rows": 10,
+         "Parallel Aware": True, "Filter": "(user = 'x')", "Plans": [
+             {"Node Type": "Bitmap Index Scan", "Index Name": "ix_events_normalized_timestamp", "Plan Rows": 90_000},
+         ]},
+    ]}
+    # the bitmap index scan feeds all three processes once; only Parallel Aware nodes are per worker
+    assert rows_scanned(parallel, {"events_normalized": TABLE}) == 90_000
+
+
+def test_index_scan_with_filter_uses_its_index_condition():
+    node = {"Node Type": "Index Scan", "Relation Name": "events_normalized", "Plan Rows": 5,
+            "Index Cond": "(\"timestamp\" >= '2024-01-01')", "Filter": "(user = 'x')"}
+    seen = []
+
+    def cond_rows(rel, cond):
+        seen.append((rel, cond))
+        return 2_000_000.0
+
+    assert rows_scanned(node, {"events_normalized": TABLE}, cond_rows) == 2_000_000
+    assert seen == [("events_normalized", node["Index Cond"])]
+    assert rows_scanned(node, {"events_normalized": TABLE}) == TABLE  # condition unknown: assume all
+    node.pop("Filter")
+    assert rows_scanned(node, {"events_normalized": TABLE}) == 5
+
+
+class _Result:
+    def __init__(self, value=None, rows=()):
+        self.value, self.rows = value, rows
+
+    def scalar(self):
+        return self.value
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakePgConnection:
+    """Answers EXPLAIN with a canned plan and pg_class with fixed reltuples."""
+
+    dialect = postgresql.psycopg.dialect()
+
+    def __init__(self, plan, reltuples):
+        self.plan, self.reltuples, self.sql = plan, reltuples, []
+
+    def exec_driver_sql(self, sql, params=None):
+        self.sql.append(sql)
+        if sql.startswith("EXPLAIN"):
+            return _Result(json.dumps([{"Plan": self.plan}]))
+        return _Result()
+
+    def execute(self, stmt, params=None):
+        if "pg_class" in str(stmt):
+            return _Result(rows=[(n, self.reltuples[n]) for n in params["names"]])
+        raise AssertionError("the hunt must not run once rejected")
+
+    def begin_nested(self):
+        return nullcontext()
+
+
+def _spec():
+    end = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    return HuntQuery(start=end - timedelta(days=1), end=end, filters=[{"field": "src_ip", "value": "203.0.113.7"}])
+
+
+def test_selective_full_scan_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "hunt_max_rows", 20_000_000)
+    conn = FakePgConnection(_aggregate(_seq_scan(12)), {"events_normalized": TABLE})
+    with pytest.raises(HuntRejected, match="50,000,000 rows"):
+        run_hunt(conn, _spec())
+    assert conn.sql[0].startswith("SET LOCAL statement_timeout")
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services import intel
+
+
+@pytest.fixture
+def feed_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "intel_feed_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "intel_reload_seconds", 0.0)
+    monkeypatch.setattr(intel, "_index", intel._EMPTY)
+    monkeypatch.setattr(intel, "_signature", ())
+    monkeypatch.setattr(intel, "_checked_at", 0.0)
+    return tmp_path
+
+
+def _write(path, text, mtime=None):
+    path.write_text(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("203.0.113.7", ("ip", "203.0.113.7")),
+        ("198.51.100.0/24", ("ip", "198.51.100.0/24")),
+        ("2001:db8::/32", ("ip", "2001:db8::/32")),
+        ("evil.example", ("domain", "evil.example")),
+        ("/wp-login.php", ("path", "/wp-login.php")),
+        ("path: /x", ("path", "/x")),
+        ("domain:10.0.0.1", ("domain", "10.0.0.1")),
+        ("ip:not-an-ip", ("ip", "not-an-ip")),
+    ],
+)
+def test_classify(line, expected):
+    assert intel._classify(line) == expected
+
+
+def test_load_feed_comments_csv_and_invalid_lines(tmp_path):
+    p = tmp_path / "mixed.csv"
+    _write(p, "\n".join([
+        "# header comment",
+        "203.0.113.7, scanner, 2024-01-01",
+        "198.51.100.0/24  # trailing comment",
+        "Evil.Example.",
+        "/cgi-bin/*.sh",
+        "/wp-login.php",
+        "ip:999.1.1.1",
+        "not a domain!",
+        "",
+    ]))
+    feed = intel._load_feed(p)
+    info = feed.info
+    assert info.name == "mixed"
+    assert (info.ips, info.cidrs, info.domains, info.paths, info.patterns, info.invalid) == (1, 1, 1, 1, 1, 2)
+    assert feed.networks == ["203.0.113.7/32", "198.51.100.0/24"]
+    assert feed.domains == {"evil.example"}
+
+
+def _index(tmp_path, **feeds):
+    for name, text in feeds.items():
+        _write(tmp_path / f"{name}.txt", text)
+    return intel.IntelIndex([intel._load_feed(tmp_path / f"{name}.txt") for name in feeds])
+
+
+def test_match_domain_checks_parent_domains(tmp_path):
+    idx = _index(tmp_path, a="evil.example\n", b="sub.evil.example\n")
+    assert idx.match_domain("x.sub.EVIL.example.") == [("b", "sub.evil.example"), ("a", "evil.example")]
+    assert idx.match_domain("evil.example") == [("a", "evil.example")]
+    assert idx.match_domain("notevil.example") == []
+    assert idx.match_domain("example") == []  # a bare TLD is never looked up
+    assert idx.match_domain(None) == []
+
+
+def test_match_path_exact_and_patterns(tmp_path):
+    idx = _index(tmp_path, a="/wp-login.php\n/cgi-bin/*.sh\n", b="/admin/[0-9]*\n")
+    assert idx.match_path("/wp-login.php?redirect=1") == [("a", "/wp-login.php")]
+    assert idx.match_path("/cgi-bin/test.sh") == [("a", "/cgi-bin/test.sh")]
+    assert idx.match_path("/admin/1/users") == [("b", "/admin/1/users")]
+    assert idx.match_path("/cgi-bin/test.py") == []
+    assert idx.match_path("/wp-login.php.bak") == []
+
+
+def test_match_event_and_batch_agree(tmp_path):
+    idx = _index(tmp_path, a="203.0.113.0/24\n2001:db8::/32\nevil.example\n", b="203.0.113.7\n/x\n")
+    events = [
+        ("203.0.113.7", "10.0.0.1", "/x", {"host": "www.evil.example"}),
+        ("10.0.0.1", "2001:db8::1", None, None),
+        (None, "bogus", "/y", {"query": 5}),
+    ]
+    assert idx.match_events(events) == [idx.match_event(*e) for e in events]
+    hits = idx.match_event(*events[0])
+    assert {(h["feed"], h["type"], h["field"], h["indicator"]) for h in hits} == {
+        ("a", "ip", "src_ip", "203.0.113.0/24"),
+        ("b", "ip", "src_ip", "203.0.113.7/32"),
+        ("b", "path", "http_path", "/x"),
+        ("a", "domain", "host", "evil.example"),
+    }
+
+
+def test_tag_event_and_reload_on_mtime(feed_dir):
+    assert intel.tag_event("203.0.113.7", None, None, {"k": 1}) is None  # no feeds yet
+
+    _write(feed_dir / "bad.txt", "203.0.113.7\n", mtime=1_000_000)
+    tagged = intel.tag_event("203.0.113.7", None, None, {"k": 1})
+    assert tagged["k"] == 1 and tagged["ioc"][0]["feed"] == "bad"
+    assert intel.tag_event("198.51.100.1", None, None, {}) is None
+    old = intel.current()
+
+    _write(feed_dir / "bad.txt", "198.51.100.0/24\n", mtime=2_000_000)
+    assert intel.tag_events([("198.51.100.1", None, None, {}), ("203.0.113.7", None, None, {})])[1] is None
+    assert intel.current() is not old
+    # a reader still holding the previous snapshot sees it unchanged
+    assert old.match_ip("203.0.113.7") == (("bad", "203.0.113.7/32"),)
+    assert old.match_ip("198.51.100.1") == ()
+
+    (feed_dir / "bad.txt").unlink()
+    assert not intel.current()
+
+
+def test_feeds_status_reports_each_feed(feed_dir):
+    _write(feed_dir / "small.txt", "203.0.113.7\n")
+    _write(feed_dir / "big.ioc", "".join(f"host{i}.example\n" for i in range(200)) + "10.0.0.0/8\n")
+    _write(feed_dir / "ignored.json", "203.0.113.8\n")
+    status = intel.feeds_status()
+    feeds = {f["name"]: f for f in status["feeds"]}
+    assert set(feeds) == {"small", "big"}
+    assert feeds["big"]["domains"] == 200 and feeds["big"]["cidrs"] == 1
+    assert 0 < feeds["small"]["approx_bytes"] < feeds["big"]["approx_bytes"]
+    assert status["ip_index_bytes"] > 0 and status["loaded_at"]
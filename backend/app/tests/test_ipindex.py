@@ -0,0 +1,61 @@
+import ipaddress
+
+from app.services.ipindex import IPRangeIndex
+
+
+def _v4(ip):
+    return int(ipaddress.IPv4Address(ip))
+
+
+def test_overlapping_ranges_keep_every_label():
+    idx = IPRangeIndex([("10.0.0.0/8", "a"), ("10.1.0.0/16", "b"), ("10.1.2.0/24", "c"), ("10.1.0.0/16", "d")])
+    assert set(idx.lookup("10.1.2.3")) == {"a", "b", "c", "d"}
+    assert set(idx.lookup("10.1.3.0")) == {"a", "b", "d"}
+    assert idx.lookup("10.2.0.0") == ("a",)
+    assert idx.lookup("11.0.0.0") == ()
+    # segment edges: first and last address of the inner ranges
+    assert set(idx.lookup("10.1.2.0")) == {"a", "b", "c", "d"}
+    assert set(idx.lookup("10.1.2.255")) == {"a", "b", "c", "d"}
+    assert set(idx.lookup("10.0.255.255")) == {"a"}
+    assert set(idx.lookup("10.1.255.255")) == {"a", "b", "d"}
+
+
+def test_whole_space_and_top_address():
+    idx = IPRangeIndex([("0.0.0.0/0", "any"), ("255.255.255.255/32", "top"), ("255.255.255.0/24", "net")])
+    assert idx.lookup("0.0.0.0") == ("any",)
+    assert set(idx.lookup("255.255.255.255")) == {"any", "top", "net"}
+    assert set(idx.lookup("255.255.255.254")) == {"any", "net"}
+    assert idx.lookup("1.2.3.4") == ("any",)
+    assert idx.lookup_many_v4([0, _v4("255.255.255.255"), _v4("255.255.255.254")]) == [
+        idx.lookup("0.0.0.0"),
+        idx.lookup("255.255.255.255"),
+        idx.lookup("255.255.255.254"),
+    ]
+
+
+def test_ipv6_and_invalid_input():
+    idx = IPRangeIndex([("2001:db8::/32", "doc"), ("::/0", "any6"), ("192.0.2.0/24", "v4")])
+    assert set(idx.lookup("2001:db8::1")) == {"doc", "any6"}
+    assert idx.lookup("ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff") == ("any6",)
+    assert idx.lookup("192.0.2.1") == ("v4",)  # v4 addresses don't match ::/0
+    assert idx.lookup("not-an-ip") == ()
+    assert idx.lookup(None) == ()
+
+
+def test_lookup_many_v4_matches_scalar_lookups():
+    idx = IPRangeIndex([("192.168.0.0/16", 1), ("192.168.10.0/24", 2), ("172.16.0.0/12", 3)])
+    ips = ["192.168.10.5", "192.168.0.0", "172.31.255.255", "172.32.0.0", "8.8.8.8", "0.0.0.0"]
+    assert idx.lookup_many_v4([_v4(ip) for ip in ips]) == [idx.lookup(ip) for ip in ips]
+    assert IPRangeIndex([]).lookup_many_v4([1, 2]) == [(), ()]
+
+
+def test_disjoint_segments_count():
+    # 10/8 split around 10.1/16: three segments, plus the separate /24
+    assert len(IPRangeIndex([("10.0.0.0/8", "a"), ("10.1.0.0/16", "b"), ("192.0.2.0/24", "c")])) == 4
+
+
+def test_lookup_many_mixes_families_and_junk():
+    idx = IPRangeIndex([("10.0.0.0/8", "a"), ("2001:db8::/32", "b"), ("255.255.255.255/32", "top")])
+    ips = ["10.1.2.3", None, "2001:db8::5", "", "nope", "11.0.0.1", "255.255.255.255", "::ffff:10.0.0.1"]
+    assert idx.lookup_many(ips) == [idx.lookup(ip) for ip in ips]
+    assert IPRangeIndex([]).lookup_many(["10.0.0.1"]) == [()]
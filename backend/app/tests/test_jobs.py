@@ -0,0 +1,48 @@
+import threading
+
+from app.workers import jobs
+from app.workers.jobs import JobRegistry
+
+
+def test_slow_redis_claim_does_not_block_status_reads(fake_redis, monkeypatch):
+    reg = JobRegistry("test-slow-claim")
+    release = threading.Event()
+    running = threading.Event()
+    first, _ = reg.submit(lambda report: running.set() or release.wait(5), coalesce=False)
+    assert running.wait(5)
+
+    # a coalescing submit stalls in Redis while it claims the inflight slot
+    claiming, unblock = threading.Event(), threading.Event()
+    real_set = fake_redis.set
+
+    def slow_set(*args, **kw):
+        claiming.set()
+        unblock.wait(5)
+        return real_set(*args, **kw)
+
+    monkeypatch.setattr(fake_redis, "set", slow_set)
+    submitter = threading.Thread(target=reg.submit, args=(lambda report: None,))
+    submitter.start()
+    try:
+        assert claiming.wait(5)
+        seen = []
+        reader = threading.Thread(target=lambda: seen.append(reg.get(first["id"])))
+        reader.start()
+        reader.join(1)
+        assert seen and seen[0]["status"] == "running"
+    finally:
+        unblock.set()
+        release.set()
+        submitter.join(5)
+
+
+def test_local_submits_coalesce(fake_redis):
+    reg = JobRegistry("test-coalesce")
+    release = threading.Event()
+    a, coalesced_a = reg.submit(lambda report: release.wait(5))
+    b, coalesced_b = reg.submit(lambda report: None)
+    release.set()
+    assert not coalesced_a and coalesced_b and b["id"] == a["id"]
+    c, coalesced_c = reg.submit(lambda report: None, coalesce=False)
+    assert not coalesced_c and c["id"] != a["id"]
+    assert jobs.is_stale({"status": "running", "heartbeat_at": "2000-01-01T00:00:00+00:00"})
@@ -0,0 +1,50 @@
+import base64
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.pagination import decode_cursor, decode_datetime, decode_float, decode_int, encode_cursor, next_cursor
+
+
+def test_round_trip():
+    ts = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    token = encode_cursor(ts, 0.75, 42)
+    assert "=" not in token
+    raw_ts, score, id_ = decode_cursor(token, 3)
+    assert decode_datetime(raw_ts) == ts
+    assert decode_float(score) == 0.75
+    assert decode_int(id_) == 42
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "bad",
+        "",
+        "!!!!",
+        base64.urlsafe_b64encode(b'{"id": 1}').decode(),  # not a list
+        encode_cursor(1, 2, 3),  # wrong arity
+        encode_cursor(1)[:-1] + "x",  # tampered
+    ],
+)
+def test_tampered_cursors_are_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, 2)
+
+
+@pytest.mark.parametrize(
+    "decode, value",
+    [(decode_int, "1"), (decode_int, True), (decode_int, 1.5), (decode_float, "0.5"), (decode_float, False),
+     (decode_datetime, "yesterday"), (decode_datetime, 5)],
+)
+def test_wrong_value_types_are_rejected(decode, value):
+    with pytest.raises(ValueError):
+        decode(value)
+
+
+def test_next_cursor_only_for_full_pages():
+    rows = [SimpleNamespace(id=i) for i in (9, 8, 7)]
+    assert next_cursor(rows, 3, "id") == encode_cursor(7)
+    assert next_cursor(rows, 4, "id") is None
+    assert next_cursor([], 3, "id") is None
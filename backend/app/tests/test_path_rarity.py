@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from backend.app.detectors.ml import path_rarity as pr
+from backend.app.detectors.ml._state import load_state
+
+from .conftest import FakeSession
+
+
+@pytest.fixture(autouse=True)
+def _no_pending(monkeypatch):
+    monkeypatch.setattr(pr, "_pending", None)
+
+
+def _fnv1a(data: bytes) -> int:
+    h = 2166136261
+    for byte in data:
+        h = ((h ^ byte) * 16777619) & 0xFFFFFFFF
+    return h
+
+
+def _buckets(s: str):
+    enc = b"\x02" + s.encode() + b"\x03"
+    return [_fnv1a(enc[i:i + pr.NGRAM]) & (pr.TABLE_SIZE - 1) for i in range(len(enc) - pr.NGRAM + 1)]
+
+
+def test_ngram_hashes_match_fnv1a():
+    buckets, owner = pr.ngram_hashes(["/a", "/admin", "", "x"])
+    assert buckets.tolist() == _buckets("/a") + _buckets("/admin") + _buckets("x")
+    assert owner.tolist() == [0, 0] + [1] * 6 + [3]  # "" has only 2 bytes: no 3-gram
+    assert _buckets("/a") == [_fnv1a(b"\x02/a") & 0x3FFFF, _fnv1a(b"/a\x03") & 0x3FFFF]
+
+
+def test_learn_counts_each_gram():
+    t = pr._NgramTable()
+    t.learn(["/admin", "/admin", "/a"])
+    for b in set(_buckets("/admin")):
+        assert t.counts[b] >= 2
+    assert t.stats[0] == 2 * 6 + 2
+    assert t.counts.sum() == t.stats[0]
+
+
+def _common(n, offset=0):
+    words = ["users", "orders", "products", "cart", "search", "static"]
+    return [f"/api/v1/{words[k % len(words)]}/{(k * 7919) % 1000}" for k in range(offset, offset + n)]
+
+
+def _rows(paths, start_id=1, ip="10.0.0.1"):
+    return [(start_id + k, ip, p, None) for k, p in enumerate(paths)]
+
+
+def test_rare_probe_scores_above_threshold_and_common_paths_below(ml_state_dir):
+    assert pr.run(FakeSession(_rows(_common(3000)))) == []  # warm-up only learns
+    pr.checkpoint()
+
+    rows = _rows(_common(500, offset=3000), start_id=3001) + [(4000, "203.0.113.9", "/.git/config", None)]
+    findings = pr.run(FakeSession(rows))
+    assert [f["features"]["src_ip"] for f in findings] == ["203.0.113.9"]
+    f = findings[0]
+    assert list(f["features"]["rare_paths_bits"]) == ["/.git/config"]
+    assert f["features"]["max_z"] >= pr.Z_THRESHOLD and f["evidence_event_ids"] == [4000]
+
+    # the learned tables agree: the probe is far rarer than traffic like the training set
+    table = pr._NgramTable(pr._pending["path_counts"], pr._pending["path_stats"])
+    z = table.zscores(table.score(["/.git/config", "/api/v1/users/42"]))
+    assert z[0] >= pr.Z_THRESHOLD > z[1]
+
+
+def test_tables_change_only_on_checkpoint(ml_state_dir):
+    pr.run(FakeSession(_rows(_common(100))))
+    assert load_state(pr.STATE_KEY) is None
+    pr.checkpoint()
+    saved = load_state(pr.STATE_KEY)
+    assert int(saved["last_id"][0]) == 100
+
+    pr.run(FakeSession(_rows(_common(50), start_id=101)))
+    again = load_state(pr.STATE_KEY)
+    assert int(again["last_id"][0]) == 100  # the second run is not checkpointed yet
+    assert np.array_equal(again["path_counts"], saved["path_counts"])
+    pr.checkpoint()
+    latest = load_state(pr.STATE_KEY)
+    assert int(latest["last_id"][0]) == 150
+    assert latest["path_stats"][0] > saved["path_stats"][0]
@@ -0,0 +1,51 @@
+import pytest
+
+from app.services.playbooks import parse_playbook
+
+
+def _doc(**over):
+    doc = {
+        "id": "ssh",
+        "match": {"rule_id": "SSH-Bruteforce", "min_severity": "HIGH"},
+        "actions": [{"type": "block_src_ip", "ttl_minutes": 60}, {"type": "open_case", "title": "from {src_ip}"}],
+    }
+    doc.update(over)
+    return doc
+
+
+def test_valid_playbook_and_defaults():
+    pb = parse_playbook(_doc(rate_limit={"count": 3, "per": "2h"}, idempotency_ttl="30m"), "ssh.yml")
+    assert pb.match == {"rule_id": ("SSH-Bruteforce",)} and pb.min_severity == "high"
+    assert pb.actions[0] == {"type": "block_src_ip", "ttl_minutes": 60, "max_targets": 5}
+    assert (pb.rate_count, pb.rate_per, pb.idempotency_ttl) == (3, 7200, 1800)
+    assert not pb.dry_run
+
+    pb = parse_playbook(_doc(), "ssh.yml")
+    assert (pb.rate_count, pb.rate_per, pb.idempotency_ttl) == (10, 60, 86400)
+
+
+@pytest.mark.parametrize(
+    "over, message",
+    [
+        ({"id": ""}, "id is required"),
+        ({"match": {}}, "match is required"),
+        ({"match": {"src_ip": "1.1.1.1"}}, "unknown match key"),
+        ({"match": {"min_severity": "urgent"}}, "match.min_severity"),
+        ({"actions": []}, "actions must be a non-empty list"),
+        ({"actions": [{"type": "block_src_ip"}]}, "actions[0].ttl_minutes"),  # no open-ended blocks
+        ({"actions": [{"type": "block_src_ip", "ttl_minutes": True}]}, "actions[0].ttl_minutes"),
+        ({"actions": [{"type": "delete_all"}]}, "actions[0].type"),
+        ({"actions": [{"type": "open_case", "title": "{nope}"}]}, "actions[0].title"),
+        ({"idempotency_key": "{playbook"}, "idempotency_key"),
+        ({"rate_limit": [1]}, "rate_limit must be a mapping"),
+        ({"rate_limit": {"count": 0}}, "rate_limit.count"),
+        ({"rate_limit": {"per": "0m"}}, "rate_limit.per"),
+        ({"rate_limit": {"per": "-5m"}}, "rate_limit.per"),
+        ({"rate_limit": {"per": "10s"}}, "unsupported window"),
+        ({"idempotency_ttl": "0h"}, "idempotency_ttl"),
+    ],
+)
+def test_invalid_playbooks_are_rejected(over, message):
+    with pytest.raises(ValueError) as e:
+        parse_playbook(_doc(**over), "bad.yml")
+    assert message in str(e.value)
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[2]
+
+# The engines are built when app.core.db is imported, so each setup runs in a
+# fresh interpreter with its own environment.
+_ENGINES = """
+    import json
+    from app.core import db
+    print(json.dumps({
+        "read_is_primary": db.read_engine is db.engine,
+        "async_read_is_primary": db.async_read_engine is db.async_engine,
+        "read_url": db.read_engine.url.database,
+        "pools": sorted(db.pool_stats()),
+    }))
+"""
+
+_ROUTES = """
+    import json
+    from fastapi.testclient import TestClient
+    from app.api.main import app
+    from app.core.auth_deps import get_current_user
+    from app.core.db import engine, read_engine, SessionLocal, ReadSessionLocal
+    from app.models import Base
+    from app.models.block import BlockRule
+    from app.models.case import Case
+
+    tables = [Base.metadata.tables[t] for t in ("cases", "case_detections", "comments", "detections", "block_rules")]
+    for e in (engine, read_engine):
+        Base.metadata.create_all(e, tables=tables)
+    primary, replica = SessionLocal(), ReadSessionLocal()
+    primary.add_all([Case(title="on primary"), BlockRule(ip="192.0.2.1", reason="primary", created_by="a@b")])
+    replica.add_all([Case(title="on replica"), BlockRule(ip="198.51.100.1", reason="replica", created_by="a@b")])
+    primary.commit(); replica.commit()
+
+    class User:
+        id, email, role = 1, "a@b", "admin"
+    app.dependency_overrides[get_current_user] = lambda: User()
+    c = TestClient(app)
+    print(json.dumps({
+        "cases": [r["title"] for r in c.get("/cases").json()],
+        "case": c.get("/cases/1").json()["title"],
+        "blocks": [r["ip"] for r in c.get("/respond/blocks").json()],
+    }))
+"""
+
+
+def _run(code, tmp_path, **env):
+    base = {k: v for k, v in os.environ.items() if not k.startswith("DATABASE_")}
+    primary = tmp_path / "primary.db"
+    base.update(
+        DATABASE_URL=f"sqlite:///{primary}",
+        DATABASE_ASYNC_URL=f"sqlite+aiosqlite:///{primary}",
+        REDIS_URL="redis://localhost:6399/0",
+        PYTHONPATH=os.pathsep.join([str(BACKEND), str(BACKEND.parent)]),
+        **env,
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        cwd=BACKEND, env=base, capture_output=True, text=True, timeout=60,
+    )
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _replica_env(tmp_path):
+    replica = tmp_path / "replica.db"
+    return {"DATABASE_READ_URL": f"sqlite:///{replica}", "DATABASE_READ_ASYNC_URL": f"sqlite+aiosqlite:///{replica}"}
+
+
+def test_without_read_url_the_read_engines_alias_the_primary(tmp_path):
+    got = _run(_ENGINES, tmp_path)
+    assert got["read_is_primary"] and got["async_read_is_primary"]
+    assert got["read_url"].endswith("primary.db")
+    assert got["pools"] == ["primary", "primary_async"]
+
+
+def test_read_url_builds_separate_engines(tmp_path):
+    got = _run(_ENGINES, tmp_path, **_replica_env(tmp_path))
+    assert not got["read_is_primary"] and not got["async_read_is_primary"]
+    assert got["read_url"].endswith("replica.db")
+    assert got["pools"] == ["primary", "primary_async", "replica", "replica_async"]
+
+
+def test_list_routes_read_from_the_replica(tmp_path):
+    got = _run(_ROUTES, tmp_path, **_replica_env(tmp_path))
+    assert got == {"cases": ["on replica"], "case": "on replica", "blocks": ["198.51.100.1"]}
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.rollups import DAY, HOUR, LEVELS, MINUTE, _plan, parse_interval
+
+
+def _t(*args):
+    return datetime(2024, 5, *args, tzinfo=timezone.utc)
+
+
+def _names(plan):
+    return [(m.__name__ if m else None, a, b) for m, a, b in plan]
+
+
+def test_plan_uses_coarsest_rollups_and_raw_edges():
+    start, end = _t(1, 22, 30, 15), _t(3, 1, 5, 30)
+    plan = _names(_plan(start, end, LEVELS))
+    assert plan == [
+        (None, start, _t(1, 22, 31)),
+        ("EventRollupMinute", _t(1, 22, 31), _t(1, 23)),
+        ("EventRollupHour", _t(1, 23), _t(2)),
+        ("EventRollupDay", _t(2), _t(3)),
+        ("EventRollupHour", _t(3), _t(3, 1)),
+        ("EventRollupMinute", _t(3, 1), _t(3, 1, 5)),
+        (None, _t(3, 1, 5), end),
+    ]
+
+
+def test_plan_segments_tile_the_range():
+    start = _t(1, 0, 0, 1)
+    for minutes in (0.5, 1, 59, 61, 60 * 24 + 7, 60 * 24 * 3):
+        end = start + timedelta(minutes=minutes)
+        plan = _plan(start, end, LEVELS)
+        assert plan[0][1] == start and plan[-1][2] == end
+        assert all(a < b for _, a, b in plan)
+        assert all(p[2] == q[1] for p, q in zip(plan, plan[1:]))
+
+
+def test_plan_with_only_finer_levels_and_empty_ranges():
+    levels = [(lv, m) for lv, m in LEVELS if (15 * MINUTE) % lv == 0]  # a 15m histogram: minutes only
+    plan = _names(_plan(_t(1), _t(2), levels))
+    assert plan == [("EventRollupMinute", _t(1), _t(2))]
+    assert _plan(_t(2), _t(1), LEVELS) == []
+    assert _plan(_t(1), _t(1, 0, 0, 30), []) == [(None, _t(1), _t(1, 0, 0, 30))]
+
+
+def test_parse_interval():
+    assert (parse_interval("5m"), parse_interval("2h"), parse_interval("1d")) == (5 * MINUTE, 2 * HOUR, DAY)
+    for bad in ("0m", "m", "5s", "-1h", "1.5h", ""):
+        with pytest.raises(ValueError):
+            parse_interval(bad)
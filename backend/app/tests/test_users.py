@@ -0,0 +1,67 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import auth, me
+from app.core.db import SessionLocal, engine
+from app.core.jwt import create_access_token
+from app.core.user_cache import CHANNEL, user_cache
+from app.models import Base
+from app.models.user import User
+
+TABLES = [User.__table__]
+
+
+@pytest.fixture
+def client(fake_redis, monkeypatch):
+    Base.metadata.drop_all(engine, tables=TABLES)
+    Base.metadata.create_all(engine, tables=TABLES)
+    # no invalidation listener: the test drives the cache directly
+    monkeypatch.setattr("app.core.auth_deps.ensure_subscriber", lambda: None)
+    user_cache.clear()
+    with SessionLocal() as db:
+        db.add_all([
+            User(email="admin@example.com", password_hash="x", role="admin"),
+            User(email="ana@example.com", password_hash="x", role="viewer"),
+        ])
+        db.commit()
+    app = FastAPI()
+    app.include_router(auth.router)
+    app.include_router(me.router)
+    yield TestClient(app)
+    user_cache.clear()
+
+
+def _auth(email):
+    return {"Authorization": f"Bearer {create_access_token(email)}"}
+
+
+def test_role_change_evicts_the_cached_user(client, fake_redis):
+    admin, ana = _auth("admin@example.com"), _auth("ana@example.com")
+    assert client.get("/auth/me", headers=ana).json()["role"] == "viewer"
+    assert "ana@example.com" in user_cache._by_sub
+
+    r = client.put("/auth/users/ana@example.com/role", json={"role": "analyst"}, headers=admin)
+    assert r.status_code == 200 and r.json()["role"] == "analyst"
+    assert "ana@example.com" not in user_cache._by_sub
+    assert (CHANNEL, "ana@example.com") in fake_redis.published
+    # the same token now resolves to the new role
+    assert client.get("/auth/me", headers=ana).json()["role"] == "analyst"
+
+
+def test_deleted_user_is_rejected_at_once(client, fake_redis):
+    ana = _auth("ana@example.com")
+    assert client.get("/auth/me", headers=ana).status_code == 200
+
+    r = client.delete("/auth/users/ana@example.com", headers=_auth("admin@example.com"))
+    assert r.status_code == 200
+    assert client.get("/auth/me", headers=ana).status_code == 401
+    assert client.delete("/auth/users/ana@example.com", headers=_auth("admin@example.com")).status_code == 404
+
+
+def test_user_admin_routes_need_admin_and_a_known_role(client):
+    ana, admin = _auth("ana@example.com"), _auth("admin@example.com")
+    assert client.put("/auth/users/ana@example.com/role", json={"role": "admin"}, headers=ana).status_code == 403
+    assert client.delete("/auth/users/admin@example.com", headers=ana).status_code == 403
+    assert client.put("/auth/users/ana@example.com/role", json={"role": "root"}, headers=admin).status_code == 400
+    assert client.put("/auth/users/nobody@example.com/role", json={"role": "viewer"}, headers=admin).status_code == 404
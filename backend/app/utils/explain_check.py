@@ -0,0 +1,155 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..core.db import SessionLocal
+from ..detectors.engine import load_yaml_rules, compile_yaml_rule, evidence_query
+from ..services.events import events_query
+from ..services.detections import detections_query, evidence_for_detection, detections_referencing
+from ..services.cases import cases_query
+from ..services.respond import blocks_query
+from ..services.pagination import encode_cursor
+from ..services.timeline import timeline
+
+# Plan regression check: EXPLAIN every compiled YAML rule and list query and
+# fail if any of them would read a large table with a full sequential scan.
+# Plans are taken with enable_seqscan=off, so even on a small dev database a
+# Seq Scan that survives means no index can serve the query.
+#
+#   python -m app.utils.explain_check            (exit code 1 on regression)
+
+RULES_DIR = Path(__file__).resolve().parents[1] / "detectors" / "rules"
+CHECKED_TABLES = {"events_normalized", "detections", "detection_events", "cases", "block_rules"}
+
+
+class _Capture:
+    """Stands in for a Session to grab the statements a service function builds."""
+
+    def __init__(self):
+        self.stmt = None
+        self.stmts = []
+
+    def execute(self, stmt, *args, **kwargs):
+        self.stmt = stmt
+        self.stmts.append(stmt)
+        return self
+
+    def all(self):
+        return []
+
+    def scalars(self):
+        return self
+
+
+def _captured(fn, *args, **kwargs):
+    cap = _Capture()
+    fn(cap, *args, **kwargs)
+    return cap.stmt
+
+
+def _captured_all(fn, *args, **kwargs):
+    cap = _Capture()
+    fn(cap, *args, **kwargs)
+    return cap.stmts
+
+
+def _queries(db: Session, rules_dir: Path) -> Iterator[Tuple[str, Any]]:
+    for rule in load_yaml_rules(rules_dir):
+        compiled = compile_yaml_rule(rule)
+        yield f"rule {compiled['id']}", compiled["stmt"]
+        groups = ["0.0.0.0"] * len(compiled["group_cols"])
+        yield f"rule {compiled['id']} evidence", evidence_query(compiled, groups)
+
+    deep = encode_cursor(1_000_000)
+    yield "events", events_query()
+    yield "events module/action", events_query(event_module="auth", event_action="ssh_login_failed")
+    yield "events src_ip", events_query(src_ip="203.0.113.7")
+    yield "events user", events_query(user="alice")
+    yield "events time range", events_query(start="2025-01-01T00:00:00+00:00", end="2025-01-02T00:00:00+00:00")
+    yield "events cursor", events_query(cursor=deep)
+    yield "events search substring", events_query(q="phpunit")
+    yield "events search prefix", events_query(q="/wp-admin", q_mode="prefix", q_field="http_path")
+    yield "events search regex", events_query(q="sqlmap/[0-9.]+", q_mode="regex", q_field="user_agent")
+    yield "events search fields", events_query(q="union select", q_field="fields")
+
+    yield "detections", detections_query(db, None, None, None, 50, 0).statement
+    yield "detections open", detections_query(db, "open", None, None, 50, 0).statement
+    yield "detections cursor", detections_query(db, None, None, None, 50, 0, cursor=deep).statement
+    yield "detection evidence", _captured(evidence_for_detection, 1)
+    yield "detections by event", _captured(detections_referencing, event_id=1)
+    yield "detections by src_ip", _captured(detections_referencing, src_ip="203.0.113.7")
+
+    case_cursor = encode_cursor("2025-01-01T00:00:00+00:00", 1_000_000)
+    yield "cases", cases_query(db, None, None, 50, 0).statement
+    yield "cases open", cases_query(db, "open", None, 50, 0).statement
+    yield "cases cursor", cases_query(db, None, None, 50, 0, cursor=case_cursor).statement
+
+    yield "blocks", blocks_query(db, active_only=False).statement
+    yield "blocks active", blocks_query(db, active_only=True).statement
+
+    tl_cursor = encode_cursor("2025-01-01T00:00:00+00:00", 1, 1_000_000)
+    for entity in ("src_ip:203.0.113.7", "user:alice"):
+        for i, stmt in enumerate(_captured_all(timeline, entity)):
+            yield f"timeline {entity} #{i}", stmt
+        for i, stmt in enumerate(_captured_all(timeline, entity, cursor=tl_cursor)):
+            yield f"timeline {entity} cursor #{i}", stmt
+
+
+def _seq_scans(node: Dict[str, Any]) -> List[str]:
+    found = []
+    if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES:
+        found.append(node["Relation Name"])
+    for child in node.get("Plans", []):
+        found += _seq_scans(child)
+    return found
+
+
+def explain(db: Session, stmt) -> Dict[str, Any]:
+    conn = db.connection()
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def check(db: Session, rules_dir: Path = RULES_DIR, verbose: bool = False) -> List[Tuple[str, List[str]]]:
+    failures = []
+    for name, stmt in _queries(db, rules_dir):
+        try:
+            plan = explain(db, stmt)
+        finally:
+            db.rollback()  # SET LOCAL ends with the transaction
+        scans = _seq_scans(plan)
+        if scans:
+            failures.append((name, scans))
+        if verbose or scans:
+            status = "SEQ SCAN " + ",".join(scans) if scans else "ok"
+            print(f"[explain] {name}: {status} (cost={plan.get('Total Cost')})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a rule or list query plans a full sequential scan")
+    parser.add_argument("--rules-dir", default=str(RULES_DIR), help="YAML rules directory")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan, not just failures")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        failures = check(db, Path(args.rules_dir), verbose=args.verbose)
+    finally:
+        db.close()
+
+    if failures:
+        print(f"[explain] {len(failures)} query plan(s) regressed to a sequential scan")
+        sys.exit(1)
+    print("[explain] all query plans use an index")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+import logging
+import threading
+
+from ..core.config import settings
+from ..core.db import SessionLocal
+from ..services import blocklist
+
+log = logging.getLogger(__name__)
+
+# Deactivates expired block rules every settings.block_sweep_seconds. Every
+# API process runs the loop; a short Redis lock lets only one of them sweep
+# per interval. Lookups already ignore expired rules, so the sweep is about
+# keeping block_rules (and the feed) truthful, not about enforcement.
+
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def sweep_once() -> int:
+    if not blocklist.claim_sweep():
+        return 0
+    db = SessionLocal()
+    try:
+        ids = blocklist.sweep_expired(db)
+    finally:
+        db.close()
+    if ids:
+        log.info("deactivated %d expired block rule(s)", len(ids))
+    return len(ids)
+
+
+def _loop():
+    while not _stop.wait(settings.block_sweep_seconds):
+        try:
+            sweep_once()
+        except Exception:
+            log.exception("block rule sweep failed")
+
+
+def start():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="block-sweeper", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
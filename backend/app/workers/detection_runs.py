@@ -0,0 +1,35 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from ..core.db import SessionLocal
+from ..detectors.engine import run_all_rules
+from .jobs import JobRegistry
+
+RULES_DIR = Path(__file__).resolve().parents[1] / "detectors" / "rules"
+
+# one run at a time: duplicate submissions coalesce into the in-flight job
+detection_runs = JobRegistry("detection_run", max_workers=1, ttl_seconds=86400)
+
+
+def _run(report) -> Dict[str, int]:
+    rules: Dict[str, int] = {}
+
+    def on_progress(rid: str, count: int, done: int, total: int):
+        rules[rid] = count
+        report(done=done, total=total, rules=dict(rules))
+
+    db = SessionLocal()
+    try:
+        return run_all_rules(db, RULES_DIR, on_progress=on_progress)
+    finally:
+        db.close()
+
+
+def submit_detection_run(requested_by: str | None = None) -> Tuple[Dict[str, Any], bool]:
+    """Queue a full rule run (or join the one in flight); returns (job, coalesced)."""
+    return detection_runs.submit(_run, params={"requested_by": requested_by})
+
+
+def get_detection_run(job_id: str) -> Dict[str, Any] | None:
+    return detection_runs.get(job_id)
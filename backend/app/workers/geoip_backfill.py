@@ -0,0 +1,137 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple
+import json
+
+from sqlalchemy import Integer, String, column, func, or_, select, update, values
+
+from ..core.cache import invalidate
+from ..core.db import SessionLocal
+from ..core.redis_client import redis_client
+from ..models.event import EventNormalized
+from ..services.enrich import country_for_ip, geoip_available
+from ..services.rollups import move_country
+from .jobs import JobRegistry
+
+# Fills in missing countries for a time range. The range is walked in id
+# order, CHUNK_ROWS events per transaction: each chunk resolves its distinct
+# IPs once and writes with one UPDATE ... FROM (VALUES ...). After every
+# commit the last id is checkpointed in Redis, so a run cut short by a
+# restart can be resumed where it stopped.
+
+CHUNK_ROWS = 5000
+CHECKPOINT_KEY = "geoip:backfill:checkpoint"
+CHECKPOINT_TTL = 7 * 86400
+
+geoip_backfills = JobRegistry("geoip_backfill", max_workers=1, ttl_seconds=86400)
+
+E = EventNormalized
+MISSING = or_(E.country.is_(None), E.country == "")
+
+
+def load_checkpoint() -> Dict[str, Any] | None:
+    try:
+        raw = redis_client.get(CHECKPOINT_KEY)
+        return json.loads(raw) if raw else None
+    except Exception:
+        return None
+
+
+def _save_checkpoint(cp: Dict[str, Any]):
+    try:
+        redis_client.setex(CHECKPOINT_KEY, CHECKPOINT_TTL, json.dumps(cp))
+    except Exception:
+        pass  # without Redis a run simply can't be resumed
+
+
+def _apply_chunk(db, rows) -> int:
+    """Resolve and write one chunk; returns the number of events updated."""
+    resolved = {ip: country_for_ip(ip) for ip in {r.src_ip for r in rows if r.src_ip}}
+    old = {r.id: r.country for r in rows}
+    data = [(r.id, resolved[r.src_ip]) for r in rows if r.src_ip and resolved.get(r.src_ip)]
+    if not data:
+        return 0
+
+    v = values(column("id", Integer), column("country", String), name="v").data(data)
+    stmt = (
+        update(E)
+        .where(E.id == v.c.id, MISSING)  # skip rows filled in meanwhile
+        .values(country=v.c.country)
+        .returning(E.id, E.timestamp, E.event_module, E.event_action, E.src_ip, E.country)
+    )
+    changed = db.execute(stmt).all()
+    # rollups are keyed by country too
+    move_country(db, [(r.timestamp, r.event_module, r.event_action, r.src_ip, old[r.id], r.country) for r in changed])
+    return len(changed)
+
+
+def _run(report, cp: Dict[str, Any]) -> Dict[str, Any]:
+    if not geoip_available():
+        raise RuntimeError("no GeoIP database configured (GEOIP_DB_PATH)")
+
+    start = datetime.fromisoformat(cp["start"])
+    end = datetime.fromisoformat(cp["end"])
+    in_range = [E.timestamp >= start, E.timestamp < end]
+
+    db = SessionLocal()
+    try:
+        if cp.get("max_id") is None:
+            lo, hi = db.execute(select(func.min(E.id), func.max(E.id)).where(*in_range)).one()
+            cp.update(first_id=lo or 0, max_id=hi or 0, last_id=(lo or 1) - 1)
+            db.rollback()
+        report(**cp)
+
+        while cp["last_id"] < cp["max_id"]:
+            rows = db.execute(
+                select(E.id, E.src_ip, E.country)
+                .where(E.id > cp["last_id"], E.id <= cp["max_id"], MISSING, *in_range)
+                .order_by(E.id)
+                .limit(CHUNK_ROWS)
+            ).all()
+            if not rows:
+                cp["last_id"] = cp["max_id"]
+                break
+
+            updated = _apply_chunk(db, rows)
+            db.commit()
+            if updated:
+                invalidate("events")
+
+            cp["last_id"] = rows[-1].id
+            cp["scanned"] += len(rows)
+            cp["updated"] += updated
+            _save_checkpoint(cp)
+            span = max(cp["max_id"] - cp["first_id"] + 1, 1)
+            report(**cp, percent=round(100.0 * (cp["last_id"] - cp["first_id"] + 1) / span, 1))
+    finally:
+        db.close()
+
+    cp["done"] = True
+    _save_checkpoint(cp)
+    report(percent=100.0, done=True)
+    return {"scanned": cp["scanned"], "updated": cp["updated"]}
+
+
+def submit_geoip_backfill(hours: int = 24, resume: bool = True) -> Tuple[Dict[str, Any], bool]:
+    """
+    Queue a backfill of the last `hours` (or join the one in flight). With
+    resume, an unfinished checkpoint is picked up instead, range and all.
+    """
+    cp = load_checkpoint() if resume else None
+    if not cp or cp.get("done"):
+        end = datetime.now(timezone.utc)
+        cp = {
+            "start": (end - timedelta(hours=hours)).isoformat(),
+            "end": end.isoformat(),
+            "first_id": None,
+            "max_id": None,
+            "last_id": None,
+            "scanned": 0,
+            "updated": 0,
+        }
+    params = {"start": cp["start"], "end": cp["end"], "resumed_from": cp.get("last_id")}
+    return geoip_backfills.submit(lambda report: _run(report, cp), params=params)
+
+
+def get_geoip_backfill(job_id: str) -> Dict[str, Any] | None:
+    return geoip_backfills.get(job_id)
@@ -0,0 +1,233 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Tuple
+import json
+import logging
+import threading
+import time
+import uuid
+
+from ..core import redis_client as rc
+from ..core.redis_client import redis_client
+
+log = logging.getLogger(__name__)
+
+ACTIVE = ("queued", "running")
+
+# The cross-process inflight slot is a short lease that the owning process
+# renews every HEARTBEAT_SECONDS, stamping heartbeat_at on the job record as
+# it goes. A process that dies stops renewing: its lease runs out within
+# LEASE_SECONDS, and an active record whose heartbeat is older than
+# STALE_SECONDS is treated as dead even before that.
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 10
+STALE_SECONDS = 30
+
+
+def _utcnow_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def is_stale(job: Dict[str, Any]) -> bool:
+    """An active record whose owner stopped sending heartbeats."""
+    if job.get("status") not in ACTIVE:
+        return False
+    beat = job.get("heartbeat_at") or job.get("created_at")
+    try:
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(beat)).total_seconds()
+    except (TypeError, ValueError):
+        return True
+    return age > STALE_SECONDS
+
+
+class JobRegistry:
+    """
+    Background jobs of one kind on a small thread pool.
+
+    Job records live in process memory and are mirrored to Redis
+    (`jobs:<kind>:<id>`) so any API worker can report on them. With
+    coalesce=True at most one job of the kind is in flight: a duplicate
+    submission returns the existing job, across processes via a leased NX key.
+    """
+
+    def __init__(self, kind: str, max_workers: int = 1, ttl_seconds: int = 86400):
+        self.kind = kind
+        self.ttl = ttl_seconds
+        self._max_workers = max_workers
+        self._pool: ThreadPoolExecutor | None = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._inflight: str | None = None
+        self._lock = threading.Lock()         # guards _jobs and _inflight; never held across Redis calls
+        self._submit_lock = threading.Lock()  # serialises coalescing submits
+        self._heartbeat: threading.Thread | None = None
+
+    # ---------------- redis mirror ----------------
+
+    def _key(self, job_id: str) -> str:
+        return f"jobs:{self.kind}:{job_id}"
+
+    @property
+    def _inflight_key(self) -> str:
+        return f"jobs:{self.kind}:inflight"
+
+    def _publish(self, job: Dict[str, Any]):
+        try:
+            redis_client.setex(self._key(job["id"]), self.ttl, json.dumps(job, default=str))
+        except Exception:
+            pass  # mirror is optional
+
+    def _read_remote(self, job_id: str) -> Dict[str, Any] | None:
+        try:
+            raw = redis_client.get(self._key(job_id))
+            return json.loads(raw) if raw else None
+        except Exception:
+            return None
+
+    def _claim_inflight(self, job_id: str) -> Dict[str, Any] | None:
+        """Returns a live job already in flight in another process, else claims the slot."""
+        key = self._inflight_key
+        try:
+            for _ in range(3):
+                if redis_client.set(key, job_id, nx=True, ex=LEASE_SECONDS):
+                    return None
+                other = redis_client.get(key)
+                if other is None:
+                    continue  # lease ran out in between; try again
+                rec = self._read_remote(other)
+                if rec is None:
+                    # claimed a moment ago, record not published yet
+                    return {"id": other, "kind": self.kind, "status": "queued"}
+                if rec.get("status") in ACTIVE and not is_stale(rec):
+                    return rec
+                # finished or dead owner: take over unless someone beat us to it
+                if rc.replace_lock(key, other, job_id, LEASE_SECONDS):
+                    log.warning("%s job %s looks dead (%s); taking over the slot", self.kind, other, rec.get("status"))
+                    return None
+        except Exception:
+            pass  # no Redis: coalescing is per process
+        return None
+
+    def _release_inflight(self, job_id: str):
+        try:
+            rc.release_lock(self._inflight_key, job_id)
+        except Exception:
+            pass
+
+    def _beat(self):
+        """Renew the lease and stamp heartbeat_at on every active local job."""
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._lock:
+                active = [k for k, j in self._jobs.items() if j["status"] in ACTIVE]
+                inflight = self._inflight
+            for job_id in active:
+                if job_id == inflight:
+                    try:
+                        if not rc.renew_lock(self._inflight_key, job_id, LEASE_SECONDS):
+                            log.warning("%s job %s lost its inflight lease", self.kind, job_id)
+                    except Exception:
+                        pass
+                self._update(job_id, heartbeat_at=_utcnow_iso())
+
+    # ---------------- public ----------------
+
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return json.loads(json.dumps(job, default=str))
+        job = self._read_remote(job_id)
+        if job is not None and is_stale(job):
+            job["status"] = "lost"  # its process died mid-run
+        return job
+
+    def submit(
+        self,
+        fn: Callable[[Callable[..., None]], Any],
+        params: Dict[str, Any] | None = None,
+        coalesce: bool = True,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue fn(report) and return (job, coalesced). fn may call
+        report(**progress) to merge fields into the job's progress dict.
+        """
+        job_id = uuid.uuid4().hex
+        if not coalesce:
+            snapshot = self._record(job_id, params, inflight=False)
+        else:
+            # one coalescing submit at a time; the Redis round trips happen
+            # outside _lock so status polls, progress and heartbeats never wait on them
+            with self._submit_lock:
+                with self._lock:
+                    if self._inflight and self._jobs[self._inflight]["status"] in ACTIVE:
+                        return dict(self._jobs[self._inflight]), True
+                other = self._claim_inflight(job_id)
+                if other:
+                    return other, True
+                snapshot = self._record(job_id, params, inflight=True)
+
+        self._publish(snapshot)
+        self._pool.submit(self._run, job_id, fn, coalesce)
+        return snapshot, False
+
+    def _record(self, job_id: str, params: Dict[str, Any] | None, inflight: bool) -> Dict[str, Any]:
+        job = {
+            "id": job_id,
+            "kind": self.kind,
+            "status": "queued",
+            "params": params or {},
+            "created_at": _utcnow_iso(),
+            "heartbeat_at": _utcnow_iso(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            if inflight:
+                self._inflight = job_id
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix=f"job-{self.kind}")
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name=f"job-{self.kind}-heartbeat", daemon=True)
+                self._heartbeat.start()
+            return dict(job)
+
+    # ---------------- worker side ----------------
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            snapshot = json.loads(json.dumps(job, default=str))
+        self._publish(snapshot)
+
+    def _run(self, job_id: str, fn: Callable[..., Any], coalesce: bool):
+        def report(**progress):
+            with self._lock:
+                self._jobs[job_id]["progress"].update(progress)
+            self._update(job_id)
+
+        self._update(job_id, status="running", started_at=_utcnow_iso())
+        try:
+            result = fn(report)
+            self._update(job_id, status="succeeded", result=result, finished_at=_utcnow_iso())
+        except Exception as e:
+            log.exception("%s job %s failed", self.kind, job_id)
+            self._update(job_id, status="failed", error=str(e), finished_at=_utcnow_iso())
+        finally:
+            with self._lock:
+                if self._inflight == job_id:
+                    self._inflight = None
+                self._prune()
+            if coalesce:
+                self._release_inflight(job_id)
+
+    def _prune(self, keep: int = 200):
+        # caller holds the lock; finished jobs stay readable via Redis
+        done = [k for k, j in self._jobs.items() if j["status"] not in ACTIVE]
+        for k in done[:-keep] if len(done) > keep else []:
+            self._jobs.pop(k, None)
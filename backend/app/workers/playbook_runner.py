@@ -0,0 +1,128 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only
+
+from ..core.config import settings
+from ..core.db import SessionLocal
+from ..core import redis_client as rc
+from ..core.redis_client import redis_client
+from ..models.detection import Detection
+from ..services import playbooks
+from ..services.detections import evidence_src_ips
+
+log = logging.getLogger(__name__)
+
+# Evaluates new detections against the playbooks every
+# settings.playbooks_poll_seconds. The last detection id handled is kept in
+# Redis, and a lock holding a per-tick token lets one process run each tick;
+# the token is renewed per detection and checked on release, so a tick that
+# outlives its lock stops instead of running alongside the next owner. On
+# first start the cursor is set to the newest detection, so history is never
+# acted on. Without Redis the runner idles: its guard rails need it.
+#
+# Ids are allocated before commit, so a detection can become visible after a
+# higher one. A hole right after the cursor holds the walk until it fills or
+# GAP_GRACE_SECONDS pass (rolled-back inserts leave permanent holes).
+
+BATCH = 200
+CURSOR_KEY = "playbooks:cursor"
+LOCK_KEY = "playbooks:runner:lock"
+GAP_KEY = "playbooks:gap"  # "<cursor>:<epoch first seen>"
+LOCK_TTL = 60
+GAP_GRACE_SECONDS = 10.0
+WARN_EVERY = 60.0
+
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_warned_at = 0.0
+
+
+def _gap_expired(cursor: int) -> bool:
+    """True once the hole after cursor has been open for GAP_GRACE_SECONDS."""
+    now = time.time()
+    raw = redis_client.get(GAP_KEY)
+    at, _, since = (raw or "").partition(":")
+    if at != str(cursor):
+        redis_client.set(GAP_KEY, f"{cursor}:{now}", ex=3600)
+        return False
+    return now - float(since) >= GAP_GRACE_SECONDS
+
+
+def run_once() -> int:
+    """Handle detections created since the last tick; returns how many were handled."""
+    pbs = playbooks.load()
+    if not pbs:
+        return 0
+    token = uuid.uuid4().hex
+    if not redis_client.set(LOCK_KEY, token, nx=True, ex=LOCK_TTL):
+        return 0
+    db = SessionLocal()
+    try:
+        raw = redis_client.get(CURSOR_KEY)
+        if raw is None:
+            newest = db.execute(select(func.coalesce(func.max(Detection.id), 0))).scalar_one()
+            redis_client.set(CURSOR_KEY, newest)
+            return 0
+        cursor = int(raw)
+        dets = db.execute(
+            select(Detection)
+            .options(load_only(Detection.id, Detection.created_at, Detection.rule_id, Detection.kind,
+                               Detection.severity, Detection.title, Detection.summary))
+            .where(Detection.id > cursor)
+            .order_by(Detection.id)
+            .limit(BATCH)
+        ).scalars().all()
+        handled = 0
+        for det in dets:
+            if det.id > cursor + 1:
+                if not _gap_expired(cursor):
+                    break
+                log.warning("playbook runner: skipping detection ids %d-%d", cursor + 1, det.id - 1)
+            if not rc.renew_lock(LOCK_KEY, token, LOCK_TTL):
+                log.warning("playbook runner lost its lock; stopping this tick")
+                break
+            matched = [pb for pb in pbs if pb.matches(det)]
+            if matched:
+                ips = evidence_src_ips(db, det.id)
+                for pb in matched:
+                    playbooks.run_playbook(db, pb, det, ips)
+            cursor = det.id
+            redis_client.set(CURSOR_KEY, cursor)
+            handled += 1
+        return handled
+    finally:
+        db.close()
+        try:
+            rc.release_lock(LOCK_KEY, token)
+        except Exception:
+            pass  # expires on its own
+
+
+def _loop():
+    global _warned_at
+    while not _stop.wait(settings.playbooks_poll_seconds):
+        try:
+            while run_once() == BATCH and not _stop.is_set():
+                pass  # backlog: keep going without waiting
+        except Exception:
+            if time.monotonic() - _warned_at >= WARN_EVERY:
+                _warned_at = time.monotonic()
+                log.exception("playbook runner tick failed; retrying")
+
+
+def start():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="playbook-runner", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()